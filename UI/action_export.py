@@ -0,0 +1,250 @@
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import json
+import shutil
+import sys
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.benchmarks import load_sketches
+from UI.data_io import (
+    FILES,
+    LOAD_COLUMNS,
+    LTV_SCORES_PATH,
+    SKETCHES_PATH,
+    CATEGORICAL_FILES,
+    dataset_version,
+    read_projected,
+)
+from UI.live_logic import DueIndex, _to_day, build_due_index, resolve_asof_date, with_benchmark_quantile
+from UI.overview_logic import attach_ltv_scores
+
+EXPORT_DIR = Path("data/exports/action_lists")
+OVERVIEW_NAME = "most_urgent_per_customer"
+
+ACTION_STATUSES = ("overdue", "due_soon")
+DEFAULT_CHUNK_ROWS = 100_000
+
+# same columns as the app's action list / overview downloads
+ACTION_COLS = [
+    "anon",
+    "last_purchase_date",
+    "due_date",
+    "days_to_due",
+    "bottles_owned_effective",
+    "coverage_days_est",
+    "status",
+]
+OVERVIEW_COLS = [
+    "anon",
+    "product_group",
+    "status",
+    "days_to_due",
+    "last_purchase_date",
+    "due_date",
+    "bottles_owned_effective",
+    "coverage_days_est",
+    "expected_purchases",
+    "expected_revenue",
+]
+
+# ---------- Chunked writers ----------
+class _ChunkWriter:
+    """
+    Appends DataFrame chunks to one parquet or CSV file; nothing is written for zero chunks.
+
+    `partition_cols` are left out of parquet files (pyarrow restores them from
+    the directory names) but kept in CSV, which is read without the path.
+    """
+
+    def __init__(self, path: Path, fmt: str, partition_cols: tuple[str, ...] = ()):
+        self.path = path.with_suffix(f".{fmt}")
+        self.fmt = fmt
+        self.partition_cols = list(partition_cols)
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.fmt == "csv":
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        else:
+            table = pa.Table.from_pandas(df.drop(columns=self.partition_cols, errors="ignore"), preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+def _partition_path(root: Path, **keys: str) -> Path:
+    # hive layout (status=overdue/product_group=...), values URI-escaped like pyarrow expects
+    for key, value in keys.items():
+        root = root / f"{key}={quote(str(value), safe='')}"
+    return root / "part-0"
+
+# ---------- Export ----------
+def _chunk_frame(index: DueIndex, rows: np.ndarray, days: np.ndarray, status: np.ndarray, cols: list[str]) -> pd.DataFrame:
+    df = index.frame.iloc[rows].assign(days_to_due=days, status=status)
+    df = df[[c for c in cols if c in df.columns]]
+    for c in ("anon", "product_group"):
+        if c in df.columns:
+            df[c] = df[c].astype(str)
+    return df.reset_index(drop=True)
+
+def export_action_lists(
+    index: DueIndex,
+    asof_date: pd.Timestamp,
+    due_soon_days: int,
+    out_dir: Path,
+    fmt: str = "parquet",
+    ltv_scores: pd.DataFrame | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Write every group's overdue / due_soon list and the most-urgent-per-customer overview.
+
+    One pass over the due-date index: each (status, product group) slice is
+    already sorted by due day, so it streams to its partition in `chunk_rows`
+    pieces; the overview keeps one running (days_to_due, row) key per customer
+    and ties resolve to the first live row, as `idxmin` does in the app.
+    Returns rows written per (status, product_group).
+    """
+    asof_day = _to_day(asof_date)
+    overdue_end, due_soon_end = index.cutoffs(asof_date, due_soon_days)
+    cust_codes, customers = pd.factorize(index.frame["anon"])
+    n_rows = len(index.frame)
+    no_key = np.iinfo(np.int64).max
+    best = np.full(len(customers), no_key, dtype=np.int64)
+
+    counts = []
+    for g, group in enumerate(index.product_groups):
+        edges = {
+            "overdue": (index.bounds[g], overdue_end[g]),
+            "due_soon": (overdue_end[g], due_soon_end[g]),
+        }
+        # rows without a product group only count towards the overview, as in the app
+        labelled = not pd.isna(group)
+        for status in ACTION_STATUSES:
+            lo, hi = (int(x) for x in edges[status])
+            path = _partition_path(out_dir, status=status, product_group=group)
+            writer = _ChunkWriter(path, fmt, partition_cols=("status", "product_group"))
+            for start in range(lo, hi, chunk_rows):
+                stop = min(start + chunk_rows, hi)
+                rows = index.order[start:stop]
+                days = index.due_day[start:stop] - asof_day
+                np.minimum.at(best, cust_codes[rows], days * n_rows + rows)
+                if labelled:
+                    writer.write(_chunk_frame(index, rows, days, np.full(len(rows), status, dtype=object), ACTION_COLS))
+            writer.close()
+            if labelled:
+                counts.append({"status": status, "product_group": group, "rows": writer.rows})
+
+    # overview: one row per customer, most urgent first
+    keys = np.sort(best[best != no_key])
+    days_all, rows_all = np.divmod(keys, n_rows)
+    writer = _ChunkWriter(out_dir / OVERVIEW_NAME, fmt)
+    for start in range(0, len(keys), chunk_rows):
+        rows = rows_all[start:start + chunk_rows]
+        days = days_all[start:start + chunk_rows]
+        status = np.where(days < 0, "overdue", "due_soon").astype(object)
+        chunk = _chunk_frame(index, rows, days, status, OVERVIEW_COLS)
+        if ltv_scores is not None:
+            chunk = attach_ltv_scores(chunk, ltv_scores)
+        writer.write(chunk)
+    writer.close()
+    counts.append({"status": "any", "product_group": OVERVIEW_NAME, "rows": writer.rows})
+    return pd.DataFrame(counts)
+
+def _replace_dir(tmp: Path, out_dir: Path) -> None:
+    # readers never see a half-written export: the new tree is swapped in at the end
+    old = out_dir.with_name(out_dir.name + ".old")
+    if old.exists():
+        shutil.rmtree(old)
+    if out_dir.exists():
+        out_dir.rename(old)
+    tmp.rename(out_dir)
+    if old.exists():
+        shutil.rmtree(old)
+
+def run_export(
+    out_dir: Path = EXPORT_DIR,
+    fmt: str = "parquet",
+    asof: str = "dataset",
+    bench_quantile: str | None = "median",
+    manual_days_per_unit: float | None = None,
+    due_soon_days: int = 14,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """Load data/interim, build the due-date index once and export (nightly job entry point)."""
+    live = read_projected(FILES["live_customer_product_state"], LOAD_COLUMNS["live_customer_product_state"],
+                          categorical="live_customer_product_state" in CATEGORICAL_FILES)
+    bench = read_projected(FILES["retention_benchmarks"], LOAD_COLUMNS["retention_benchmarks"], categorical=False)
+
+    bench_mode = "manual" if manual_days_per_unit is not None else "quantile"
+    if bench_mode == "quantile":
+        sketches = load_sketches(SKETCHES_PATH) if SKETCHES_PATH.exists() else None
+        bench = with_benchmark_quantile(bench, sketches, bench_quantile)
+    else:
+        bench_quantile = None
+
+    index = build_due_index(live, bench, bench_mode, bench_quantile, manual_days_per_unit)
+    asof_date = resolve_asof_date(index.frame, asof) if asof in ("dataset", "today") else pd.Timestamp(asof).normalize()
+    ltv_scores = (
+        read_projected(LTV_SCORES_PATH, ["anon", "expected_purchases", "expected_revenue"], categorical=False)
+        if LTV_SCORES_PATH.exists() else None
+    )
+
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    counts = export_action_lists(index, asof_date, due_soon_days, tmp, fmt, ltv_scores, chunk_rows)
+
+    manifest = {
+        "asof_date": str(asof_date.date()),
+        "dataset_version": dataset_version(),
+        "bench_mode": bench_mode,
+        "bench_quantile": bench_quantile,
+        "manual_days_per_unit": manual_days_per_unit,
+        "due_soon_days": due_soon_days,
+        "format": fmt,
+        "rows": counts.to_dict(orient="records"),
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2, default=int))
+    _replace_dir(tmp, out_dir)
+    return counts
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m UI.action_export", description="Write all action lists without the app.")
+    parser.add_argument("--out", type=Path, default=EXPORT_DIR)
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--asof", default="dataset", help="'dataset', 'today' or a date (YYYY-MM-DD)")
+    parser.add_argument("--bench-quantile", default="median", help="'p25', 'median', 'p75' or any 'pNN' (needs the sketches)")
+    parser.add_argument("--manual-days", type=float, default=None, help="manual days per unit instead of a benchmark quantile")
+    parser.add_argument("--due-soon-days", type=int, default=14)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    counts = run_export(
+        out_dir=args.out,
+        fmt=args.format,
+        asof=args.asof,
+        bench_quantile=args.bench_quantile,
+        manual_days_per_unit=args.manual_days,
+        due_soon_days=args.due_soon_days,
+        chunk_rows=args.chunk_rows,
+    )
+    print(counts.pivot_table(index="product_group", columns="status", values="rows", aggfunc="sum", fill_value=0).astype(int).to_string())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,42 @@ from __future__ import annotations
 
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 
-from UI.data_io import load_parquets, standardize_columns
-from UI.live_logic import compute_live_dynamic, compute_live_dynamic_all_groups
-from UI.compare_logic import product_group_metrics
-from UI.ui_components import benchmark_label, plot_urgency_stacked_counts
+from UI.data_io import (
+    cache_stats,
+    dataset_version,
+    load_benchmark_sketches,
+    load_ltv_scores,
+    load_parquets,
+    load_product_group_rows,
+    standardize_columns,
+)
+from UI.live_logic import (
+    compute_live_dynamic,
+    compute_live_dynamic_all_groups,
+    compute_status_backtest,
+    compute_status_counts,
+    resolve_asof_date,
+    with_benchmark_quantile,
+)
+from UI.compare_logic import interval_metrics, product_group_metrics
+from UI.overview_logic import attach_ltv_scores, get_customer_index, get_status_matrix
+from UI.retention_logic import ecdf_points, get_retention_distributions, log_histogram
+from UI.perf_spans import HISTORY_RERUNS, RerunTrace, append_jsonl
+from pipeline.benchmarks import quantile_label
+from pipeline.retention import sorted_quantile
+from UI.ui_components import (
+    benchmark_label,
+    plot_backtest_quantiles,
+    plot_live_status,
+    plot_status_backtest,
+    plot_urgency_stacked_counts,
+    render_perf_panel,
+    render_warmup_progress,
+)
+from UI.warmup import start_warmup
 
 
 # ---------- Page config ----------
@@ -22,13 +49,20 @@ st.set_page_config(
 
 st.title("Retention + Live Status (Internal UI)")
 
+# per-stage timings of this rerun (Debug: performance panel)
+trace = RerunTrace()
+
 # ---------- Load data ----------
-dfs = standardize_columns(load_parquets())
+with trace.span("dataset_version"):
+    data_version = dataset_version()
+with trace.span("load_parquets") as span:
+    dfs = standardize_columns(load_parquets(data_version))
 
-live_std = dfs["live_customer_product_state"]
-intervals = dfs["purchase_intervals"]
-bench = dfs["retention_benchmarks"]
-pg_ret = dfs["product_group_retention"]  # kept (not used here but kept for compatibility)
+    live_std = dfs["live_customer_product_state"]
+    intervals = dfs["purchase_intervals"]
+    bench = dfs["retention_benchmarks"]
+    bench_sketches = load_benchmark_sketches(data_version)
+    span.rows = len(live_std) + len(intervals)
 
 # ---------- Sidebar ----------
 st.sidebar.header("Controls")
@@ -42,7 +76,13 @@ asof_choice = st.sidebar.radio("ASOF date", ["dataset", "today"])
 
 bench_mode = st.sidebar.radio("Benchmark mode", ["quantile", "manual"])
 if bench_mode == "quantile":
-    bench_quantile = st.sidebar.selectbox("Benchmark quantile", ["p25", "median", "p75"])
+    # any other quantile comes from the per-group sketches, when built
+    quantile_options = ["p25", "median", "p75"] + (["custom"] if bench_sketches is not None else [])
+    bench_quantile = st.sidebar.selectbox("Benchmark quantile", quantile_options)
+    if bench_quantile == "custom":
+        pct = st.sidebar.number_input("Percentile", 1.0, 99.0, 90.0, step=1.0)
+        bench_quantile = quantile_label(pct / 100)
+    bench = with_benchmark_quantile(bench, bench_sketches, bench_quantile)
     manual_days_per_unit = None
 else:
     bench_quantile = None
@@ -50,12 +90,21 @@ else:
 
 due_soon_days = st.sidebar.slider("Due soon window (days)", 0, 60, 14)
 
+# every product group × p25 / median / p75 precomputed in background threads
+if st.sidebar.toggle("Warm up caches in background", value=True):
+    warmup = start_warmup(
+        live_std, intervals, bench, data_version, product_groups, asof_choice, due_soon_days,
+        first=(selected_pg, bench_quantile),
+    )
+    with st.sidebar:
+        render_warmup_progress(warmup)
+
 st.sidebar.divider()
 st.sidebar.caption("Tip: 'Compare products' and 'Overdue overview' use the same controls above.")
 
 # ---------- Tabs ----------
-tab_live, tab_compare, tab_overview = st.tabs(
-    ["Live (single product)", "Compare products", "Overdue overview"]
+tab_live, tab_compare, tab_overview, tab_backtest = st.tabs(
+    ["Live (single product)", "Compare products", "Overdue overview", "Backtest"]
 )
 
 # =========================================================
@@ -63,18 +112,19 @@ tab_live, tab_compare, tab_overview = st.tabs(
 # =========================================================
 with tab_live:
     # ---------- Compute dynamic live (single PG) ----------
-    live_pg, asof_date_used, days_per_unit_used = compute_live_dynamic(
-        live_std,
-        bench,
-        selected_pg,
-        asof_choice,
-        bench_mode,
-        bench_quantile,
-        manual_days_per_unit,
-        due_soon_days,
-    )
-
-    intervals_pg = intervals[intervals["product_group"] == selected_pg]
+    with trace.span("live.compute_live_dynamic") as span:
+        live_pg, asof_date_used, days_per_unit_used = compute_live_dynamic(
+            live_std,
+            bench,
+            data_version,
+            selected_pg,
+            asof_choice,
+            bench_mode,
+            bench_quantile,
+            manual_days_per_unit,
+            due_soon_days,
+        )
+        span.rows = len(live_pg)
 
     # ---------- Top KPIs ----------
     st.divider()
@@ -82,14 +132,15 @@ with tab_live:
 
     total_customers = int(live_pg["anon"].nunique())
 
-    repeat_customers = int(intervals_pg["anon"].nunique()) if "anon" in intervals_pg.columns else 0
-    repeat_rate = (repeat_customers / total_customers * 100) if total_customers else 0.0
-
-    if len(intervals_pg) > 0:
-        r = intervals_pg["adj_retention_days"].dropna()
-        median_ret = float(r.median()) if len(r) else float("nan")
+    # interval-side metrics do not depend on ASOF / benchmark: cached per dataset version
+    with trace.span("live.interval_metrics", rows=len(intervals)):
+        pg_intervals = interval_metrics(intervals, data_version)
+    if selected_pg in pg_intervals.index:
+        repeat_customers = int(pg_intervals.at[selected_pg, "repeat_customers"])
+        median_ret = float(pg_intervals.at[selected_pg, "median_retention_days"])
     else:
-        median_ret = float("nan")
+        repeat_customers, median_ret = 0, float("nan")
+    repeat_rate = (repeat_customers / total_customers * 100) if total_customers else 0.0
 
     overdue_customers = int(live_pg.loc[live_pg["status"] == "overdue", "anon"].nunique())
     due_soon_customers = int(live_pg.loc[live_pg["status"] == "due_soon", "anon"].nunique())
@@ -120,132 +171,130 @@ with tab_live:
 
     left, right = st.columns([2, 1])
 
-    x = (
-        pd.to_numeric(intervals_pg.get("adj_retention_days"), errors="coerce")
-        if not intervals_pg.empty
-        else pd.Series(dtype=float)
-    )
-    x = x.dropna()
-    x = x[np.isfinite(x)]
-    x = x[x > 0]
-
-    with left:
-        if len(x) == 0:
-            st.info("No retention intervals to display for this selection.")
-        else:
-            view = st.radio(
-                "View",
-                ["ECDF (recommended)", "Histogram (log-scaled, clipped)"],
-                horizontal=True,
-                key="retention_view",
-            )
-            clip_q = st.slider(
-                "Clip long tail at quantile",
-                min_value=0.90,
-                max_value=0.999,
-                value=0.99,
-                step=0.01,
-                key="retention_clip_q",
-                help="Improves readability by clipping the extreme tail (stats table still uses full data).",
-            )
+    # sorted positive intervals + summary stats, precomputed per dataset version
+    with trace.span("live.retention_distributions") as span:
+        retention = get_retention_distributions(intervals, data_version)
+        x = retention.values_for(selected_pg)
+        span.rows = len(x)
 
-            p25, p50, p75 = np.percentile(x.values, [25, 50, 75])
-            clip_val = float(x.quantile(clip_q))
-            x_clip = x.clip(upper=clip_val)
-
-            if view.startswith("ECDF"):
-                xs = np.sort(x.values)
-                ys = np.arange(1, len(xs) + 1) / len(xs)
-
-                fig = go.Figure()
-                fig.add_trace(
-                    go.Scatter(
-                        x=xs,
-                        y=ys,
-                        mode="lines",
-                        name="ECDF",
-                        hovertemplate="Days: %{x:.1f}<br>Share: %{y:.1%}<extra></extra>",
-                    )
+    with trace.span("live.retention_chart", rows=len(x)):
+        with left:
+            if len(x) == 0:
+                st.info("No retention intervals to display for this selection.")
+            else:
+                view = st.radio(
+                    "View",
+                    ["ECDF (recommended)", "Histogram (log-scaled, clipped)"],
+                    horizontal=True,
+                    key="retention_view",
+                )
+                clip_q = st.slider(
+                    "Clip long tail at quantile",
+                    min_value=0.90,
+                    max_value=0.999,
+                    value=0.99,
+                    step=0.01,
+                    key="retention_clip_q",
+                    help="Improves readability by clipping the extreme tail (stats table still uses full data).",
                 )
 
-                for val, name in [(p25, "P25"), (p50, "Median"), (p75, "P75")]:
-                    fig.add_vline(
-                        x=float(val),
-                        line_dash="dot",
-                        annotation_text=f"{name}: {val:.0f}d",
-                        annotation_position="top right",
+                x_stats = retention.stats.loc[str(selected_pg)]
+                p25, p50, p75 = x_stats["25%"], x_stats["50%"], x_stats["75%"]
+                clip_val = sorted_quantile(x, clip_q)
+
+                if view.startswith("ECDF"):
+                    xs, ys = ecdf_points(x)
+
+                    fig = go.Figure()
+                    fig.add_trace(
+                        go.Scatter(
+                            x=xs,
+                            y=ys,
+                            mode="lines",
+                            name="ECDF",
+                            hovertemplate="Days: %{x:.1f}<br>Share: %{y:.1%}<extra></extra>",
+                        )
                     )
 
-                # Show benchmark as reference
-                if days_per_unit_used is not None and np.isfinite(days_per_unit_used) and days_per_unit_used > 0:
-                    fig.add_vline(
-                        x=float(days_per_unit_used),
-                        line_dash="dash",
-                        annotation_text=f"benchmark: {days_per_unit_used:.0f}d",
-                        annotation_position="top left",
+                    for val, name in [(p25, "P25"), (p50, "Median"), (p75, "P75")]:
+                        fig.add_vline(
+                            x=float(val),
+                            line_dash="dot",
+                            annotation_text=f"{name}: {val:.0f}d",
+                            annotation_position="top right",
+                        )
+
+                    # Show benchmark as reference
+                    if days_per_unit_used is not None and np.isfinite(days_per_unit_used) and days_per_unit_used > 0:
+                        fig.add_vline(
+                            x=float(days_per_unit_used),
+                            line_dash="dash",
+                            annotation_text=f"benchmark: {days_per_unit_used:.0f}d",
+                            annotation_position="top left",
+                        )
+
+                    fig.update_layout(
+                        height=380,
+                        margin=dict(l=30, r=20, t=40, b=40),
+                        xaxis_title="Adjusted retention (days per unit)",
+                        yaxis_title="Share of cycles ≤ X",
+                        yaxis_tickformat=".0%",
+                        showlegend=False,
                     )
 
-                fig.update_layout(
-                    height=380,
-                    margin=dict(l=30, r=20, t=40, b=40),
-                    xaxis_title="Adjusted retention (days per unit)",
-                    yaxis_title="Share of cycles ≤ X",
-                    yaxis_tickformat=".0%",
-                    showlegend=False,
-                )
-
-                st.plotly_chart(fig, use_container_width=True)
-                st.caption("Interpretation: by day X, this curve shows the % of observed repurchase cycles completed within ≤ X days/unit.")
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.caption("Interpretation: by day X, this curve shows the % of observed repurchase cycles completed within ≤ X days/unit.")
 
-            else:
-                xh = np.log1p(x_clip.values)
+                else:
+                    edges, counts = log_histogram(x, clip_val)
 
-                fig = px.histogram(
-                    x=xh,
-                    nbins=40,
-                    title=f"Histogram (log-scaled bins; clipped at p{int(clip_q*1000)/10:g} = {clip_val:.0f}d)",
-                )
+                    fig = go.Figure(
+                        go.Bar(
+                            x=(edges[:-1] + edges[1:]) / 2,
+                            y=counts,
+                            width=np.diff(edges),
+                            hovertemplate="Count: %{y:,}<extra></extra>",
+                        )
+                    )
+                    fig.update_layout(
+                        title=f"Histogram (log-scaled bins; clipped at p{int(clip_q*1000)/10:g} = {clip_val:.0f}d)",
+                        bargap=0,
+                    )
 
-                ticks = np.linspace(xh.min(), xh.max(), 6)
-                fig.update_xaxes(
-                    tickmode="array",
-                    tickvals=ticks,
-                    ticktext=[f"{np.expm1(t):.0f}" for t in ticks],
-                    title_text="Adjusted retention (days per unit)",
-                )
-                fig.update_yaxes(title_text="Count of cycles")
-                fig.update_layout(height=380, margin=dict(l=30, r=20, t=40, b=40))
+                    ticks = np.linspace(edges[0], edges[-1], 6)
+                    fig.update_xaxes(
+                        tickmode="array",
+                        tickvals=ticks,
+                        ticktext=[f"{np.expm1(t):.0f}" for t in ticks],
+                        title_text="Adjusted retention (days per unit)",
+                    )
+                    fig.update_yaxes(title_text="Count of cycles")
+                    fig.update_layout(height=380, margin=dict(l=30, r=20, t=40, b=40))
 
-                st.plotly_chart(fig, use_container_width=True)
-                st.caption("This histogram uses log-scaled binning + tail clipping to stay readable; the summary stats use full data.")
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.caption("This histogram uses log-scaled binning + tail clipping to stay readable; the summary stats use full data.")
 
-    with right:
-        if len(x) > 0:
-            st.table(x.describe(percentiles=[0.25, 0.5, 0.75]).to_frame("value").round(1))
+        with right:
+            if len(x) > 0:
+                st.table(retention.stats.loc[str(selected_pg)].to_frame("value").round(1))
 
     # ---------- Live status ----------
     st.divider()
     st.subheader("Live status")
 
-    status_counts = (
-        live_pg["actionable_status"]
-        .value_counts()
-        .rename_axis("status")
-        .reset_index(name="customers")
-    )
-    status_counts["pct"] = (status_counts["customers"] / status_counts["customers"].sum() * 100).round(1)
+    # counts straight from the due-date index; charts keyed by the same controls
+    live_controls = (selected_pg, asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days)
+    with trace.span("live.status_counts"):
+        status_counts = compute_status_counts(live_std, bench, data_version, *live_controls)
 
     left, right = st.columns([1, 2])
 
     with left:
         st.dataframe(status_counts, hide_index=True)
 
-    with right:
-        fig, ax = plt.subplots()
-        ax.bar(status_counts["status"], status_counts["customers"])
-        for i, pct in enumerate(status_counts["pct"]):
-            ax.text(i, status_counts["customers"].iloc[i], f"{pct}%", ha="center")
-        st.pyplot(fig)
+    with trace.span("live.status_chart", rows=len(status_counts)):
+        with right:
+            plot_live_status(status_counts, data_version, live_controls)
 
     # ---------- Action list ----------
     st.divider()
@@ -257,50 +306,51 @@ with tab_live:
         horizontal=True,
     )
 
-    if status_filter == "overdue":
-        action_df = live_pg[live_pg["status"] == "overdue"].copy()
-    elif status_filter == "due_soon":
-        action_df = live_pg[live_pg["status"] == "due_soon"].copy()
-    else:
-        action_df = live_pg[live_pg["status"].isin(["overdue", "due_soon"])].copy()
-
-    if action_df.empty:
-        st.success("No customers match the selected status filter.")
-    else:
-        st.caption(f"Customers in selection: {action_df['anon'].nunique():,}")
-
-        action_df = action_df.sort_values("days_to_due")
+    with trace.span("live.action_list", rows=len(live_pg)):
+        if status_filter == "overdue":
+            action_df = live_pg[live_pg["status"] == "overdue"].copy()
+        elif status_filter == "due_soon":
+            action_df = live_pg[live_pg["status"] == "due_soon"].copy()
+        else:
+            action_df = live_pg[live_pg["status"].isin(["overdue", "due_soon"])].copy()
 
-        cols_to_show = [
-            "anon",
-            "last_purchase_date",
-            "due_date",
-            "days_to_due",
-            "bottles_owned_effective",
-            "coverage_days_est",
-            "status",
-        ]
-        cols_to_show = [c for c in cols_to_show if c in action_df.columns]
+        if action_df.empty:
+            st.success("No customers match the selected status filter.")
+        else:
+            st.caption(f"Customers in selection: {action_df['anon'].nunique():,}")
+
+            action_df = action_df.sort_values("days_to_due")
+
+            cols_to_show = [
+                "anon",
+                "last_purchase_date",
+                "due_date",
+                "days_to_due",
+                "bottles_owned_effective",
+                "coverage_days_est",
+                "status",
+            ]
+            cols_to_show = [c for c in cols_to_show if c in action_df.columns]
 
-        st.dataframe(action_df[cols_to_show], use_container_width=True, height=420)
+            st.dataframe(action_df[cols_to_show], use_container_width=True, height=420)
 
-        csv = action_df[cols_to_show].to_csv(index=False).encode("utf-8")
-        st.download_button(
-            label="⬇️ Download action list (CSV)",
-            data=csv,
-            file_name=f"action_list__{status_filter.replace(' ', '_')}__{selected_pg}.csv",
-            mime="text/csv",
-        )
+            csv = action_df[cols_to_show].to_csv(index=False).encode("utf-8")
+            st.download_button(
+                label="⬇️ Download action list (CSV)",
+                data=csv,
+                file_name=f"action_list__{status_filter.replace(' ', '_')}__{selected_pg}.csv",
+                mime="text/csv",
+            )
 
-        st.info(
-            f"{action_df['anon'].nunique():,} customers require action for **{selected_pg}** "
-            f"({status_filter.replace('_', ' ')})"
-        )
+            st.info(
+                f"{action_df['anon'].nunique():,} customers require action for **{selected_pg}** "
+                f"({status_filter.replace('_', ' ')})"
+            )
 
     if not customer_mode:
         with st.expander("Debug: filtered data"):
             st.dataframe(live_pg.head(50))
-            st.dataframe(intervals_pg.head(50))
+            st.dataframe(load_product_group_rows("purchase_intervals", selected_pg, data_version).head(50))
 
 
 # =========================================================
@@ -309,10 +359,13 @@ with tab_live:
 with tab_compare:
     st.subheader("Compare product groups")
 
-    live_all, asof_all = compute_live_dynamic_all_groups(
-        live_std, bench, asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days
-    )
-    metrics = product_group_metrics(live_all, intervals)
+    with trace.span("compare.compute_live_dynamic_all_groups") as span:
+        live_all, asof_all = compute_live_dynamic_all_groups(
+            live_std, bench, data_version, asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days
+        )
+        span.rows = len(live_all)
+    with trace.span("compare.product_group_metrics", rows=len(live_all) + len(intervals)):
+        metrics = product_group_metrics(live_all, intervals, data_version)
 
     compare_pgs = st.multiselect(
         "Pick product groups to compare",
@@ -351,7 +404,12 @@ with tab_compare:
     st.subheader(
         f"Urgency by product group — {benchmark_label(bench_mode, bench_quantile, manual_days_per_unit)}"
     )
-    plot_urgency_stacked_counts(metrics)
+    with trace.span("compare.urgency_chart", rows=len(metrics)):
+        plot_urgency_stacked_counts(
+            metrics,
+            data_version,
+            (asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days, tuple(compare_pgs)),
+        )
 
 
 # =========================================================
@@ -360,42 +418,60 @@ with tab_compare:
 with tab_overview:
     st.subheader("Overdue overview (customer-centric)")
 
-    live_all, asof_all = compute_live_dynamic_all_groups(
-        live_std, bench, asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days
-    )
+    with trace.span("overview.compute_live_dynamic_all_groups") as span:
+        live_all, asof_all = compute_live_dynamic_all_groups(
+            live_std, bench, data_version, asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days
+        )
+        span.rows = len(live_all)
 
-    actionable = live_all[live_all["status"].isin(["overdue", "due_soon"])].copy()
+    with trace.span("overview.actionable", rows=len(live_all)):
+        actionable = live_all[live_all["status"].isin(["overdue", "due_soon"])].copy()
 
     st.caption(f"ASOF_DATE = {asof_all.date()} | due_soon window = {due_soon_days}d")
 
     if actionable.empty:
         st.success("No customers are overdue or due soon (across all product groups).")
     else:
-        idx = actionable.groupby("anon")["days_to_due"].idxmin()
-        most_urgent = actionable.loc[idx].copy().sort_values("days_to_due")
+        with trace.span("overview.most_urgent", rows=len(actionable)):
+            idx = actionable.groupby("anon", observed=True)["days_to_due"].idxmin()
+            most_urgent = actionable.loc[idx].copy().sort_values("days_to_due")
+
+            # Markov LTV scores (python -m pipeline ltv_scores), attached per customer
+            ltv_scores = load_ltv_scores(data_version)
+            sort_options = ["days_to_due"]
+            if ltv_scores is not None:
+                most_urgent = attach_ltv_scores(most_urgent, ltv_scores)
+                sort_options += ["expected_revenue", "expected_purchases"]
 
         st.metric("Customers needing action (any product)", f"{most_urgent['anon'].nunique():,}")
 
-        cols = [
-            "anon",
-            "product_group",
-            "status",
-            "days_to_due",
-            "last_purchase_date",
-            "due_date",
-            "bottles_owned_effective",
-            "coverage_days_est",
-        ]
-        cols = [c for c in cols if c in most_urgent.columns]
-        st.dataframe(most_urgent[cols], use_container_width=True, height=520)
-
-        csv = most_urgent[cols].to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "⬇️ Download most-urgent-per-customer (CSV)",
-            data=csv,
-            file_name="overdue_overview__most_urgent_per_customer.csv",
-            mime="text/csv",
-        )
+        sort_by = st.selectbox("Sort customers by", sort_options)
+        if sort_by != "days_to_due":
+            most_urgent = most_urgent.sort_values(sort_by, ascending=False, na_position="last")
+
+        with trace.span("overview.table", rows=len(most_urgent)):
+            cols = [
+                "anon",
+                "product_group",
+                "status",
+                "days_to_due",
+                "last_purchase_date",
+                "due_date",
+                "bottles_owned_effective",
+                "coverage_days_est",
+                "expected_purchases",
+                "expected_revenue",
+            ]
+            cols = [c for c in cols if c in most_urgent.columns]
+            st.dataframe(most_urgent[cols], use_container_width=True, height=520)
+
+            csv = most_urgent[cols].to_csv(index=False).encode("utf-8")
+            st.download_button(
+                "⬇️ Download most-urgent-per-customer (CSV)",
+                data=csv,
+                file_name="overdue_overview__most_urgent_per_customer.csv",
+                mime="text/csv",
+            )
 
         st.divider()
         st.subheader("Customer drilldown")
@@ -403,8 +479,11 @@ with tab_overview:
         cust_options = most_urgent["anon"].astype(str).unique().tolist()
         selected_customer = st.selectbox("Pick a customer (anon)", cust_options)
 
-        cust_df = live_all[live_all["anon"].astype(str) == str(selected_customer)].copy()
-        cust_df = cust_df.sort_values(["status", "days_to_due", "product_group"])
+        with trace.span("overview.customer_index", rows=len(live_all)):
+            cust_index = get_customer_index(live_all, data_version)
+            cust_df = live_all.iloc[cust_index.rows(selected_customer)]
+        # most urgent first: status is categorical (ok < due_soon < overdue), so descending
+        cust_df = cust_df.sort_values(["status", "days_to_due", "product_group"], ascending=[False, True, True])
 
         cust_cols = [
             "product_group",
@@ -422,14 +501,108 @@ with tab_overview:
 
         show_matrix = st.toggle("Show status matrix (customer × product)", value=False)
         if show_matrix:
-            st.caption("Matrix shows status per (customer, product_group).")
-            mat = live_all.pivot_table(
-                index="anon",
-                columns="product_group",
-                values="status",
-                aggfunc="first",
-            )
+            st.caption("Matrix shows status per (customer, product_group); only the visible page is materialized.")
+            with trace.span("overview.status_matrix", rows=len(live_all)):
+                matrix = get_status_matrix(
+                    live_all, cust_index, data_version,
+                    asof_choice, bench_mode, bench_quantile, manual_days_per_unit, due_soon_days,
+                )
+
             only_actionable = st.toggle("Show only customers with any action needed", value=True)
-            if only_actionable:
-                mat = mat.loc[mat.index.isin(most_urgent["anon"].unique())]
+            m1, m2, m3 = st.columns([2, 3, 1])
+            search = m1.text_input("Customer (anon) contains", "")
+            matrix_pgs = m2.multiselect("Product groups", options=list(matrix.product_groups))
+            page_size = m3.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+
+            matrix_rows = matrix.filter_rows(only_actionable, matrix_pgs, search)
+            n_pages = max(1, -(-len(matrix_rows) // page_size))
+            page = st.number_input("Page", min_value=1, max_value=n_pages, value=1)
+            st.caption(f"{len(matrix_rows):,} customers match | page {page} of {n_pages}")
+
+            with trace.span("overview.status_matrix_page", rows=len(matrix_rows)):
+                mat = matrix.page(matrix_rows, int(page) - 1, page_size, matrix_pgs)
             st.dataframe(mat, use_container_width=True, height=520)
+
+
+# =========================================================
+# TAB 4: Backtest (daily ASOF range)
+# =========================================================
+with tab_backtest:
+    st.subheader("Overdue backtest (status for every ASOF day)")
+
+    # every tab body runs on every rerun: the backtest (up to four multi-year sweeps)
+    # only runs while switched on, so sidebar changes elsewhere stay fast
+    run_backtest = st.toggle("Run backtest", value=False, key="bt_run")
+    if not run_backtest:
+        st.info("Switch on 'Run backtest' to compute daily status counts for an ASOF range.")
+    else:
+        dataset_end = resolve_asof_date(live_std, "dataset")
+        b1, b2 = st.columns([2, 1])
+        bt_range = b1.date_input(
+            "ASOF range",
+            value=((dataset_end - pd.DateOffset(years=3)).date(), dataset_end.date()),
+        )
+        bt_scope = b2.radio("Scope", ["Selected product group", "All product groups"], horizontal=True)
+
+        if not isinstance(bt_range, (tuple, list)) or len(bt_range) != 2:
+            st.info("Pick a start and an end date.")
+        else:
+            bt_start, bt_end = pd.Timestamp(bt_range[0]), pd.Timestamp(bt_range[1])
+            st.caption(
+                "Each day uses that date as ASOF over the current live table: a customer × product row "
+                "counts from its last purchase date on. Benchmark and due-soon window follow the sidebar."
+            )
+
+            def backtest_series(mode, quantile, manual_days) -> pd.DataFrame:
+                bt = compute_status_backtest(
+                    live_std, bench, data_version, mode, quantile, manual_days, bt_start, bt_end, due_soon_days
+                )
+                if bt_scope == "Selected product group":
+                    bt = bt[bt["product_group"] == selected_pg]
+                return bt.groupby("date", as_index=False)[["ok", "due_soon", "overdue", "rows"]].sum()
+
+            with trace.span("backtest.series") as span:
+                series = backtest_series(bench_mode, bench_quantile, manual_days_per_unit)
+                span.rows = len(series)
+            with trace.span("backtest.chart", rows=len(series)):
+                plot_status_backtest(series)
+
+            # three more backtests on a cold cache: only when asked for
+            if bench_mode == "quantile" and st.toggle("Compare p25 / median / p75", value=False, key="bt_compare"):
+                st.subheader("Benchmark quantiles compared")
+                with trace.span("backtest.quantiles"):
+                    rates = []
+                    for q in ["p25", "median", "p75"]:
+                        sq = backtest_series("quantile", q, None)
+                        sq["overdue_rate_pct"] = np.where(sq["rows"] > 0, sq["overdue"] / sq["rows"] * 100, 0.0)
+                        rates.append(sq.assign(benchmark=q))
+                    plot_backtest_quantiles(pd.concat(rates, ignore_index=True))
+
+
+# ---------- Debug: cache (rendered last so counters include this rerun) ----------
+if not customer_mode:
+    with st.sidebar.expander("Debug: compute cache"):
+        st.caption(f"dataset_version = {data_version}")
+        st.dataframe(cache_stats(), hide_index=True)
+
+# ---------- Performance spans (everything above this point) ----------
+perf_record = trace.finish(
+    dataset_version=data_version,
+    controls={
+        "product_group": str(selected_pg),
+        "asof": asof_choice,
+        "bench_mode": bench_mode,
+        "bench_quantile": bench_quantile,
+        "manual_days_per_unit": manual_days_per_unit,
+        "due_soon_days": due_soon_days,
+    },
+)
+perf_history = st.session_state.setdefault("perf_history", [])
+perf_history.append(perf_record)
+del perf_history[:-HISTORY_RERUNS]
+
+if not customer_mode:
+    with st.sidebar.expander("Debug: performance"):
+        render_perf_panel(perf_record, perf_history)
+        if st.toggle("Append reruns to data/perf/app_spans.jsonl", key="perf_export"):
+            append_jsonl(perf_record)
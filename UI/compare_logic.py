@@ -1,29 +1,85 @@
 from __future__ import annotations
+from dataclasses import dataclass
 import pandas as pd
 import numpy as np
 
-def product_group_metrics(live_all: pd.DataFrame, intervals_all: pd.DataFrame) -> pd.DataFrame:
-    total = live_all.groupby("product_group")["anon"].nunique().rename("customers")
+from UI.data_io import versioned_cache
+from UI.live_logic import STATUS_DUE_SOON, STATUS_LABELS, STATUS_OVERDUE
 
-    overdue = (
-        live_all[live_all["status"] == "overdue"]
-        .groupby("product_group")["anon"].nunique()
-        .rename("overdue_customers")
+@dataclass(frozen=True)
+class LiveCodes:
+    """anon / product_group of the live table as integer codes (same for every control setting)."""
+    anon: np.ndarray
+    group: np.ndarray
+    product_groups: np.ndarray
+    n_anon: int
+
+@versioned_cache(maxsize=2)
+def get_live_codes(_live_all: pd.DataFrame, dataset_version: str) -> LiveCodes:
+    anon, anon_uniques = pd.factorize(_live_all["anon"])
+    group, product_groups = pd.factorize(_live_all["product_group"], sort=True)
+    return LiveCodes(
+        anon=anon.astype(np.int64),
+        group=group.astype(np.int64),
+        product_groups=np.asarray(product_groups, dtype=object),
+        n_anon=len(anon_uniques),
     )
-    due_soon = (
-        live_all[live_all["status"] == "due_soon"]
-        .groupby("product_group")["anon"].nunique()
-        .rename("due_soon_customers")
+
+@versioned_cache(maxsize=2)
+def interval_metrics(_intervals_all: pd.DataFrame, dataset_version: str) -> pd.DataFrame:
+    # independent of ASOF / benchmark settings: computed once per dataset version
+    valid = _intervals_all["product_group"].notna().to_numpy()
+    anon, _ = pd.factorize(_intervals_all["anon"].to_numpy()[valid])
+    group, product_groups = pd.factorize(_intervals_all["product_group"].to_numpy()[valid], sort=True)
+    n_anon = max(int(anon.max()) + 1, 1) if len(anon) else 1
+
+    pairs = np.unique(group.astype(np.int64) * n_anon + anon)
+    repeat = np.bincount(pairs // n_anon, minlength=len(product_groups))
+
+    days = pd.to_numeric(_intervals_all["adj_retention_days"], errors="coerce").to_numpy(dtype=float)[valid]
+    has_days = ~np.isnan(days)
+    order = np.lexsort((days[has_days], group[has_days]))
+    sorted_days = days[has_days][order]
+    bounds = np.searchsorted(group[has_days][order], np.arange(len(product_groups) + 1))
+    median = np.array([
+        np.median(sorted_days[lo:hi]) if hi > lo else np.nan
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ])
+
+    return pd.DataFrame(
+        {"repeat_customers": repeat, "median_retention_days": median},
+        index=pd.Index(product_groups, name="product_group"),
     )
 
-    repeat = intervals_all.groupby("product_group")["anon"].nunique().rename("repeat_customers")
-    median_ret = (
-        intervals_all.groupby("product_group")["adj_retention_days"]
-        .median()
-        .rename("median_retention_days")
+def product_group_metrics(live_all: pd.DataFrame, intervals_all: pd.DataFrame, dataset_version: str) -> pd.DataFrame:
+    codes = get_live_codes(live_all, dataset_version)
+    status = pd.Categorical(live_all["status"], categories=list(STATUS_LABELS)).codes.astype(np.int64)
+
+    valid = codes.group >= 0
+    n_groups = len(codes.product_groups)
+    n_status = len(STATUS_LABELS)
+
+    # distinct customers per (group, status) and per group in one sorted-unique pass each
+    gs = codes.group[valid] * n_status + status[valid]
+    per_status = np.bincount(
+        np.unique(gs * codes.n_anon + codes.anon[valid]) // codes.n_anon,
+        minlength=n_groups * n_status,
+    ).reshape(n_groups, n_status)
+    total = np.bincount(
+        np.unique(codes.group[valid] * codes.n_anon + codes.anon[valid]) // codes.n_anon,
+        minlength=n_groups,
     )
 
-    out = pd.concat([total, repeat, median_ret, overdue, due_soon], axis=1).fillna(0)
+    out = pd.DataFrame(
+        {
+            "customers": total,
+            "overdue_customers": per_status[:, STATUS_OVERDUE],
+            "due_soon_customers": per_status[:, STATUS_DUE_SOON],
+        },
+        index=pd.Index(codes.product_groups, name="product_group"),
+    )
+    out = out.join(interval_metrics(intervals_all, dataset_version), how="outer").fillna(0)
+    out = out[["customers", "repeat_customers", "median_retention_days", "overdue_customers", "due_soon_customers"]]
 
     out["ok_customers"] = (out["customers"] - out["overdue_customers"] - out["due_soon_customers"]).clip(lower=0)
 
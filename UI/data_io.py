@@ -1,26 +1,235 @@
 from __future__ import annotations
+from collections import OrderedDict
+from functools import wraps
 from pathlib import Path
+import hashlib
+import inspect
+import threading
 import pandas as pd
+import pyarrow.parquet as pq
 import streamlit as st
 
+from pipeline.benchmarks import BenchmarkSketches, load_sketches
+
 DATA_DIR = Path("data/interim")
 
 FILES = {
     "live_customer_product_state": DATA_DIR / "live_customer_product_state.parquet",
     "purchase_intervals": DATA_DIR / "purchase_intervals.parquet",
     "retention_benchmarks": DATA_DIR / "retention_benchmarks.parquet",
-    "product_group_retention": DATA_DIR / "product_group_retention.parquet",
 }
 
-@st.cache_data(show_spinner=True)
-def load_parquets() -> dict[str, pd.DataFrame]:
+# read when present: the app falls back to the fixed p25 / median / p75 columns without it
+SKETCHES_PATH = DATA_DIR / "retention_benchmark_sketches.parquet"
+LTV_SCORES_PATH = DATA_DIR / "customer_ltv_scores.parquet"
+OPTIONAL_FILES = (SKETCHES_PATH, LTV_SCORES_PATH)
+
+# columns the app actually uses per file (product_group_retention is not read at all)
+LOAD_COLUMNS = {
+    "live_customer_product_state": ["anon", "product_group", "last_purchase_date", "bottles_owned_effective"],
+    "purchase_intervals": ["anon", "product_group", "adj_retention_days"],
+    "retention_benchmarks": ["product_group", "p25", "median", "p75"],
+}
+
+# low-cardinality / repeated strings stored as categoricals (dictionary-encoded on read)
+CATEGORICAL_COLS = ("anon", "product_group")
+CATEGORICAL_FILES = ("live_customer_product_state", "purchase_intervals")
+
+GROUP_COL_RAW = "MATRIX GRUPA PRODUKTOWA"
+
+# ---------- Dataset version ----------
+_HASH_CHUNK = 1 << 20
+_content_hashes: dict[tuple[str, int, int], str] = {}
+
+def file_hash(path: Path) -> str:
+    """Full content hash (the pipeline manifest's), recomputed only when mtime / size change."""
+    stat = path.stat()
+    key = (path.as_posix(), stat.st_mtime_ns, stat.st_size)
+    if key not in _content_hashes:
+        h = hashlib.blake2b(digest_size=16)
+        with path.open("rb") as f:
+            while chunk := f.read(_HASH_CHUNK):
+                h.update(chunk)
+        _content_hashes[key] = h.hexdigest()
+    return _content_hashes[key]
+
+def dataset_version(files: dict[str, Path] = FILES, optional: tuple[Path, ...] = OPTIONAL_FILES) -> str:
+    """Short token that changes whenever any input parquet changes."""
+    h = hashlib.blake2b(digest_size=8)
+    for key, path in sorted(files.items()):
+        if not path.exists():
+            raise FileNotFoundError(f"Missing file: {path.as_posix()}")
+        h.update(f"{key}:{file_hash(path)};".encode())
+    for path in optional:
+        if path.exists():
+            h.update(f"{path.as_posix()}:{file_hash(path)};".encode())
+    return h.hexdigest()
+
+# ---------- Versioned LRU cache ----------
+_CACHES: dict[str, "_LRU"] = {}
+_thread_counts = threading.local()   # per-thread hits / misses across all caches (perf spans)
+
+def thread_cache_counts() -> tuple[int, int]:
+    """(hits, misses) of every versioned cache, counted for the calling thread only."""
+    return getattr(_thread_counts, "hits", 0), getattr(_thread_counts, "misses", 0)
+
+class _LRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: OrderedDict = OrderedDict()
+        self.pending: dict = {}   # key -> Event while some thread computes it
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+def versioned_cache(maxsize: int = 16):
+    """
+    Process-wide LRU cache keyed by `dataset_version` plus scalar arguments.
+
+    Arguments whose name starts with "_" (the DataFrames) are not hashed, the
+    same convention st.cache_data uses; the dataset_version argument stands in
+    for their content. A key being computed by another thread (e.g. the
+    background warm-up) is waited for instead of computed twice.
+    """
+    def decorator(fn):
+        sig = inspect.signature(fn)
+        if "dataset_version" not in sig.parameters:
+            raise TypeError(f"{fn.__name__} needs a dataset_version parameter")
+        cache = _CACHES.setdefault(fn.__qualname__, _LRU(maxsize))
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple((k, v) for k, v in bound.arguments.items() if not k.startswith("_"))
+
+            while True:
+                with cache.lock:
+                    if key in cache.data:
+                        cache.hits += 1
+                        _thread_counts.hits = getattr(_thread_counts, "hits", 0) + 1
+                        cache.data.move_to_end(key)
+                        return cache.data[key]
+                    in_flight = cache.pending.get(key)
+                    if in_flight is None:
+                        cache.misses += 1
+                        _thread_counts.misses = getattr(_thread_counts, "misses", 0) + 1
+                        done = cache.pending[key] = threading.Event()
+                        break
+                in_flight.wait()
+
+            try:
+                value = fn(*args, **kwargs)
+                with cache.lock:
+                    cache.data[key] = value
+                    cache.data.move_to_end(key)
+                    while len(cache.data) > cache.maxsize:
+                        cache.data.popitem(last=False)
+                        cache.evictions += 1
+            finally:
+                with cache.lock:
+                    cache.pending.pop(key, None)
+                done.set()
+            return value
+
+        wrapper.cache_stats = cache.stats
+        return wrapper
+    return decorator
+
+def cache_stats() -> pd.DataFrame:
+    return pd.DataFrame(
+        [{"function": name, **cache.stats()} for name, cache in _CACHES.items()]
+    )
+
+def clear_caches() -> None:
+    """Drop every versioned_cache entry (cold-cache benchmarks; the app never needs it)."""
+    for cache in _CACHES.values():
+        with cache.lock:
+            cache.data.clear()
+
+# ---------- Loading ----------
+def _file_columns(path: Path, columns: list[str] | None) -> list[str] | None:
+    # map "product_group" onto the raw column name used by the notebooks
+    if columns is None:
+        return None
+    names = set(pq.read_schema(path).names)
+    out = []
+    for c in columns:
+        if c not in names and c == "product_group" and GROUP_COL_RAW in names:
+            c = GROUP_COL_RAW
+        if c in names:
+            out.append(c)
+    return out
+
+def read_projected(
+    path: Path,
+    columns: list[str] | None = None,
+    product_group=None,
+    categorical: bool = True,
+) -> pd.DataFrame:
+    """
+    Read only `columns` of a parquet file (or hive-partitioned directory).
+
+    With `product_group` set, the filter is pushed down to pyarrow so only row
+    groups / partitions that can contain the group are read; this pays off on
+    files written by `write_group_sorted_parquet`.
+    """
+    cols = _file_columns(path, columns)
+    all_names = cols if cols is not None else pq.read_schema(path).names
+    group_col = GROUP_COL_RAW if GROUP_COL_RAW in all_names else "product_group"
+
+    dict_cols = [c for c in all_names if c in CATEGORICAL_COLS or c == GROUP_COL_RAW] if categorical else None
+    filters = [(group_col, "=", product_group)] if product_group is not None else None
+
+    table = pq.read_table(path, columns=cols, filters=filters, read_dictionary=dict_cols)
+    df = table.to_pandas()
+    if GROUP_COL_RAW in df.columns:
+        df = df.rename(columns={GROUP_COL_RAW: "product_group"})
+    return df
+
+def write_group_sorted_parquet(df: pd.DataFrame, path: Path, row_group_size: int = 100_000) -> None:
+    """Rewrite a table sorted by product_group so row-group statistics allow pushdown."""
+    group_col = GROUP_COL_RAW if GROUP_COL_RAW in df.columns else "product_group"
+    df.sort_values(group_col, kind="stable").to_parquet(path, index=False, row_group_size=row_group_size)
+
+@st.cache_resource(show_spinner=True, max_entries=2)
+def load_parquets(dataset_version: str | None = None) -> dict[str, pd.DataFrame]:
+    # dataset_version only keys the cache: a changed file forces a reload.
+    # cache_resource shares one read-only copy across sessions (no per-rerun unpickling)
     dfs: dict[str, pd.DataFrame] = {}
     for key, path in FILES.items():
         if not path.exists():
             raise FileNotFoundError(f"Missing file: {path.as_posix()}")
-        dfs[key] = pd.read_parquet(path)
+        dfs[key] = read_projected(path, LOAD_COLUMNS.get(key), categorical=key in CATEGORICAL_FILES)
     return dfs
 
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_benchmark_sketches(dataset_version: str | None = None) -> BenchmarkSketches | None:
+    """Per-group quantile sketches of adj_retention_days (None if not built yet)."""
+    return load_sketches(SKETCHES_PATH) if SKETCHES_PATH.exists() else None
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_ltv_scores(dataset_version: str | None = None) -> pd.DataFrame | None:
+    """Expected future purchases / revenue per customer (None if not scored yet)."""
+    if not LTV_SCORES_PATH.exists():
+        return None
+    return read_projected(LTV_SCORES_PATH, ["anon", "expected_purchases", "expected_revenue"], categorical=False)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def load_product_group_rows(key: str, product_group: str, dataset_version: str | None = None) -> pd.DataFrame:
+    """Rows of one FILES entry for a single product group, via predicate pushdown."""
+    return read_projected(FILES[key], LOAD_COLUMNS.get(key), product_group=product_group)
+
 def require_cols(df: pd.DataFrame, cols: list[str], name: str) -> None:
     missing = [c for c in cols if c not in df.columns]
     if missing:
@@ -29,6 +238,6 @@ def require_cols(df: pd.DataFrame, cols: list[str], name: str) -> None:
 def standardize_columns(dfs: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
     dfs2 = dict(dfs)
     for key in dfs2:
-        if "MATRIX GRUPA PRODUKTOWA" in dfs2[key].columns:
-            dfs2[key] = dfs2[key].rename(columns={"MATRIX GRUPA PRODUKTOWA": "product_group"})
+        if GROUP_COL_RAW in dfs2[key].columns:
+            dfs2[key] = dfs2[key].rename(columns={GROUP_COL_RAW: "product_group"})
     return dfs2
@@ -1,7 +1,18 @@
 from __future__ import annotations
+from dataclasses import dataclass
 import pandas as pd
 import numpy as np
-import streamlit as st
+
+from pipeline.benchmarks import BenchmarkSketches, parse_quantile
+from UI.data_io import versioned_cache
+
+STATUS_LABELS = ("ok", "due_soon", "overdue")
+STATUS_OK, STATUS_DUE_SOON, STATUS_OVERDUE = 0, 1, 2
+
+DEFAULT_DAYS_PER_UNIT = 90.0
+
+# sentinel day for rows without a purchase date: never overdue, never due soon
+_NO_DUE_DAY = np.iinfo(np.int64).max
 
 def resolve_asof_date(live_df: pd.DataFrame, asof: str) -> pd.Timestamp:
     return (
@@ -10,16 +21,278 @@ def resolve_asof_date(live_df: pd.DataFrame, asof: str) -> pd.Timestamp:
         else pd.Timestamp.today().normalize()
     )
 
+def with_benchmark_quantile(
+    bench_df: pd.DataFrame,
+    sketches: BenchmarkSketches | None,
+    bench_quantile: str | None,
+) -> pd.DataFrame:
+    """
+    Benchmarks with a `bench_quantile` column ("p90", "p12.5", ...).
+
+    The stored p25 / median / p75 columns are used as they are; any other
+    quantile is read off the per-group sketches (microseconds per group).
+    """
+    if bench_quantile is None or bench_quantile in bench_df.columns:
+        return bench_df
+    if sketches is None:
+        raise ValueError(f"benchmark {bench_quantile!r} needs retention_benchmark_sketches.parquet (python -m pipeline benchmark_sketches)")
+    q = parse_quantile(bench_quantile)
+    out = bench_df.copy()
+    out[bench_quantile] = [sketches.quantile(str(g), q) for g in out["product_group"]]
+    return out
+
 def resolve_benchmark_days_per_unit(bench_df, product_group, bench_mode, bench_quantile, manual_days):
     if bench_mode == "manual":
         return float(manual_days)
     row = bench_df.loc[bench_df["product_group"] == product_group]
     return float(row.iloc[0][bench_quantile])
 
-@st.cache_data(show_spinner=False)
+def _to_day(ts: pd.Timestamp) -> int:
+    return int(np.datetime64(ts.normalize(), "D").astype(np.int64))
+
+# ---------- Due-date index ----------
+@dataclass(frozen=True)
+class DueIndex:
+    """
+    Live table with due dates precomputed for one benchmark choice.
+
+    Rows are ordered by (product_group, due day) in `order`, so every product
+    group is a contiguous slice `bounds[g]:bounds[g + 1]` of the sorted
+    `due_day` array and any ASOF / due-soon window resolves with searchsorted.
+    """
+    frame: pd.DataFrame          # live rows + days_per_unit, coverage_days_est, due_date
+    product_groups: np.ndarray   # labels, position = group code
+    bounds: np.ndarray           # slice offsets per group code, len = n_groups + 1
+    order: np.ndarray            # frame row positions sorted by (group, due_day)
+    due_day: np.ndarray          # due day (days since epoch) aligned with `order`
+
+    def group_slice(self, product_group) -> slice:
+        pos = np.flatnonzero(self.product_groups == product_group)
+        if len(pos) == 0:
+            return slice(0, 0)
+        g = int(pos[0])
+        return slice(int(self.bounds[g]), int(self.bounds[g + 1]))
+
+    def cutoffs(self, asof_date: pd.Timestamp, due_soon_days: int) -> tuple[np.ndarray, np.ndarray]:
+        """Per-group absolute positions where overdue and due_soon rows end."""
+        asof_day = _to_day(asof_date)
+        overdue_end = np.empty(len(self.product_groups), dtype=np.int64)
+        due_soon_end = np.empty(len(self.product_groups), dtype=np.int64)
+        for g in range(len(self.product_groups)):
+            lo, hi = self.bounds[g], self.bounds[g + 1]
+            days = self.due_day[lo:hi]
+            overdue_end[g] = lo + np.searchsorted(days, asof_day, side="left")
+            due_soon_end[g] = lo + np.searchsorted(days, asof_day + int(due_soon_days), side="right")
+        return overdue_end, due_soon_end
+
+    def counts(self, asof_date: pd.Timestamp, due_soon_days: int) -> pd.DataFrame:
+        """Row counts per product group and status without touching the frame."""
+        overdue_end, due_soon_end = self.cutoffs(asof_date, due_soon_days)
+        lo, hi = self.bounds[:-1], self.bounds[1:]
+        return pd.DataFrame({
+            "product_group": self.product_groups,
+            "rows": hi - lo,
+            "overdue": overdue_end - lo,
+            "due_soon": due_soon_end - overdue_end,
+            "ok": hi - due_soon_end,
+        })
+
+    def rows(
+        self,
+        asof_date: pd.Timestamp,
+        due_soon_days: int,
+        statuses: tuple[str, ...] = ("overdue", "due_soon"),
+        product_group=None,
+    ) -> np.ndarray:
+        """Frame row positions with the given statuses, most urgent first within a group."""
+        overdue_end, due_soon_end = self.cutoffs(asof_date, due_soon_days)
+        groups = range(len(self.product_groups))
+        if product_group is not None:
+            groups = np.flatnonzero(self.product_groups == product_group)
+
+        parts = []
+        for g in groups:
+            edges = {
+                "overdue": (self.bounds[g], overdue_end[g]),
+                "due_soon": (overdue_end[g], due_soon_end[g]),
+                "ok": (due_soon_end[g], self.bounds[g + 1]),
+            }
+            for status in STATUS_LABELS[::-1]:
+                if status in statuses:
+                    lo, hi = edges[status]
+                    parts.append(self.order[lo:hi])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def status_codes(self, asof_date: pd.Timestamp, due_soon_days: int, product_group=None) -> tuple[np.ndarray, np.ndarray]:
+        """Frame row positions (ascending) and their status codes (see STATUS_LABELS)."""
+        overdue_end, due_soon_end = self.cutoffs(asof_date, due_soon_days)
+        if product_group is None:
+            groups, lo, hi = range(len(self.product_groups)), 0, len(self.order)
+        else:
+            sl = self.group_slice(product_group)
+            groups = np.flatnonzero(self.product_groups == product_group)
+            lo, hi = sl.start, sl.stop
+
+        sorted_codes = np.full(hi - lo, STATUS_OK, dtype=np.int8)
+        for g in groups:
+            sorted_codes[self.bounds[g] - lo:overdue_end[g] - lo] = STATUS_OVERDUE
+            sorted_codes[overdue_end[g] - lo:due_soon_end[g] - lo] = STATUS_DUE_SOON
+
+        rows = self.order[lo:hi]
+        if product_group is None:
+            codes = np.empty_like(sorted_codes)
+            codes[rows] = sorted_codes
+            return np.arange(len(rows)), codes
+        by_row = np.argsort(rows, kind="stable")
+        return rows[by_row], sorted_codes[by_row]
+
+def build_due_index(
+    live_df: pd.DataFrame,
+    bench_df: pd.DataFrame,
+    bench_mode: str,
+    bench_quantile: str | None,
+    manual_days_per_unit: float | None,
+) -> DueIndex:
+    df = live_df.reset_index(drop=True)
+    df["last_purchase_date"] = pd.to_datetime(df["last_purchase_date"])
+
+    # rows without a product group stay in (overview, counts, ASOF) as a last,
+    # unlabelled group on the default benchmark; no label selects it
+    codes, product_groups = pd.factorize(df["product_group"], sort=True, use_na_sentinel=False)
+    product_groups = np.asarray(product_groups, dtype=object)
+    unlabelled = pd.isna(product_groups)
+
+    if bench_mode == "manual":
+        dpu_per_group = np.full(len(product_groups), float(manual_days_per_unit))
+    else:
+        dpu_per_group = pd.to_numeric(
+            bench_df.drop_duplicates("product_group")
+            .set_index("product_group")[bench_quantile]
+            .reindex(product_groups),
+            errors="coerce",
+        ).fillna(DEFAULT_DAYS_PER_UNIT).to_numpy(dtype=float)
+    dpu_per_group = np.where(unlabelled, DEFAULT_DAYS_PER_UNIT, dpu_per_group)
+
+    df["days_per_unit"] = dpu_per_group[codes]
+
+    units = df["bottles_owned_effective"].fillna(1).clip(lower=1).to_numpy(dtype=float)
+    coverage = np.round(df["days_per_unit"].to_numpy() * units).astype(np.int64)
+    df["coverage_days_est"] = coverage
+    df["due_date"] = df["last_purchase_date"] + pd.to_timedelta(coverage, unit="D")
+
+    lpd = df["last_purchase_date"].to_numpy()
+    due_day = lpd.astype("datetime64[D]").astype(np.int64) + coverage
+    due_day[np.isnat(lpd)] = _NO_DUE_DAY
+
+    order = np.lexsort((due_day, codes))
+    bounds = np.searchsorted(codes[order], np.arange(len(product_groups) + 1), side="left")
+
+    return DueIndex(
+        frame=df,
+        product_groups=product_groups,
+        bounds=bounds.astype(np.int64),
+        order=order.astype(np.int64),
+        due_day=due_day[order],
+    )
+
+@versioned_cache(maxsize=8)
+def get_due_index(
+    _live_df: pd.DataFrame,
+    _bench_df: pd.DataFrame,
+    dataset_version: str,
+    bench_mode: str,
+    bench_quantile: str | None,
+    manual_days_per_unit: float | None,
+) -> DueIndex:
+    # built once per benchmark choice; ASOF / due-soon changes only re-slice it
+    return build_due_index(_live_df, _bench_df, bench_mode, bench_quantile, manual_days_per_unit)
+
+def status_backtest(
+    index: DueIndex,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    due_soon_days: int,
+) -> pd.DataFrame:
+    """
+    Daily overdue / due_soon / ok row counts per product group for every ASOF in [start, end].
+
+    A row counts from its last purchase day on; as ASOF moves forward it is ok,
+    then due_soon (due - due_soon_days .. due), then overdue (after due). Each
+    phase is one day interval, so the whole range is a difference array over
+    (group, day) plus a cumulative sum: O(rows + groups × days), independent of
+    how many ASOF days are evaluated. Rows without a purchase date are skipped.
+    """
+    start_day, end_day = _to_day(start_date), _to_day(end_date)
+    n_days = max(end_day - start_day + 1, 0)
+    n_groups = len(index.product_groups)
+
+    valid = index.due_day != _NO_DUE_DAY
+    group = np.repeat(np.arange(n_groups), np.diff(index.bounds))[valid]
+    due = index.due_day[valid] - start_day
+    lpd = (
+        index.frame["last_purchase_date"].to_numpy()[index.order[valid]]
+        .astype("datetime64[D]").astype(np.int64) - start_day
+    )
+    soon_from = np.maximum(lpd, due - int(due_soon_days))
+
+    def active_days(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        # rows count on days lo <= t < hi (relative to start), clipped to the range
+        lo, hi = np.clip(lo, 0, n_days), np.clip(hi, 0, n_days)
+        width = n_days + 1
+        diff = (
+            np.bincount(group * width + lo, minlength=n_groups * width)
+            - np.bincount(group * width + hi, minlength=n_groups * width)
+        )
+        return np.cumsum(diff.reshape(n_groups, width), axis=1)[:, :n_days]
+
+    counts = {
+        "ok": active_days(lpd, soon_from),
+        "due_soon": active_days(soon_from, due + 1),
+        "overdue": active_days(np.maximum(lpd, due + 1), np.full_like(due, n_days)),
+    }
+
+    dates = pd.date_range(pd.Timestamp(start_date).normalize(), periods=n_days, freq="D")
+    out = pd.DataFrame({
+        "date": np.tile(dates, n_groups),
+        "product_group": np.repeat(index.product_groups, n_days),
+        **{status: c.ravel() for status, c in counts.items()},
+    })
+    out["rows"] = out["ok"] + out["due_soon"] + out["overdue"]
+    return out
+
+@versioned_cache(maxsize=16)
+def compute_status_backtest(
+    _live_df: pd.DataFrame,
+    _bench_df: pd.DataFrame,
+    dataset_version: str,
+    bench_mode: str,
+    bench_quantile: str | None,
+    manual_days_per_unit: float | None,
+    start_date: pd.Timestamp,
+    end_date: pd.Timestamp,
+    due_soon_days: int,
+) -> pd.DataFrame:
+    index = get_due_index(_live_df, _bench_df, dataset_version, bench_mode, bench_quantile, manual_days_per_unit)
+    return status_backtest(index, start_date, end_date, due_soon_days)
+
+def materialize_status(index: DueIndex, asof_date: pd.Timestamp, due_soon_days: int, product_group=None) -> pd.DataFrame:
+    """Frame (or one product group of it) with days_to_due / status for one ASOF setting."""
+    rows, codes = index.status_codes(asof_date, due_soon_days, product_group)
+    df = index.frame if product_group is None else index.frame.iloc[rows]
+
+    status = pd.Categorical.from_codes(codes, categories=list(STATUS_LABELS))
+    return df.assign(
+        days_to_due=(df["due_date"] - asof_date).dt.days,
+        status=status,
+        actionable_status=status,
+    )
+
+# sized for the warm-up: every product group × p25 / median / p75 (frames are per-group slices)
+@versioned_cache(maxsize=128)
 def compute_live_dynamic(
-    live_df,
-    bench_df,
+    _live_df,
+    _bench_df,
+    dataset_version,
     product_group,
     asof_choice,
     bench_mode,
@@ -27,62 +300,55 @@ def compute_live_dynamic(
     manual_days_per_unit,
     due_soon_days,
 ):
-    asof_date = resolve_asof_date(live_df, asof_choice)
+    index = get_due_index(_live_df, _bench_df, dataset_version, bench_mode, bench_quantile, manual_days_per_unit)
+    asof_date = resolve_asof_date(index.frame, asof_choice)
     days_per_unit = resolve_benchmark_days_per_unit(
-        bench_df, product_group, bench_mode, bench_quantile, manual_days_per_unit
+        _bench_df, product_group, bench_mode, bench_quantile, manual_days_per_unit
     )
 
-    df = live_df[live_df["product_group"] == product_group].copy()
-    df["last_purchase_date"] = pd.to_datetime(df["last_purchase_date"])
-
-    units = df["bottles_owned_effective"].fillna(1).clip(lower=1)
-    df["coverage_days_est"] = (days_per_unit * units).round().astype(int)
-
-    df["due_date"] = df["last_purchase_date"] + pd.to_timedelta(df["coverage_days_est"], unit="D")
-    df["days_to_due"] = (df["due_date"] - asof_date).dt.days
-
-    df["status"] = "ok"
-    df.loc[df["days_to_due"] < 0, "status"] = "overdue"
-    df.loc[(df["days_to_due"] >= 0) & (df["days_to_due"] <= due_soon_days), "status"] = "due_soon"
-    df["actionable_status"] = df["status"]
+    df = materialize_status(index, asof_date, due_soon_days, product_group)
 
     return df, asof_date, days_per_unit
 
-@st.cache_data(show_spinner=False)
+@versioned_cache(maxsize=8)
 def compute_live_dynamic_all_groups(
-    live_df: pd.DataFrame,
-    bench_df: pd.DataFrame,
+    _live_df: pd.DataFrame,
+    _bench_df: pd.DataFrame,
+    dataset_version: str,
     asof_choice: str,
     bench_mode: str,
     bench_quantile: str | None,
     manual_days_per_unit: float | None,
     due_soon_days: int,
 ) -> tuple[pd.DataFrame, pd.Timestamp]:
-    asof_date = resolve_asof_date(live_df, asof_choice)
-
-    base = live_df.copy()
-    base["last_purchase_date"] = pd.to_datetime(base["last_purchase_date"])
-
-    if bench_mode == "manual":
-        dpu = pd.DataFrame({
-            "product_group": base["product_group"].dropna().unique(),
-            "days_per_unit": float(manual_days_per_unit),
-        })
-    else:
-        dpu = bench_df[["product_group", bench_quantile]].rename(columns={bench_quantile: "days_per_unit"})
+    index = get_due_index(_live_df, _bench_df, dataset_version, bench_mode, bench_quantile, manual_days_per_unit)
+    asof_date = resolve_asof_date(index.frame, asof_choice)
 
-    df = base.merge(dpu, on="product_group", how="left")
-    df["days_per_unit"] = pd.to_numeric(df["days_per_unit"], errors="coerce").fillna(90.0)
+    df = materialize_status(index, asof_date, due_soon_days)
 
-    units = df["bottles_owned_effective"].fillna(1).clip(lower=1)
-    df["coverage_days_est"] = (df["days_per_unit"] * units).round().astype(int)
-
-    df["due_date"] = df["last_purchase_date"] + pd.to_timedelta(df["coverage_days_est"], unit="D")
-    df["days_to_due"] = (df["due_date"] - asof_date).dt.days
+    return df, asof_date
 
-    df["status"] = "ok"
-    df.loc[df["days_to_due"] < 0, "status"] = "overdue"
-    df.loc[(df["days_to_due"] >= 0) & (df["days_to_due"] <= due_soon_days), "status"] = "due_soon"
-    df["actionable_status"] = df["status"]
+@versioned_cache(maxsize=128)
+def compute_status_counts(
+    _live_df: pd.DataFrame,
+    _bench_df: pd.DataFrame,
+    dataset_version: str,
+    product_group,
+    asof_choice: str,
+    bench_mode: str,
+    bench_quantile: str | None,
+    manual_days_per_unit: float | None,
+    due_soon_days: int,
+) -> pd.DataFrame:
+    """Live-status rows per status for one product group, read off the due-date index (no per-row pass)."""
+    index = get_due_index(_live_df, _bench_df, dataset_version, bench_mode, bench_quantile, manual_days_per_unit)
+    asof_date = resolve_asof_date(index.frame, asof_choice)
 
-    return df, asof_date
+    counts = index.counts(asof_date, due_soon_days)
+    row = counts[counts["product_group"] == product_group]
+    customers = [int(row[s].sum()) for s in STATUS_LABELS]
+    out = pd.DataFrame({"status": list(STATUS_LABELS), "customers": customers})
+    out = out.sort_values("customers", ascending=False, kind="stable").reset_index(drop=True)
+    total = out["customers"].sum()
+    out["pct"] = (out["customers"] / total * 100).round(1) if total else 0.0
+    return out
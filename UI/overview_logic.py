@@ -0,0 +1,140 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import pandas as pd
+import numpy as np
+
+from UI.data_io import versioned_cache
+from UI.live_logic import STATUS_DUE_SOON, STATUS_LABELS
+
+# ---------- Customer index ----------
+@dataclass(frozen=True)
+class CustomerIndex:
+    """
+    Rows of the live table grouped by customer.
+
+    `customers` is sorted, so a customer resolves with one searchsorted and
+    its rows are `order[offsets[i]:offsets[i + 1]]`.
+    """
+    customers: np.ndarray   # sorted anon labels (str)
+    offsets: np.ndarray     # len = n_customers + 1
+    order: np.ndarray       # live row positions sorted by customer
+    codes: np.ndarray       # customer code per live row
+
+    def position(self, anon) -> int:
+        i = int(np.searchsorted(self.customers, str(anon)))
+        if i < len(self.customers) and self.customers[i] == str(anon):
+            return i
+        return -1
+
+    def rows(self, anon) -> np.ndarray:
+        i = self.position(anon)
+        if i < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.order[self.offsets[i]:self.offsets[i + 1]]
+
+def build_customer_index(live_df: pd.DataFrame) -> CustomerIndex:
+    codes, customers = pd.factorize(live_df["anon"].astype(str), sort=True)
+    order = np.argsort(codes, kind="stable")
+    offsets = np.searchsorted(codes[order], np.arange(len(customers) + 1), side="left")
+    return CustomerIndex(
+        customers=np.asarray(customers, dtype=object),
+        offsets=offsets.astype(np.int64),
+        order=order.astype(np.int64),
+        codes=codes.astype(np.int64),
+    )
+
+@versioned_cache(maxsize=2)
+def get_customer_index(_live_all: pd.DataFrame, dataset_version: str) -> CustomerIndex:
+    # live_all keeps the same row order for every benchmark / ASOF choice,
+    # so one index per dataset version serves all of them
+    return build_customer_index(_live_all)
+
+def attach_ltv_scores(rows: pd.DataFrame, scores: pd.DataFrame) -> pd.DataFrame:
+    """Add expected_purchases / expected_revenue per customer (NaN where unscored)."""
+    pos = pd.Index(scores["anon"].astype(str)).get_indexer(rows["anon"].astype(str))
+    out = rows.copy()
+    for col in ("expected_purchases", "expected_revenue"):
+        vals = np.append(scores[col].to_numpy(dtype=float), np.nan)
+        out[col] = vals[pos]   # pos == -1 picks the trailing NaN
+    return out
+
+# ---------- Sparse status matrix ----------
+@dataclass(frozen=True)
+class StatusMatrix:
+    """customer × product_group → status code, stored CSR-style (one row per customer)."""
+    customers: np.ndarray
+    product_groups: np.ndarray
+    indptr: np.ndarray        # len = n_customers + 1
+    group_codes: np.ndarray   # column index per entry
+    status_codes: np.ndarray  # STATUS_LABELS code per entry
+    entry_rows: np.ndarray    # customer row per entry
+
+    def filter_rows(
+        self,
+        actionable_only: bool = True,
+        product_groups: list | None = None,
+        contains: str = "",
+    ) -> np.ndarray:
+        """Customer rows with at least one entry matching the filters."""
+        # entries without a product group (code -1) have no matrix column
+        mask = self.group_codes >= 0
+        if product_groups:
+            mask &= np.isin(self.group_codes, np.flatnonzero(np.isin(self.product_groups, product_groups)))
+        if actionable_only:
+            mask &= self.status_codes >= STATUS_DUE_SOON
+
+        keep = np.zeros(len(self.customers), dtype=bool)
+        keep[self.entry_rows[mask]] = True
+        if contains:
+            keep &= pd.Series(self.customers).str.contains(contains, case=False, regex=False).to_numpy()
+        return np.flatnonzero(keep)
+
+    def page(
+        self,
+        rows: np.ndarray,
+        page: int,
+        page_size: int,
+        product_groups: list | None = None,
+    ) -> pd.DataFrame:
+        """Dense status labels for one page of customer rows only."""
+        sel = rows[page * page_size:(page + 1) * page_size]
+        dense = np.full((len(sel), len(self.product_groups)), -1, dtype=np.int8)
+        for i, r in enumerate(sel):
+            lo, hi = self.indptr[r], self.indptr[r + 1]
+            has_group = self.group_codes[lo:hi] >= 0
+            dense[i, self.group_codes[lo:hi][has_group]] = self.status_codes[lo:hi][has_group]
+
+        labels = np.asarray((None,) + STATUS_LABELS, dtype=object)[dense + 1]
+        out = pd.DataFrame(labels, index=pd.Index(self.customers[sel], name="anon"), columns=self.product_groups)
+        if product_groups:
+            out = out[[c for c in self.product_groups if c in product_groups]]
+        return out
+
+def build_status_matrix(live_all: pd.DataFrame, cust_index: CustomerIndex) -> StatusMatrix:
+    group_codes, product_groups = pd.factorize(live_all["product_group"], sort=True)
+    status_codes = pd.Categorical(live_all["status"], categories=list(STATUS_LABELS)).codes
+
+    order = cust_index.order
+    return StatusMatrix(
+        customers=cust_index.customers,
+        product_groups=np.asarray(product_groups, dtype=object),
+        indptr=cust_index.offsets,
+        group_codes=group_codes[order],
+        status_codes=status_codes[order].astype(np.int8),
+        entry_rows=cust_index.codes[order],
+    )
+
+@versioned_cache(maxsize=8)
+def get_status_matrix(
+    _live_all: pd.DataFrame,
+    _cust_index: CustomerIndex,
+    dataset_version: str,
+    asof_choice: str,
+    bench_mode: str,
+    bench_quantile: str | None,
+    manual_days_per_unit: float | None,
+    due_soon_days: int,
+) -> StatusMatrix:
+    # statuses change with the live controls (same key as compute_live_dynamic_all_groups);
+    # the customer index they are laid out on does not
+    return build_status_matrix(_live_all, _cust_index)
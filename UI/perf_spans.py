@@ -0,0 +1,132 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+from UI.data_io import thread_cache_counts
+
+SPANS_PATH = Path("data/perf/app_spans.jsonl")
+HISTORY_RERUNS = 20          # reruns kept per session for the performance panel
+_RSS_INTERVAL = 0.005        # seconds between RSS samples inside a span
+
+# ---------- RSS ----------
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+def rss_bytes() -> int | None:
+    """Current resident set size (Linux /proc); None where it is not available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _RssPeak:
+    """Highest RSS seen while the block runs, sampled from a daemon thread."""
+
+    def __enter__(self) -> "_RssPeak":
+        self.base = self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.base is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self) -> None:
+        while not self._stop.wait(_RSS_INTERVAL):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    @property
+    def delta_mb(self) -> float | None:
+        return None if self.base is None else round((self.peak - self.base) / 2**20, 1)
+
+# ---------- Spans ----------
+@dataclass
+class Span:
+    name: str
+    seconds: float = 0.0
+    rows: int | None = None
+    peak_rss_delta_mb: float | None = None
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+class RerunTrace:
+    """
+    Timed stages of one app rerun.
+
+    Spans are flat (one stage at a time, in script order). Cache hits / misses
+    are the versioned_cache lookups made by the script thread during the span,
+    so the background warm-up does not show up in them; RSS is process-wide.
+    """
+
+    def __init__(self):
+        self.started = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self.spans: list[Span] = []
+        self.seconds: float | None = None
+
+    @contextmanager
+    def span(self, name: str, rows: int | None = None):
+        """Time the block; set `.rows` on the yielded Span once the row count is known."""
+        s = Span(name, rows=rows)
+        hits0, misses0 = thread_cache_counts()
+        mem = _RssPeak()
+        t0 = time.perf_counter()
+        try:
+            with mem:
+                yield s
+        finally:
+            s.seconds = round(time.perf_counter() - t0, 6)
+            s.peak_rss_delta_mb = mem.delta_mb
+            hits1, misses1 = thread_cache_counts()
+            s.cache_hits, s.cache_misses = hits1 - hits0, misses1 - misses0
+            self.spans.append(s)
+
+    def finish(self, **context) -> dict:
+        """Close the rerun; returns its JSON-ready record (`context`: dataset version, controls)."""
+        self.seconds = round(time.perf_counter() - self._t0, 6)
+        return {
+            "timestamp": self.started.isoformat(timespec="milliseconds"),
+            "rerun_s": self.seconds,
+            **context,
+            "spans": [asdict(s) for s in self.spans],
+        }
+
+def spans_frame(record: dict) -> pd.DataFrame:
+    df = pd.DataFrame(record["spans"], columns=list(Span.__dataclass_fields__))
+    df["share_pct"] = (df["seconds"] / record["rerun_s"] * 100).round(1) if record["rerun_s"] else 0.0
+    return df
+
+def reruns_frame(history: list[dict]) -> pd.DataFrame:
+    # one row per rerun: latency and its slowest stage
+    rows = []
+    for r in history:
+        slowest = max(r["spans"], key=lambda s: s["seconds"], default=None)
+        rows.append({
+            "timestamp": r["timestamp"],
+            "rerun_s": r["rerun_s"],
+            "slowest_stage": slowest["name"] if slowest else None,
+            "slowest_s": slowest["seconds"] if slowest else None,
+            "cache_misses": sum(s["cache_misses"] for s in r["spans"]),
+        })
+    return pd.DataFrame(rows)
+
+def append_jsonl(record: dict, path: Path = SPANS_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+import pandas as pd
+import numpy as np
+
+from pipeline.retention import (
+    DISTRIBUTIONS_PATH,
+    RetentionDistributions,
+    build_retention_distributions,
+    read_retention_distributions,
+)
+from UI.data_io import FILES, file_hash, versioned_cache
+
+ECDF_MAX_POINTS = 2_000
+HIST_BINS = 40
+
+# ---------- Per-group sorted intervals ----------
+# built by the pipeline's retention_distributions stage; rebuilt here only when it is missing or stale
+@versioned_cache(maxsize=2)
+def get_retention_distributions(_intervals: pd.DataFrame, dataset_version: str) -> RetentionDistributions:
+    # the sidecar is current when it was built from this purchase_intervals file; the
+    # dataset version also covers files (sketches, LTV scores) the sidecar does not read
+    source = file_hash(FILES["purchase_intervals"])
+    if DISTRIBUTIONS_PATH.exists():
+        dist = read_retention_distributions(DISTRIBUTIONS_PATH)
+        if dist.source_version == source:
+            return dist
+    return build_retention_distributions(_intervals, source)
+
+# ---------- Chart-ready reductions ----------
+def ecdf_points(xs: np.ndarray, max_points: int = ECDF_MAX_POINTS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    ECDF of sorted `xs` reduced to at most `max_points` points.
+
+    Points are picked at evenly spaced ranks (first and last always kept), so
+    between two plotted points the true curve rises by at most ~1/max_points:
+    the vertical error of the drawn step curve stays below that bound.
+    """
+    n = len(xs)
+    if n <= max_points:
+        return xs, np.arange(1, n + 1) / n
+    idx = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+    return xs[idx], (idx + 1) / n
+
+def log_histogram(xs: np.ndarray, clip_val: float, bins: int = HIST_BINS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Counts of sorted `xs` (clipped at `clip_val`) in `bins` equal-width log1p bins.
+
+    Returns (log1p edges, counts); computed with searchsorted, so the cost
+    depends on the number of bins, not on the number of intervals.
+    """
+    lo, hi = np.log1p(xs[0]), np.log1p(min(xs[-1], clip_val))
+    if hi <= lo:
+        hi = lo + 1e-9
+    edges = np.linspace(lo, hi, bins + 1)
+    cuts = np.searchsorted(xs, np.expm1(edges[1:-1]), side="left")
+    counts = np.diff(np.concatenate(([0], cuts, [len(xs)])))
+    return edges, counts
@@ -4,44 +4,61 @@ import plotly.graph_objects as go
 import pandas as pd
 import streamlit as st
 
+from UI.data_io import versioned_cache
+from UI.perf_spans import reruns_frame, spans_frame
+
 def benchmark_label(bench_mode: str, bench_quantile: str | None, manual_days_per_unit: float | None) -> str:
     if bench_mode == "manual":
         return f"Manual retention = {float(manual_days_per_unit):.0f} days/unit"
     return f"Benchmark = {bench_quantile} days/unit (per product group)"
 
-def plot_urgency_stacked_counts(metrics: pd.DataFrame) -> None:
-    fig = go.Figure()
+# ---------- Status charts ----------
+# Built from pre-aggregated counts only (one bar per status / product group) and
+# memoized per (dataset_version, controls) in a bounded LRU, so reruns neither
+# create new figures nor grow with the customer count. Cached figures are
+# read-only: st.plotly_chart serializes a copy.
+STATUS_BARS = (("ok", "OK"), ("due_soon", "Due soon"), ("overdue", "Overdue"))
 
-    fig.add_trace(
+@versioned_cache(maxsize=128)
+def live_status_figure(_status_counts: pd.DataFrame, dataset_version: str, controls: tuple) -> go.Figure:
+    fig = go.Figure(
         go.Bar(
-            x=metrics["product_group"],
-            y=metrics["ok_customers"],
-            name="OK",
-            text=(metrics["ok_rate_pct"].round(1)).astype(str) + "%",
-            textposition="inside",
-            hovertemplate="OK: %{y:,} (%{text})<extra></extra>",
+            x=_status_counts["status"].to_numpy(),
+            y=_status_counts["customers"].to_numpy(),
+            customdata=_status_counts["pct"].to_numpy(),
+            texttemplate="%{customdata}%",
+            textposition="outside",
+            hovertemplate="%{x}: %{y:,} (%{customdata}%)<extra></extra>",
         )
     )
-    fig.add_trace(
-        go.Bar(
-            x=metrics["product_group"],
-            y=metrics["due_soon_customers"],
-            name="Due soon",
-            text=(metrics["due_soon_rate_pct"].round(1)).astype(str) + "%",
-            textposition="inside",
-            hovertemplate="Due soon: %{y:,} (%{text})<extra></extra>",
-        )
+    fig.update_layout(
+        height=360,
+        margin=dict(l=30, r=20, t=30, b=40),
+        yaxis_title="Customers (count)",
+        showlegend=False,
     )
-    fig.add_trace(
-        go.Bar(
-            x=metrics["product_group"],
-            y=metrics["overdue_customers"],
-            name="Overdue",
-            text=(metrics["overdue_rate_pct"].round(1)).astype(str) + "%",
-            textposition="inside",
-            hovertemplate="Overdue: %{y:,} (%{text})<extra></extra>",
+    return fig
+
+def plot_live_status(status_counts: pd.DataFrame, dataset_version: str, controls: tuple) -> None:
+    st.plotly_chart(live_status_figure(status_counts, dataset_version, controls), use_container_width=True)
+
+@versioned_cache(maxsize=16)
+def urgency_figure(_metrics: pd.DataFrame, dataset_version: str, controls: tuple) -> go.Figure:
+    fig = go.Figure()
+    groups = _metrics["product_group"].to_numpy()
+    for status, name in STATUS_BARS:
+        # rates go in as numbers; plotly formats the labels client-side
+        fig.add_trace(
+            go.Bar(
+                x=groups,
+                y=_metrics[f"{status}_customers"].to_numpy(),
+                customdata=_metrics[f"{status}_rate_pct"].to_numpy(),
+                name=name,
+                texttemplate="%{customdata:.1f}%",
+                textposition="inside",
+                hovertemplate=f"{name}: %{{y:,}} (%{{customdata:.1f}}%)<extra></extra>",
+            )
         )
-    )
 
     fig.update_layout(
         barmode="stack",
@@ -51,5 +68,91 @@ def plot_urgency_stacked_counts(metrics: pd.DataFrame) -> None:
         xaxis_title="Product group",
         legend_title_text="Status",
     )
+    return fig
+
+def plot_urgency_stacked_counts(metrics: pd.DataFrame, dataset_version: str, controls: tuple) -> None:
+    st.plotly_chart(urgency_figure(metrics, dataset_version, controls), use_container_width=True)
+
+def plot_status_backtest(series: pd.DataFrame) -> None:
+    fig = go.Figure()
+    for col, name in [("ok", "OK"), ("due_soon", "Due soon"), ("overdue", "Overdue")]:
+        fig.add_trace(
+            go.Scatter(
+                x=series["date"],
+                y=series[col],
+                name=name,
+                mode="lines",
+                stackgroup="status",
+                hovertemplate=f"{name}: %{{y:,}}<extra></extra>",
+            )
+        )
+
+    fig.update_layout(
+        height=420,
+        margin=dict(l=30, r=20, t=40, b=40),
+        yaxis_title="Customer × product rows",
+        xaxis_title="ASOF date",
+        legend_title_text="Status",
+        hovermode="x unified",
+    )
 
     st.plotly_chart(fig, use_container_width=True)
+
+def plot_backtest_quantiles(rates: pd.DataFrame) -> None:
+    fig = go.Figure()
+    for quantile, dfq in rates.groupby("benchmark", sort=False):
+        fig.add_trace(
+            go.Scatter(
+                x=dfq["date"],
+                y=dfq["overdue_rate_pct"],
+                name=quantile,
+                mode="lines",
+                hovertemplate=f"{quantile}: %{{y:.1f}}%<extra></extra>",
+            )
+        )
+
+    fig.update_layout(
+        height=380,
+        margin=dict(l=30, r=20, t=40, b=40),
+        yaxis_title="Overdue rate (%)",
+        xaxis_title="ASOF date",
+        legend_title_text="Benchmark",
+        hovermode="x unified",
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_warmup_progress(job) -> None:
+    """Sidebar progress of the background cache warm-up (polls once a second while it runs)."""
+    polling = job.running
+
+    @st.fragment(run_every=1.0 if polling else None)
+    def _progress():
+        if job.running:
+            st.progress(job.fraction, text=f"Warming caches: {job.done + job.failed}/{job.total}")
+        elif polling:
+            # finished since the last full run: rerun once to stop polling
+            st.rerun()
+        else:
+            failed = f", {job.failed} failed" if job.failed else ""
+            st.caption(f"Caches warm ({job.done}/{job.total} precomputed{failed})")
+
+    _progress()
+
+def render_perf_panel(record: dict, history: list[dict]) -> None:
+    """Per-stage timings of the last rerun plus recent rerun latencies (debug sidebar)."""
+    st.caption(f"Last rerun: {record['rerun_s']:.3f}s (panel excluded)")
+    st.dataframe(
+        spans_frame(record),
+        hide_index=True,
+        column_config={
+            "seconds": st.column_config.NumberColumn("s", format="%.3f"),
+            "peak_rss_delta_mb": st.column_config.NumberColumn("peak RSS Δ (MB)", format="%.1f"),
+            "cache_hits": "hits",
+            "cache_misses": "misses",
+            "share_pct": st.column_config.NumberColumn("% of rerun", format="%.1f"),
+        },
+    )
+    if len(history) > 1:
+        st.caption("Recent reruns (this session)")
+        st.dataframe(reruns_frame(history[::-1]), hide_index=True)
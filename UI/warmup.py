@@ -0,0 +1,138 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import threading
+import pandas as pd
+
+from UI.compare_logic import get_live_codes, interval_metrics
+from UI.live_logic import compute_live_dynamic, compute_live_dynamic_all_groups
+from UI.retention_logic import get_retention_distributions
+
+WARMUP_QUANTILES = ("p25", "median", "p75")
+DEFAULT_WORKERS = 2
+
+# ---------- Job ----------
+@dataclass
+class WarmupJob:
+    """
+    Background fill of the versioned caches for one (dataset, ASOF, due-soon) setting.
+
+    Tasks run in a thread pool so results land in the same process-wide
+    caches the app reads; `versioned_cache` makes a rerun that asks for a key
+    still being warmed wait for it rather than compute it again.
+    """
+    key: tuple
+    total: int
+    done: int = 0
+    failed: int = 0
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return self.done + self.failed < self.total and not self.cancelled.is_set()
+
+    @property
+    def fraction(self) -> float:
+        return (self.done + self.failed) / self.total if self.total else 1.0
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def _run(self, fn, args) -> None:
+        if self.cancelled.is_set():
+            return
+        try:
+            fn(*args)
+            ok = True
+        except Exception:
+            # the foreground rerun recomputes (and reports) anything that failed here
+            ok = False
+        with self.lock:
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+
+def _warm_compare(live_df, bench_df, dataset_version, asof_choice, q, due_soon_days) -> None:
+    # Compare tab: all-groups frame plus the factorized codes product_group_metrics reuses
+    live_all, _ = compute_live_dynamic_all_groups(live_df, bench_df, dataset_version, asof_choice, "quantile", q, None, due_soon_days)
+    get_live_codes(live_all, dataset_version)
+
+def plan_warmup(
+    live_df: pd.DataFrame,
+    intervals: pd.DataFrame,
+    bench_df: pd.DataFrame,
+    dataset_version: str,
+    product_groups: list,
+    asof_choice: str,
+    due_soon_days: int,
+    first: tuple | None = None,
+    quantiles: tuple[str, ...] = WARMUP_QUANTILES,
+) -> list[tuple]:
+    """
+    (fn, args) tasks covering what the tabs compute per product group × quantile.
+
+    The current (product group, quantile) selection `first` goes first, then
+    its quantile for every group; per-group frames stop at the cache size so
+    warming never evicts its own earlier entries.
+    """
+    pg_first, q_first = first if first is not None else (None, None)
+    quantiles = sorted(quantiles, key=lambda q: q != q_first)
+    groups = sorted(product_groups, key=lambda g: g != pg_first)
+
+    tasks = [
+        (get_retention_distributions, (intervals, dataset_version)),
+        (interval_metrics, (intervals, dataset_version)),
+    ]
+    for q in quantiles:
+        tasks.append((_warm_compare, (live_df, bench_df, dataset_version, asof_choice, q, due_soon_days)))
+
+    budget = compute_live_dynamic.cache_stats()["maxsize"]
+    per_group = [
+        (compute_live_dynamic, (live_df, bench_df, dataset_version, g, asof_choice, "quantile", q, None, due_soon_days))
+        for q in quantiles
+        for g in groups
+    ]
+    return tasks + per_group[:budget]
+
+# ---------- Registry ----------
+_JOBS: dict[tuple, WarmupJob] = {}
+_JOBS_LOCK = threading.Lock()
+_POOL: ThreadPoolExecutor | None = None
+
+def start_warmup(
+    live_df: pd.DataFrame,
+    intervals: pd.DataFrame,
+    bench_df: pd.DataFrame,
+    dataset_version: str,
+    product_groups: list,
+    asof_choice: str,
+    due_soon_days: int,
+    first: tuple | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> WarmupJob:
+    """
+    Start (or return the already started) warm-up for this setting.
+
+    Jobs for other settings are cancelled: their remaining tasks are skipped,
+    the running ones finish.
+    """
+    global _POOL
+    key = (dataset_version, asof_choice, int(due_soon_days))
+    with _JOBS_LOCK:
+        job = _JOBS.get(key)
+        if job is not None and not job.cancelled.is_set():
+            return job
+        for other in _JOBS.values():
+            other.cancel()
+        _JOBS.clear()
+
+        tasks = plan_warmup(live_df, intervals, bench_df, dataset_version, product_groups, asof_choice, due_soon_days, first)
+
+        job = _JOBS[key] = WarmupJob(key=key, total=len(tasks))
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cache-warmup")
+        for fn, args in tasks:
+            _POOL.submit(job._run, fn, args)
+    return job
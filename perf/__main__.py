@@ -0,0 +1,57 @@
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import sys
+
+from perf.harness import CASES, DEFAULT_REPEAT, DEFAULT_THRESHOLD, HISTORY_PATH, compare, load_history, run_benchmarks
+from perf.synthetic import DEFAULT_CHUNK_CUSTOMERS, SYNTHETIC_DIR, generate
+
+def _print_compare(history_path: Path, threshold: float) -> int:
+    table = compare(load_history(history_path), threshold)
+    if table.empty:
+        print("no benchmark history yet")
+        return 0
+    print(f"baseline: {table.attrs['baseline'] or 'none (first comparable run)'}")
+    print(table.to_string(index=False))
+    return 1 if "regression" in table.columns and table["regression"].any() else 0
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m perf", description="Synthetic data and benchmarks for the UI compute layer and pipelines.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="write a synthetic dataset")
+    gen.add_argument("--customers", type=int, default=100_000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--out", type=Path, default=None, help=f"default: {SYNTHETIC_DIR.as_posix()}/<customers>")
+    gen.add_argument("--chunk-customers", type=int, default=DEFAULT_CHUNK_CUSTOMERS)
+
+    run = sub.add_parser("run", help="benchmark on a synthetic dataset and append to the history")
+    run.add_argument("--data", type=Path, required=True)
+    run.add_argument("--cases", nargs="*", choices=list(CASES), default=None, help="default: all")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--history", type=Path, default=HISTORY_PATH)
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run.add_argument("--fail-on-regression", action="store_true")
+
+    cmp = sub.add_parser("compare", help="latest run against the previous comparable one")
+    cmp.add_argument("--history", type=Path, default=HISTORY_PATH)
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        out = args.out or SYNTHETIC_DIR / str(args.customers)
+        manifest = generate(out, args.customers, args.seed, args.chunk_customers)
+        for name, rows in manifest["rows"].items():
+            print(f"{name}: {rows:,} rows")
+        return 0
+
+    if args.command == "run":
+        run_benchmarks(args.data, args.cases, args.repeat, args.history)
+        status = _print_compare(args.history, args.threshold)
+        return status if args.fail_on_regression else 0
+
+    return _print_compare(args.history, args.threshold)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import Callable
+import gc
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from perf.synthetic import (
+    BENCHMARKS_NAME,
+    INTERVALS_NAME,
+    LIVE_NAME,
+    ORDERS_NAME,
+    SKU_LOOKUP_NAME,
+    read_manifest,
+)
+
+HISTORY_PATH = Path("data/perf/history.jsonl")
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2      # slower / bigger by more than 20% counts as a regression
+# absolute noise floors: smaller changes never count as regressions
+MIN_WALL_DELTA_S = 0.005
+MIN_PEAK_DELTA_MB = 16.0
+DECODE_ORDERS = 200_000      # orders per decode_chunk call (pipeline.decode's batch size)
+_ARROW_INTERVAL = 0.002      # seconds between Arrow pool samples
+
+# ---------- Inputs ----------
+class BenchInputs:
+    """Synthetic inputs read lazily, the way the app / pipeline read them."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.manifest = read_manifest(data_dir)
+
+    @cached_property
+    def dfs(self) -> dict[str, pd.DataFrame]:
+        from UI.data_io import LOAD_COLUMNS, read_projected
+        files = {
+            "live_customer_product_state": LIVE_NAME,
+            "purchase_intervals": INTERVALS_NAME,
+            "retention_benchmarks": BENCHMARKS_NAME,
+        }
+        return {
+            key: read_projected(self.data_dir / name, LOAD_COLUMNS[key], categorical=key != "retention_benchmarks")
+            for key, name in files.items()
+        }
+
+    @cached_property
+    def largest_group(self) -> str:
+        return str(self.dfs["live_customer_product_state"]["product_group"].value_counts().index[0])
+
+    @cached_property
+    def live_all(self) -> pd.DataFrame:
+        from UI.live_logic import compute_live_dynamic_all_groups
+        live, bench = self.dfs["live_customer_product_state"], self.dfs["retention_benchmarks"]
+        return compute_live_dynamic_all_groups(live, bench, "perf", "dataset", "quantile", "median", None, 14)[0]
+
+    @cached_property
+    def orders(self) -> pd.DataFrame:
+        from pipeline.decode import ORDER_COLS
+        dataset = ds.dataset(self.data_dir / ORDERS_NAME, format="parquet", partitioning="hive")
+        return dataset.head(DECODE_ORDERS, columns=list(ORDER_COLS)).to_pandas()
+
+    @cached_property
+    def sku_lookup(self):
+        from pipeline.decode import load_sku_lookup
+        return load_sku_lookup(self.data_dir / SKU_LOOKUP_NAME)
+
+    @cached_property
+    def kernel(self):
+        from simulation.markov_kernel import open_kernel
+        return open_kernel()
+
+# ---------- Cases ----------
+@dataclass(frozen=True)
+class Case:
+    """`prepare(inputs)` runs untimed and returns the zero-argument call that is measured."""
+    name: str
+    prepare: Callable[[BenchInputs], Callable[[], object]]
+
+def _cold(fn: Callable[[], object]) -> Callable[[], object]:
+    # every repeat starts from empty versioned caches, like the first view after a data refresh
+    from UI.data_io import clear_caches
+
+    def run():
+        clear_caches()
+        return fn()
+    return run
+
+def _load_parquets(inputs: BenchInputs):
+    def run():
+        inputs.__dict__.pop("dfs", None)   # re-read on every call
+        return inputs.dfs
+    return run
+
+def _compute_live_dynamic(inputs: BenchInputs):
+    from UI.live_logic import compute_live_dynamic
+    live, bench, group = inputs.dfs["live_customer_product_state"], inputs.dfs["retention_benchmarks"], inputs.largest_group
+    return _cold(lambda: compute_live_dynamic(live, bench, "perf", group, "dataset", "quantile", "median", None, 14))
+
+def _compute_live_dynamic_all_groups(inputs: BenchInputs):
+    from UI.live_logic import compute_live_dynamic_all_groups
+    live, bench = inputs.dfs["live_customer_product_state"], inputs.dfs["retention_benchmarks"]
+    return _cold(lambda: compute_live_dynamic_all_groups(live, bench, "perf", "dataset", "quantile", "median", None, 14))
+
+def _product_group_metrics(inputs: BenchInputs):
+    from UI.compare_logic import product_group_metrics
+    live_all, intervals = inputs.live_all, inputs.dfs["purchase_intervals"]
+    return _cold(lambda: product_group_metrics(live_all, intervals, "perf"))
+
+def _decode_chunk(inputs: BenchInputs):
+    from pipeline.decode import decode_chunk
+    orders, lookup = inputs.orders, inputs.sku_lookup
+    return lambda: decode_chunk(orders, lookup)
+
+def _markov_simulate(inputs: BenchInputs):
+    # one path per synthetic customer, consumed chunk by chunk like run_monte_carlo
+    from simulation.markov_sim import simulate_chunks
+    kernel, n = inputs.kernel, inputs.manifest["n_customers"]
+    return lambda: sum(len(c["S_k"]) for c in simulate_chunks(kernel, "CO2", n, k_start=2, k_max=15, seed=42))
+
+def _markov_exact(inputs: BenchInputs):
+    from simulation.markov_exact import propagate
+    kernel = inputs.kernel
+    return lambda: propagate(kernel, s0="CO2", k_start=2, k_max=15)
+
+CASES = {
+    c.name: c
+    for c in (
+        Case("load_parquets", _load_parquets),
+        Case("compute_live_dynamic", _compute_live_dynamic),
+        Case("compute_live_dynamic_all_groups", _compute_live_dynamic_all_groups),
+        Case("product_group_metrics", _product_group_metrics),
+        Case("decode_chunk", _decode_chunk),
+        Case("markov_simulate", _markov_simulate),
+        Case("markov_exact", _markov_exact),
+    )
+}
+
+# ---------- Measurement ----------
+class _PeakMemory:
+    """
+    Peak bytes allocated during one call above what was allocated before it.
+
+    tracemalloc covers Python objects and NumPy / pandas buffers; Arrow
+    buffers (pandas string columns, parquet reads) bypass it, so the Arrow
+    pool is sampled from a thread and its peak added.
+    """
+
+    def __enter__(self) -> "_PeakMemory":
+        gc.collect()
+        self.arrow_base = self.arrow_peak = pa.total_allocated_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        tracemalloc.start()
+        self._thread.start()
+        return self
+
+    def _sample(self) -> None:
+        while not self._stop.wait(_ARROW_INTERVAL):
+            self.arrow_peak = max(self.arrow_peak, pa.total_allocated_bytes())
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.arrow_peak = max(self.arrow_peak, pa.total_allocated_bytes())
+        self.bytes = tracemalloc.get_traced_memory()[1] + self.arrow_peak - self.arrow_base
+        tracemalloc.stop()
+
+def measure(fn: Callable[[], object], repeat: int = DEFAULT_REPEAT) -> dict:
+    """
+    Wall times of `repeat` plain calls, then one extra traced call for peak memory.
+
+    Tracing slows Python-heavy code down, so it never overlaps a timed call.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+        del result
+    with _PeakMemory() as mem:
+        result = fn()
+    del result
+    return {
+        "wall_s": [round(t, 6) for t in times],
+        "wall_min_s": round(min(times), 6),
+        "wall_median_s": round(float(np.median(times)), 6),
+        "peak_mb": round(mem.bytes / 2**20, 1),
+    }
+
+# ---------- History ----------
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> dict:
+    import pyarrow
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+def run_benchmarks(
+    data_dir: Path,
+    cases: list[str] | None = None,
+    repeat: int = DEFAULT_REPEAT,
+    history_path: Path | None = HISTORY_PATH,
+) -> dict:
+    """Measure `cases` (default: all) on one synthetic dataset and append the record to the history."""
+    inputs = BenchInputs(data_dir)
+    results = {}
+    for name in cases or list(CASES):
+        fn = CASES[name].prepare(inputs)
+        results[name] = measure(fn, repeat)
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git("rev-parse", "--short", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "environment": environment(),
+        "dataset": {k: inputs.manifest[k] for k in ("n_customers", "seed", "rows")},
+        "repeat": repeat,
+        "results": results,
+    }
+    if history_path is not None:
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with history_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return record
+
+def load_history(path: Path = HISTORY_PATH) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+def _comparable(a: dict, b: dict) -> bool:
+    # same machine and same synthetic dataset; code versions are what differ
+    return (
+        a["environment"]["host"] == b["environment"]["host"]
+        and a["dataset"]["n_customers"] == b["dataset"]["n_customers"]
+        and a["dataset"]["seed"] == b["dataset"]["seed"]
+    )
+
+def compare(history: list[dict], threshold: float = DEFAULT_THRESHOLD) -> pd.DataFrame:
+    """
+    Latest record against the previous comparable one, per case.
+
+    Uses the minimum wall time (least noisy) and peak memory; `regression` is
+    set when either grew by more than `threshold` (and past the noise floors).
+    """
+    if not history:
+        return pd.DataFrame()
+    latest = history[-1]
+    baseline = next((r for r in reversed(history[:-1]) if _comparable(r, latest)), None)
+    rows = []
+    for name, cur in latest["results"].items():
+        base = baseline["results"].get(name) if baseline else None
+        row = {"case": name, "wall_min_s": cur["wall_min_s"], "peak_mb": cur["peak_mb"]}
+        if base is not None:
+            row["base_wall_min_s"] = base["wall_min_s"]
+            row["base_peak_mb"] = base["peak_mb"]
+            row["wall_ratio"] = cur["wall_min_s"] / base["wall_min_s"] if base["wall_min_s"] else np.nan
+            row["peak_ratio"] = cur["peak_mb"] / base["peak_mb"] if base["peak_mb"] else np.nan
+            slower = row["wall_ratio"] > 1 + threshold and cur["wall_min_s"] - base["wall_min_s"] > MIN_WALL_DELTA_S
+            bigger = row["peak_ratio"] > 1 + threshold and cur["peak_mb"] - base["peak_mb"] > MIN_PEAK_DELTA_MB
+            row["regression"] = bool(slower or bigger)
+        rows.append(row)
+    out = pd.DataFrame(rows)
+    out.attrs["baseline"] = None if baseline is None else baseline.get("git_commit")
+    return out
@@ -0,0 +1,291 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.benchmarks import BenchmarkSketches
+from pipeline.ledger import BOTTLE_FILTER_GROUP, DUE_SOON_DAYS, GROUP_COL
+
+ECOSYSTEM_MAP_PATH = Path("data/reference/products_ecosystem.csv")
+SYNTHETIC_DIR = Path("data/synthetic")
+
+# same file names as data/interim, so a synthetic directory can stand in for it
+LIVE_NAME = "live_customer_product_state.parquet"
+INTERVALS_NAME = "purchase_intervals.parquet"
+BENCHMARKS_NAME = "retention_benchmarks.parquet"
+ORDERS_NAME = "orders_landing.parquet"
+SKU_LOOKUP_NAME = "sku_lookup.json"
+MANIFEST_NAME = "synthetic.json"
+
+DEFAULT_CHUNK_CUSTOMERS = 250_000
+START = np.datetime64("2019-01-01", "D")
+END = np.datetime64("2025-12-31", "D")
+
+SOURCES = np.array(["sklep internetowy", "allegro", "sklep stacjonarny"], dtype=object)
+VARIANTS = ("", " 2-pak", " 3-pak")
+UNMATCHED_EVERY = 10   # every 10th group's last variant is left out of sku_lookup (regex_infer path)
+
+# ---------- Catalogue ----------
+def catalogue(seed: int = 0, path: Path = ECOSYSTEM_MAP_PATH) -> pd.DataFrame:
+    """
+    Product groups (the real products_ecosystem list) with synthetic behaviour.
+
+    weight: share of customer × group pairs (Zipf-like); days_per_unit: mean
+    adjusted retention; price: per unit.
+    """
+    groups = pd.read_csv(path, encoding="utf-8-sig")["product_group"].astype(str).str.strip().drop_duplicates().to_numpy()
+    rng = np.random.default_rng(seed)
+    weight = 1.0 / np.arange(1, len(groups) + 1) ** 0.9
+    return pd.DataFrame({
+        "product_group": groups,
+        "weight": rng.permutation(weight / weight.sum()),
+        "days_per_unit": rng.uniform(30, 240, len(groups)).round(),
+        "price": rng.uniform(20, 400, len(groups)).round(2),
+    })
+
+def item_names(groups: np.ndarray) -> np.ndarray:
+    """(n_groups, n_variants) item names, e.g. "Filtry do butelek Soft i Solid 3-pak"."""
+    labels = pd.Series(groups).str.replace(r"^\d+_", "", regex=True).str.strip()
+    return np.array([[f"{label[:1].upper()}{label[1:]}{v}" for v in VARIANTS] for label in labels], dtype=object)
+
+def sku_lookup(names: np.ndarray) -> dict:
+    # keys as they appear in produkty_clean (lowercase); a few names left unmatched on purpose
+    out = {}
+    for g in range(names.shape[0]):
+        for v in range(names.shape[1]):
+            if g % UNMATCHED_EVERY == 0 and v == names.shape[1] - 1:
+                continue
+            out[names[g, v].lower()] = {"sku": f"SKU{g:02d}{v}"}
+    return out
+
+# ---------- Events ----------
+def purchase_events(lo: int, hi: int, cat: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Purchase events (cust, group, day, qty, variant) for customers [lo, hi); day in days since epoch.
+
+    Each customer buys from 1+ product groups; within a group the gap after a
+    purchase is gamma-distributed around days_per_unit × that purchase's qty.
+    """
+    n = hi - lo
+    n_groups = len(cat)
+    per_cust = np.minimum(rng.geometric(0.55, n), 8)
+    cust = np.repeat(np.arange(lo, hi, dtype=np.int64), per_cust)
+    group = rng.choice(n_groups, size=len(cust), p=cat["weight"].to_numpy())
+    pair = np.unique(cust * n_groups + group)
+    cust, group = np.divmod(pair, n_groups)
+
+    n_buys = np.minimum(rng.geometric(0.4, len(pair)), 12)
+    first = _day(START) + rng.integers(0, _day(END) - _day(START) - 30, len(pair))
+    # half of a customer's other groups start in the same basket as their first one
+    lead = np.searchsorted(cust, cust)
+    first = np.where(rng.random(len(pair)) < 0.5, first[lead], first)
+    e_pair = np.repeat(np.arange(len(pair)), n_buys)
+    e_first = np.r_[True, e_pair[1:] != e_pair[:-1]]
+    qty = np.minimum(rng.geometric(0.7, len(e_pair)), 5)
+
+    dpu = cat["days_per_unit"].to_numpy()[group[e_pair]]
+    gap = np.floor(rng.gamma(2.0, dpu * qty / 2.0)).astype(np.int64) + 1
+    # day = first day + gaps after every earlier purchase of the pair
+    prev_gap = np.where(e_first, 0, np.r_[0, gap[:-1]])
+    csum = np.cumsum(prev_gap)
+    offset = csum - np.maximum.accumulate(np.where(e_first, csum, 0))
+    day = first[e_pair] + offset
+
+    keep = day <= _day(END)
+    return pd.DataFrame({
+        "cust": cust[e_pair][keep],
+        "group": group[e_pair][keep],
+        "day": day[keep],
+        "qty": qty[keep],
+        "variant": rng.integers(0, len(VARIANTS), int(keep.sum())),
+    })
+
+def _day(d: np.datetime64) -> int:
+    return int(d.astype("datetime64[D]").astype(np.int64))
+
+def _dates(days: np.ndarray) -> np.ndarray:
+    return days.astype("datetime64[D]").astype("datetime64[ns]")
+
+def anon_ids(cust: np.ndarray) -> np.ndarray:
+    # zero-padded, so string order = customer order across chunks
+    return np.char.add("A", np.char.zfill(cust.astype(str), 9)).astype(object)
+
+# ---------- Tables ----------
+def intervals_frame(ev: pd.DataFrame, groups: np.ndarray) -> pd.DataFrame:
+    """purchase_intervals (notebook 05 schema): consecutive purchases of a customer × group."""
+    ev = ev.sort_values(["cust", "group", "day"], kind="stable")
+    same = (ev["cust"].to_numpy()[1:] == ev["cust"].to_numpy()[:-1]) & (ev["group"].to_numpy()[1:] == ev["group"].to_numpy()[:-1])
+    cur, prev = ev.iloc[1:][same], ev.iloc[:-1][same]
+    delta = (cur["day"].to_numpy() - prev["day"].to_numpy()).astype(np.int64)
+    prev_qty = prev["qty"].to_numpy(dtype=float)
+    return pd.DataFrame({
+        "anon": anon_ids(cur["cust"].to_numpy()),
+        GROUP_COL: groups[cur["group"].to_numpy()],
+        "date": _dates(cur["day"].to_numpy()),
+        "prev_date": _dates(prev["day"].to_numpy()),
+        "delta_days": delta,
+        "prev_qty": prev_qty,
+        "adj_retention_days": delta / prev_qty,
+    })
+
+def live_frame(ev: pd.DataFrame, cat: pd.DataFrame, names: np.ndarray, asof: np.datetime64, rng: np.random.Generator) -> pd.DataFrame:
+    """live_customer_product_state (notebook 06 schema): last purchase per customer × group."""
+    groups = cat["product_group"].to_numpy()
+    last = ev.sort_values(["cust", "group", "day"], kind="stable").drop_duplicates(["cust", "group"], keep="last")
+    lpd = _dates(last["day"].to_numpy())
+    live = pd.DataFrame({
+        "anon": anon_ids(last["cust"].to_numpy()),
+        GROUP_COL: groups[last["group"].to_numpy()],
+        "last_purchase_date": lpd,
+        "last_matrix_name": names[last["group"].to_numpy(), last["variant"].to_numpy()],
+        "days_since_last_purchase": _day(asof) - last["day"].to_numpy(),
+    })
+
+    # bottle-filter rows carry the equipment columns, like the ledger's live_state
+    is_bf = live[GROUP_COL].eq(BOTTLE_FILTER_GROUP).to_numpy()
+    dpu = float(cat.loc[cat["product_group"] == BOTTLE_FILTER_GROUP, "days_per_unit"].iloc[0]) if is_bf.any() else 0.0
+    filters = np.where(is_bf, last["qty"].to_numpy(dtype=float), np.nan)
+    bottles = np.where(is_bf, rng.integers(0, 3, len(live)).astype(float), np.nan)
+    effective = np.where(is_bf, np.maximum(bottles, 1), np.nan)
+    coverage = dpu * filters / effective
+    due = lpd + pd.to_timedelta(coverage, unit="D").to_numpy()
+    days_to_due = (pd.Series(due) - pd.Timestamp(asof)).dt.days.to_numpy(dtype=float)
+    status = np.select([days_to_due < 0, days_to_due <= DUE_SOON_DAYS], ["overdue", "due_soon_14d"], default="ok").astype(object)
+    status[~is_bf] = None
+
+    live["due_date"] = due
+    live["days_to_due"] = days_to_due
+    live["status"] = status
+    live["filters_added_last_event"] = filters
+    live["bottles_owned"] = bottles
+    live["bottles_owned_effective"] = effective
+    live["coverage_days_est"] = coverage
+    live["actionable_status"] = np.where(is_bf, status, "recency_only")
+    return live
+
+def orders_frame(ev: pd.DataFrame, cat: pd.DataFrame, names: np.ndarray, order_offset: int, rng: np.random.Generator) -> pd.DataFrame:
+    """orders_landing rows (landing schema): one order per customer-day, "<item> (xN)" joined."""
+    ev = ev.sort_values(["cust", "day", "group"], kind="stable")
+    item = names[ev["group"].to_numpy(), ev["variant"].to_numpy()]
+    qty = ev["qty"].to_numpy()
+    key = ev["cust"].to_numpy() * (_day(END) + 1) + ev["day"].to_numpy()
+    start = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    order_of = np.cumsum(np.r_[True, key[1:] != key[:-1]]) - 1
+
+    text = pa.array(item + " (x" + qty.astype(str).astype(object) + ")", type=pa.string())
+    products = pc.binary_join(pa.ListArray.from_arrays(np.r_[start, len(key)].astype(np.int32), text), ", ")
+    amount = np.bincount(order_of, weights=qty * cat["price"].to_numpy()[ev["group"].to_numpy()])
+    n_items = np.bincount(order_of, weights=qty).astype(np.int64)
+
+    day = ev["day"].to_numpy()[start].astype("datetime64[D]")
+    return pd.DataFrame({
+        "kolejności": np.arange(order_offset, order_offset + len(start), dtype=np.int64),
+        "Anon": anon_ids(ev["cust"].to_numpy()[start]),
+        "Data zakupu": day.astype(str).astype(object),
+        "Źródło": SOURCES[rng.integers(0, len(SOURCES), len(start))],
+        "Kwota": amount.round(2),
+        "Produkty": products.to_numpy(zero_copy_only=False),
+        "Ilość zakupów": n_items,
+        "produkty_clean": pc.utf8_lower(products).to_numpy(zero_copy_only=False),
+        "purchase_month": pd.Series(day.astype("datetime64[M]").astype(str)).to_numpy(dtype=object),
+    })
+
+# ---------- Writer ----------
+class _Appender:
+    """One parquet file written chunk by chunk with the first chunk's schema."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.writer = None
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+def generate(
+    out_dir: Path,
+    n_customers: int,
+    seed: int = 0,
+    chunk_customers: int = DEFAULT_CHUNK_CUSTOMERS,
+) -> dict:
+    """
+    Write schema-faithful synthetic inputs for `n_customers` into `out_dir`.
+
+    live_customer_product_state, purchase_intervals, retention_benchmarks,
+    orders_landing (month-partitioned) and a matching sku_lookup.json.
+    Customers are generated in chunks, so memory is bounded by
+    `chunk_customers` whatever the total; benchmark quantiles come from the
+    KLL sketches fed chunk by chunk. Same (n_customers, seed, chunk_customers)
+    gives the same files.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cat = catalogue(seed)
+    groups = cat["product_group"].to_numpy()
+    names = item_names(groups)
+    (out_dir / SKU_LOOKUP_NAME).write_text(json.dumps(sku_lookup(names), ensure_ascii=False), encoding="utf-8")
+
+    orders_dir = out_dir / ORDERS_NAME
+    if orders_dir.exists():
+        shutil.rmtree(orders_dir)
+    live_out, intervals_out = _Appender(out_dir / LIVE_NAME), _Appender(out_dir / INTERVALS_NAME)
+    sketches = BenchmarkSketches()
+    n_orders = 0
+
+    rngs = np.random.SeedSequence(seed).spawn(-(-n_customers // chunk_customers))
+    for i, (lo, child) in enumerate(zip(range(0, n_customers, chunk_customers), rngs)):
+        rng = np.random.default_rng(child)
+        ev = purchase_events(lo, min(lo + chunk_customers, n_customers), cat, rng)
+
+        intervals = intervals_frame(ev, groups)
+        intervals_out.write(intervals)
+        sketches.update(intervals)
+        live_out.write(live_frame(ev, cat, names, END, rng))
+
+        orders = orders_frame(ev, cat, names, n_orders, rng)
+        ds.write_dataset(
+            pa.Table.from_pandas(orders, preserve_index=False),
+            orders_dir,
+            format="parquet",
+            partitioning=["purchase_month"],
+            partitioning_flavor="hive",
+            basename_template=f"chunk{i:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        n_orders += len(orders)
+    live_out.close()
+    intervals_out.close()
+
+    bench = sketches.table().drop(columns="n_intervals").rename(columns={"product_group": GROUP_COL})
+    bench.to_parquet(out_dir / BENCHMARKS_NAME, index=False)
+
+    manifest = {
+        "n_customers": n_customers,
+        "seed": seed,
+        "chunk_customers": chunk_customers,
+        "asof": str(END),
+        "rows": {
+            LIVE_NAME: live_out.rows,
+            INTERVALS_NAME: intervals_out.rows,
+            BENCHMARKS_NAME: len(bench),
+            ORDERS_NAME: n_orders,
+        },
+    }
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+def read_manifest(data_dir: Path) -> dict:
+    return json.loads((data_dir / MANIFEST_NAME).read_text())
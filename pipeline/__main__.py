@@ -0,0 +1,33 @@
+from __future__ import annotations
+import argparse
+import sys
+
+from pipeline.runner import run_pipeline
+from pipeline.stages import STAGES
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description="Rebuild data/interim incrementally.")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", nargs="*", default=[], help="stages to rerun even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--list", action="store_true", help="list stages with inputs and outputs")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for s in STAGES:
+            print(f"{s.name}\n  in:  {', '.join(p.as_posix() for p in s.inputs)}\n  out: {', '.join(p.as_posix() for p in s.outputs)}")
+        return 0
+
+    report = run_pipeline(
+        STAGES,
+        targets=args.targets or None,
+        workers=args.workers,
+        force=args.force,
+        dry_run=args.dry_run,
+    )
+    print(report.to_string(index=False))
+    return 1 if (report["status"].isin(["failed", "blocked"])).any() else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
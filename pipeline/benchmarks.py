@@ -0,0 +1,210 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+INTERIM = Path("data/interim")
+INTERVALS_PATH = INTERIM / "purchase_intervals.parquet"
+SKETCHES_PATH = INTERIM / "retention_benchmark_sketches.parquet"
+
+GROUP_COL = "MATRIX GRUPA PRODUKTOWA"
+VALUE_COL = "adj_retention_days"
+
+DEFAULT_K = 256      # rank error ~ 1.7 / k of n, i.e. < 1% at any quantile
+_C = 2 / 3           # capacity decay per level below the top
+
+# named columns of retention_benchmarks
+NAMED_QUANTILES = {"p25": 0.25, "median": 0.5, "p75": 0.75}
+
+_LABEL_RE = re.compile(r"^p(\d+(?:\.\d+)?)$")
+
+def parse_quantile(label: str) -> float:
+    """"median" / "p25" / "p97.5" -> probability in [0, 1]."""
+    if label in NAMED_QUANTILES:
+        return NAMED_QUANTILES[label]
+    m = _LABEL_RE.match(label)
+    if m is None or not 0 <= float(m.group(1)) <= 100:
+        raise ValueError(f"not a quantile label: {label!r} (expected 'median' or 'p0'..'p100')")
+    return float(m.group(1)) / 100
+
+def quantile_label(q: float) -> str:
+    for label, p in NAMED_QUANTILES.items():
+        if p == q:
+            return label
+    return f"p{100 * q:g}"
+
+# ---------- Sketch ----------
+@dataclass
+class KLLSketch:
+    """
+    KLL quantile sketch: level h holds items of weight 2**h.
+
+    `update` and `merge` keep O(k log(n / k)) items; results do not depend on
+    how the stream was split into batches beyond the sketch's rank error.
+    Compaction offsets are drawn from (seed, n, level), so building the same
+    stream twice gives the same sketch. While nothing was compacted (n within
+    the level-0 capacity) quantiles are exact and match pandas' linear
+    interpolation.
+    """
+    k: int = DEFAULT_K
+    seed: int = 0
+    levels: list[np.ndarray] = field(default_factory=lambda: [np.empty(0)])
+    n: int = 0
+    _cdf: tuple[np.ndarray, np.ndarray] | None = field(default=None, repr=False, compare=False)
+
+    def _capacity(self, h: int) -> int:
+        return max(2, int(np.ceil(self.k * _C ** (len(self.levels) - 1 - h))))
+
+    def _compress(self) -> None:
+        # compact the lowest over-full level until the whole sketch fits its budget
+        while sum(len(items) for items in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h in range(len(self.levels)) if len(self.levels[h]) > self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            # an odd item out stays behind so total weight is preserved
+            even = len(items) - len(items) % 2
+            offset = int(np.random.default_rng((self.seed, self.n, h)).integers(2))
+            self.levels[h] = items[even:]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[:even][offset::2]])
+        self._cdf = None
+
+    def update(self, values) -> "KLLSketch":
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self.n += len(values)
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        if other.k != self.k:
+            raise ValueError(f"cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def cdf(self) -> tuple[np.ndarray, np.ndarray]:
+        """Sorted retained items and their cumulative weights (cached until the next update)."""
+        if self._cdf is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2 ** h, dtype=np.int64) for h, items in enumerate(self.levels)])
+            order = np.argsort(values, kind="stable")
+            self._cdf = (values[order], np.cumsum(weights[order]))
+        return self._cdf
+
+    def quantile(self, q):
+        """Linear-interpolated quantile(s), pandas' default definition on the weighted items."""
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float("nan")
+        values, cum = self.cdf()
+        pos = np.asarray(q, dtype=float) * (self.n - 1)
+        lo = np.floor(pos)
+        # 0-based rank r sits in the first item whose cumulative weight exceeds r
+        v_lo = values[np.minimum(np.searchsorted(cum, lo, side="right"), len(values) - 1)]
+        v_hi = values[np.minimum(np.searchsorted(cum, lo + 1, side="right"), len(values) - 1)]
+        out = v_lo + (pos - lo) * (v_hi - v_lo)
+        return float(out) if np.ndim(q) == 0 else out
+
+# ---------- Per product group ----------
+@dataclass
+class BenchmarkSketches:
+    """One KLL sketch of `adj_retention_days` per product group."""
+    sketches: dict[str, KLLSketch] = field(default_factory=dict)
+    k: int = DEFAULT_K
+    seed: int = 0
+
+    @property
+    def product_groups(self) -> list[str]:
+        return sorted(self.sketches)
+
+    def update(self, intervals: pd.DataFrame) -> "BenchmarkSketches":
+        """Add new purchase intervals (raw or standardized group column)."""
+        group_col = GROUP_COL if GROUP_COL in intervals.columns else "product_group"
+        values = pd.to_numeric(intervals[VALUE_COL], errors="coerce").to_numpy(dtype=float)
+        codes, groups = pd.factorize(intervals[group_col].astype(object), sort=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(groups) + 1))
+        for g, group in enumerate(groups):
+            sketch = self.sketches.setdefault(str(group), KLLSketch(k=self.k, seed=self.seed))
+            sketch.update(values[order[bounds[g]:bounds[g + 1]]])
+        return self
+
+    def merge(self, other: "BenchmarkSketches") -> "BenchmarkSketches":
+        for group, sketch in other.sketches.items():
+            mine = self.sketches.setdefault(group, KLLSketch(k=self.k, seed=self.seed))
+            mine.merge(sketch)
+        return self
+
+    def quantile(self, product_group: str, q: float) -> float:
+        sketch = self.sketches.get(product_group)
+        return float("nan") if sketch is None else sketch.quantile(q)
+
+    def table(self, labels=("p25", "median", "p75")) -> pd.DataFrame:
+        """retention_benchmarks-shaped table (product_group + one column per label)."""
+        qs = [parse_quantile(label) for label in labels]
+        groups = self.product_groups
+        rows = np.array([self.sketches[g].quantile(qs) for g in groups]).reshape(len(groups), len(qs))
+        out = pd.DataFrame(rows, columns=list(labels))
+        out.insert(0, "product_group", groups)
+        out["n_intervals"] = [self.sketches[g].n for g in groups]
+        return out
+
+    # ---------- Persistence ----------
+    def save(self, path: Path = SKETCHES_PATH) -> None:
+        # long format: one row per retained item; n and weights follow from the levels
+        groups, levels, values = [], [], []
+        for group in self.product_groups:
+            for h, items in enumerate(self.sketches[group].levels):
+                groups.extend([group] * len(items))
+                levels.extend([h] * len(items))
+                values.append(items)
+        table = pa.table({
+            "product_group": pa.array(groups, type=pa.string()),
+            "level": pa.array(levels, type=pa.int16()),
+            "value": pa.array(np.concatenate(values) if values else np.empty(0), type=pa.float64()),
+        })
+        meta = {"k": self.k, "seed": self.seed, "n": {g: s.n for g, s in self.sketches.items()}}
+        table = table.replace_schema_metadata({"kll": json.dumps(meta)})
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, path)
+
+def load_sketches(path: Path = SKETCHES_PATH) -> BenchmarkSketches:
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[b"kll"])
+    df = table.to_pandas()
+    out = BenchmarkSketches(k=meta["k"], seed=meta["seed"])
+    for group, n in meta["n"].items():
+        rows = df[df["product_group"] == group]
+        n_levels = int(rows["level"].max()) + 1 if len(rows) else 1
+        levels = [rows.loc[rows["level"] == h, "value"].to_numpy(dtype=float) for h in range(n_levels)]
+        out.sketches[group] = KLLSketch(k=out.k, seed=out.seed, levels=levels, n=int(n))
+    return out
+
+def build_sketches(
+    intervals_path: Path = INTERVALS_PATH,
+    out_path: Path = SKETCHES_PATH,
+    k: int = DEFAULT_K,
+) -> BenchmarkSketches:
+    """Sketches from the full purchase_intervals (pipeline stage)."""
+    intervals = pq.read_table(intervals_path, columns=[GROUP_COL, VALUE_COL]).to_pandas()
+    sketches = BenchmarkSketches(k=k).update(intervals)
+    sketches.save(out_path)
+    return sketches
+
+def update_sketches(new_intervals: pd.DataFrame, path: Path = SKETCHES_PATH) -> BenchmarkSketches:
+    """Fold newly arrived intervals into the saved sketches without re-reading purchase_intervals."""
+    sketches = load_sketches(path) if path.exists() else BenchmarkSketches()
+    sketches.update(new_intervals)
+    sketches.save(path)
+    return sketches
@@ -0,0 +1,335 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Iterator
+import json
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+INTERIM = Path("data/interim")
+
+ORDERS_PATH = INTERIM / "orders_landing.parquet"
+SKU_LOOKUP_PATH = INTERIM / "sku_lookup.json"
+OUT_LINES_PATH = INTERIM / "order_lines_canonical.parquet"
+
+COL_ORDER_ID = "kolejności"
+COL_PRODUCTS_RAW = "Produkty"
+COL_PRODUCTS_CLEAN = "produkty_clean"
+COL_CUSTOMER_ID = "Anon"
+COL_DATE = "Data zakupu"
+COL_AMOUNT = "Kwota"
+COL_SOURCE = "Źródło"
+
+ORDER_COLS = {
+    COL_ORDER_ID: "order_id",
+    COL_CUSTOMER_ID: "anon",
+    COL_DATE: "date",
+    COL_SOURCE: "source",
+    COL_AMOUNT: "amount",
+    COL_PRODUCTS_RAW: "raw_products",
+    COL_PRODUCTS_CLEAN: "clean_products",
+}
+
+DEFAULT_BATCH_SIZE = 200_000
+N_UNMATCHED_EXAMPLES = 20
+
+QTY_RE = re.compile(r"\(x\s*(\d+)\)", flags=re.IGNORECASE)
+
+# One pass over all orders of a chunk joined by "\x1e": each findall tuple is
+# (boundary, item text, qty). An order boundary yields ("\x1e", "", ""), an item
+# ("", name, N) and text after the last (xN) marker ("", "", ""), which the
+# notebook ignores as well. The last alternative keeps trailing text linear.
+_SEP = "\x1e"
+_SCAN_RE = re.compile(r"(\x1e)|([^\x1e]*?)\(x\s*(\d+)\)|[^\x1e]+", flags=re.IGNORECASE)
+_NAME_STRIP = " -+|,;/"
+
+# ---------- Category inference (unmatched items) ----------
+_PITCHER_CTX = re.compile(r"\b(dzbanek|dzbank|classic|unimax|aqua|crystal|astra|omega|standard)\b", re.IGNORECASE)
+_BOTTLE_CTX = re.compile(r"\b(butelka|butelk|soft|solid)\b", re.IGNORECASE)
+_BOTTLE_N_RE = re.compile(r"(\d+)\s*(?:x\s*)?(butelk|butele)")
+_FILTERS_FOR_BOTTLE_RE = re.compile(r"(filtr|wkład)[^\n]{0,30}do\s+butelk")
+_WK_NOUN_RE = re.compile(r"(\d+)\s*(?:x\s*)?(wkład(?:y|ów)?)\b", re.IGNORECASE)
+_HAS_WK_NOUN_RE = re.compile(r"\b(wkład(?:y|ów)?)\b", re.IGNORECASE)
+_FILTR_NOUN_RE = re.compile(r"(\d+)\s*(?:x\s*)?(filtr(?:y|ów)?)\b", re.IGNORECASE)
+_HAS_FILTR_NOUN_RE = re.compile(r"\b(filtr(?:y|ów)?)\b", re.IGNORECASE)
+_PITCHER_N_RE = re.compile(r"(\d+)\s*(?:x\s*)?(dzbanek|dzbank)")
+
+def extract_category_counts(item_name: str) -> dict:
+    """Notebook 03's regex inference for items missing from sku_lookup (same rules, precompiled)."""
+    s = (item_name or "").lower()
+
+    counts = {
+        "bottles": 0,
+        "pitchers": 0,
+        "filters_pitcher": 0,
+        "filters_bottle": 0,
+        "filters_unknown": 0,
+        "filters_bottle_included": 0,
+        "filters_pitcher_included": 0,
+        "uncertain": False,
+    }
+
+    # bottles: "solid + soft" bundles imply 2, else an explicit count, else 1
+    if "zestaw" in s and "butelek" in s and "filtruj" in s and "solid" in s and "soft" in s and "+" in s:
+        counts["bottles"] = max(counts["bottles"], 2)
+
+    m = _BOTTLE_N_RE.search(s)
+    if m:
+        counts["bottles"] = max(counts["bottles"], int(m.group(1)))
+    elif not _FILTERS_FOR_BOTTLE_RE.search(s) and "butelk" in s:
+        counts["bottles"] = max(counts["bottles"], 1)
+
+    if counts["bottles"] > 0:
+        counts["filters_bottle_included"] += counts["bottles"]
+
+    # wkłady are always pitcher filters
+    m = _WK_NOUN_RE.search(s)
+    if m:
+        counts["filters_pitcher"] += int(m.group(1))
+    elif _HAS_WK_NOUN_RE.search(s):
+        counts["filters_pitcher"] += 1
+
+    # filtry need bottle / pitcher context
+    m = _FILTR_NOUN_RE.search(s)
+    n = int(m.group(1)) if m else (1 if _HAS_FILTR_NOUN_RE.search(s) else 0)
+    if n:
+        bottle, pitcher = bool(_BOTTLE_CTX.search(s)), bool(_PITCHER_CTX.search(s))
+        if bottle and not pitcher:
+            counts["filters_bottle"] += n
+        elif pitcher and not bottle:
+            counts["filters_pitcher"] += n
+        else:
+            counts["filters_unknown"] += n
+
+    m = _PITCHER_N_RE.search(s)
+    if m:
+        counts["pitchers"] += int(m.group(1))
+    elif "dzbanek" in s or "dzbank" in s:
+        counts["pitchers"] += 1
+
+    if (
+        "zestaw" in s
+        and counts["bottles"] == 0
+        and counts["pitchers"] == 0
+        and counts["filters_pitcher"] == 0
+        and counts["filters_bottle"] == 0
+    ):
+        counts["uncertain"] = True
+
+    if counts["pitchers"] > 0:
+        counts["filters_pitcher_included"] += counts["pitchers"]
+
+    counts["total_bottle_filters"] = counts["filters_bottle"] + counts["filters_bottle_included"]
+    counts["total_pitcher_filters"] = counts["filters_pitcher"] + counts["filters_pitcher_included"]
+    return counts
+
+DEFAULT_INFER = extract_category_counts("")
+INFER_KEYS = list(DEFAULT_INFER)
+
+LINE_COLS = [*ORDER_COLS.values(), "item_name", "qty", "sku", "decode_method", "matched_key", *INFER_KEYS]
+
+# ---------- SKU lookup ----------
+@dataclass(frozen=True)
+class SkuLookup:
+    """sku_lookup.json as a hash index over item names plus an aligned sku array."""
+    keys: pd.Index
+    skus: np.ndarray
+
+    def match(self, names: np.ndarray) -> np.ndarray:
+        """Position of every name in the lookup, -1 if absent (one hash join per chunk)."""
+        return self.keys.get_indexer(names)
+
+def load_sku_lookup(path: Path = SKU_LOOKUP_PATH) -> SkuLookup:
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return SkuLookup(
+        keys=pd.Index(list(raw), dtype=object),
+        skus=np.array([None if attrs.get("sku") is None else str(attrs["sku"]) for attrs in raw.values()], dtype=object),
+    )
+
+# ---------- Splitting ----------
+def split_qty_markers(clean: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized `split_by_qty_markers` for a whole column.
+
+    Returns (row position, item name, qty) per item; orders without (xN)
+    markers contribute nothing, exactly like the per-row version.
+    """
+    texts = clean.astype(str).where(clean.notna(), "").str.replace(_SEP, " ", regex=False)
+    found = _SCAN_RE.findall(_SEP.join(texts.tolist()))
+    if not found:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+
+    sep, name, qty = (np.array(col, dtype=object) for col in zip(*found))
+    row = np.cumsum(sep == _SEP)
+    is_item = qty != ""
+
+    names = pd.Series(name[is_item], dtype=object).str.lstrip().str.strip(_NAME_STRIP)
+    return row[is_item].astype(np.int64), names.to_numpy(dtype=object), qty[is_item].astype(np.int64)
+
+def _infer_frame(names: np.ndarray) -> pd.DataFrame:
+    # regex inference runs once per distinct unmatched name
+    uniques, inverse = np.unique(names.astype(str), return_inverse=True)
+    table = pd.DataFrame([extract_category_counts(n) for n in uniques], columns=INFER_KEYS)
+    return table.iloc[inverse].reset_index(drop=True)
+
+# ---------- Match statistics ----------
+@dataclass
+class DecodeStats:
+    """Notebook 03's match-rate scan, accumulated while decoding; mergeable across chunks."""
+    orders: int = 0
+    orders_with_markers: int = 0
+    orders_no_markers: int = 0
+    orders_all_matched: int = 0
+    orders_some_unmatched: int = 0
+    matched_items: int = 0
+    total_items: int = 0
+    lines: int = 0
+    unmatched_examples: list = field(default_factory=list)
+    unmatched_names: dict = field(default_factory=dict)
+
+    @property
+    def item_match_rate(self) -> float | None:
+        return self.matched_items / self.total_items if self.total_items else None
+
+    def merge(self, other: "DecodeStats") -> "DecodeStats":
+        for f in fields(self):
+            if f.type == "int":
+                setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+        self.unmatched_examples.extend(other.unmatched_examples[:N_UNMATCHED_EXAMPLES - len(self.unmatched_examples)])
+        for name, n in other.unmatched_names.items():
+            self.unmatched_names[name] = self.unmatched_names.get(name, 0) + n
+        return self
+
+    def summary(self) -> pd.Series:
+        out = {f.name: getattr(self, f.name) for f in fields(self) if f.type == "int"}
+        return pd.Series({**out, "item_match_rate": self.item_match_rate})
+
+    def top_unmatched(self, n: int = 20) -> pd.Series:
+        return pd.Series(self.unmatched_names, dtype=np.int64, name="items").sort_values(ascending=False).head(n)
+
+# ---------- Decoding ----------
+def decode_chunk(orders: pd.DataFrame, lookup: SkuLookup, row_offset: int = 0) -> tuple[pd.DataFrame, DecodeStats]:
+    """Canonical order lines (notebook 03 schema) and match statistics for one chunk of orders."""
+    row, names, qty = split_qty_markers(orders[COL_PRODUCTS_CLEAN])
+    pos = lookup.match(names)
+    matched = pos >= 0
+
+    lines = orders[list(ORDER_COLS)].iloc[row].rename(columns=ORDER_COLS).reset_index(drop=True)
+    lines["item_name"] = names
+    lines["qty"] = qty
+    lines["sku"] = np.append(lookup.skus, None)[pos]   # pos == -1 picks the trailing None
+    lines["decode_method"] = np.where(matched, "sku_lookup", "regex_infer")
+    lines["matched_key"] = np.where(matched, names, None)
+
+    infer = pd.DataFrame({k: np.full(len(lines), v) for k, v in DEFAULT_INFER.items()})
+    if (~matched).any():
+        infer.loc[~matched, INFER_KEYS] = _infer_frame(names[~matched]).to_numpy()
+    lines = pd.concat([lines, infer.astype({k: type(v) for k, v in DEFAULT_INFER.items()})], axis=1)
+
+    # per-order counts from the item rows (orders without markers have 0 items)
+    n_orders = len(orders)
+    items = np.bincount(row, minlength=n_orders)
+    hits = np.bincount(row, weights=matched, minlength=n_orders).astype(np.int64)
+    with_markers = items > 0
+
+    stats = DecodeStats(
+        orders=n_orders,
+        orders_with_markers=int(with_markers.sum()),
+        orders_no_markers=int((~with_markers).sum()),
+        orders_all_matched=int((with_markers & (hits == items)).sum()),
+        orders_some_unmatched=int((with_markers & (hits < items)).sum()),
+        matched_items=int(matched.sum()),
+        total_items=len(names),
+        lines=len(lines),
+    )
+    miss = np.flatnonzero(~matched)
+    stats.unmatched_examples = [
+        {
+            "order_index": row_offset + int(row[i]),
+            "clean_products": orders[COL_PRODUCTS_CLEAN].iloc[row[i]],
+            "unmatched_name": names[i],
+            "qty": int(qty[i]),
+        }
+        for i in miss[:N_UNMATCHED_EXAMPLES]
+    ]
+    miss_names, miss_counts = np.unique(names[miss].astype(str), return_counts=True)
+    stats.unmatched_names = dict(zip(miss_names.tolist(), miss_counts.tolist()))
+    return lines[LINE_COLS], stats
+
+def _line_schema(orders_schema: pa.Schema) -> pa.Schema:
+    # fixed output schema, so a chunk without any regex_infer rows cannot change it
+    order_fields = [pa.field(new, orders_schema.field(old).type) for old, new in ORDER_COLS.items()]
+    infer_fields = [pa.field(k, pa.bool_() if isinstance(v, bool) else pa.int64()) for k, v in DEFAULT_INFER.items()]
+    return pa.schema([
+        *order_fields,
+        pa.field("item_name", pa.string()),
+        pa.field("qty", pa.int64()),
+        pa.field("sku", pa.string()),
+        pa.field("decode_method", pa.string()),
+        pa.field("matched_key", pa.string()),
+        *infer_fields,
+    ])
+
+def _iter_batches(path: Path, batch_size: int) -> Iterator[tuple[int, pd.DataFrame]]:
+    # works for the single file and for the month-partitioned landing directory
+    offset = 0
+    for batch in ds.dataset(path, format="parquet", partitioning="hive").to_batches(columns=list(ORDER_COLS), batch_size=batch_size):
+        if not batch.num_rows:
+            continue
+        yield offset, batch.to_pandas()
+        offset += batch.num_rows
+
+_WORKER: dict = {}
+
+def _init_worker(lookup: SkuLookup) -> None:
+    # the lookup is sent once per worker, not once per chunk
+    _WORKER["lookup"] = lookup
+
+def _decode_worker(orders: pd.DataFrame, row_offset: int) -> tuple[pd.DataFrame, DecodeStats]:
+    return decode_chunk(orders, _WORKER["lookup"], row_offset)
+
+def decode_orders(
+    orders_path: Path = ORDERS_PATH,
+    lookup_path: Path = SKU_LOOKUP_PATH,
+    out_path: Path = OUT_LINES_PATH,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+) -> DecodeStats:
+    """
+    Decode `orders_landing` into `order_lines_canonical.parquet` in one pass.
+
+    Orders are read in batches of `batch_size`, decoded on `workers` processes
+    and written in input order, so output and statistics do not depend on the
+    number of workers; memory stays bounded by a few batches.
+    """
+    lookup = load_sku_lookup(lookup_path)
+    schema = _line_schema(ds.dataset(orders_path, format="parquet", partitioning="hive").schema)
+    stats = DecodeStats()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with pq.ParquetWriter(str(out_path), schema) as writer:
+        def consume(result: tuple[pd.DataFrame, DecodeStats]) -> None:
+            lines, chunk_stats = result
+            writer.write_table(pa.Table.from_pandas(lines, schema=schema, preserve_index=False))
+            stats.merge(chunk_stats)
+
+        if workers <= 1:
+            for offset, chunk in _iter_batches(orders_path, batch_size):
+                consume(decode_chunk(chunk, lookup, offset))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lookup,)) as pool:
+                pending = []
+                for offset, chunk in _iter_batches(orders_path, batch_size):
+                    pending.append(pool.submit(_decode_worker, chunk, offset))
+                    # bounded window of batches in flight, consumed in order
+                    if len(pending) >= 2 * workers:
+                        consume(pending.pop(0).result())
+                for fut in pending:
+                    consume(fut.result())
+    return stats
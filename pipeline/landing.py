@@ -0,0 +1,158 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator
+import csv
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+RAW_ORDERS_PATH = Path("data/raw/full_orders_data.csv")
+INTERIM = Path("data/interim")
+
+# hive-partitioned directory (purchase_month=YYYY-MM/…); pd.read_parquet and
+# pyarrow.dataset read it exactly like the former single file
+LANDING_PATH = INTERIM / "orders_landing.parquet"
+
+COL_PRODUCTS_RAW = "Produkty"
+COL_PRODUCTS_CLEAN = "produkty_clean"
+COL_AMOUNT = "Kwota"
+COL_DATE = "Data zakupu"
+PARTITION_COL = "purchase_month"
+
+DROP_COLS = [
+    "Miesiąc zakupu", "Kolejność",
+    "Kolejność 2", "Butelka filtrująca", "Dzbanek", "Filtry dzbankowe",
+    "Filtry butelkowe", "SeeYoo", "Akcesoria butelkowe", "Termiczne",
+    "Limitowane", "Flow Comfort - start", "Flow Comfort - wkład",
+    "Filtr pokipropylenowy", "Bidon", "Syfon", "Suplement",
+    "Wymiana Butli",
+]
+
+# read as text: cleaned below, never left to type inference per batch
+STRING_COLS = (COL_PRODUCTS_RAW, COL_AMOUNT, COL_DATE)
+
+DEFAULT_BLOCK_SIZE = 64 << 20   # bytes of CSV per batch
+
+DAYFIRST_FORMATS = ("%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y")
+
+# Python's `\s` for str patterns, spelled for RE2: ASCII whitespace, the
+# Unicode separators (incl. non-breaking spaces) and the remaining C0/C1 spaces
+_WS = r"[\s\pZ\x0b\x1c-\x1f\x85]+"
+
+# ---------- Normalization ----------
+def normalize_text(products: pa.Array) -> pa.Array:
+    """Vectorized `normalize_text`: lowercase, collapse whitespace runs, trim; null -> ""."""
+    s = pc.utf8_lower(products.cast(pa.string()))
+    s = pc.replace_substring_regex(s, _WS, " ")
+    return pc.fill_null(pc.utf8_trim(s, characters=" "), "")
+
+def clean_amount(amount: pa.Array) -> pa.Array:
+    """Notebook 01's Kwota cleaning (drop spaces, decimal comma, strip currency) -> float64, invalid -> null."""
+    s = pc.replace_substring(amount.cast(pa.string()), "\u00a0", "")
+    s = pc.replace_substring(s, " ", "")
+    s = pc.replace_substring(s, ",", ".")
+    s = pc.replace_substring_regex(s, r"[^\d.\-]", "")
+    return pa.array(pd.to_numeric(s.to_pandas(), errors="coerce"), type=pa.float64())
+
+def parse_purchase_dates(dates: pd.Series) -> pd.Series:
+    """
+    ISO dates, then the day-first export formats, each with an explicit format.
+
+    One inferred format per batch would follow whichever style comes first and
+    coerce the rest (or read 03.04 as March 4th); anything unparsed -> NaT.
+    """
+    s = dates.astype("string").str.strip()
+    parsed = pd.to_datetime(s, errors="coerce", format="ISO8601")
+    day = s.str.split(" ", n=1).str[0]   # a trailing time of day is ignored
+    for fmt in DAYFIRST_FORMATS:
+        todo = parsed.isna() & day.notna()
+        if not todo.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(day[todo], errors="coerce", format=fmt))
+    return parsed
+
+def purchase_month(dates: pa.Array) -> pa.Array:
+    # partition key only; `Data zakupu` itself stays the raw day-level string
+    parsed = parse_purchase_dates(dates.to_pandas())
+    return pa.array(parsed.dt.strftime("%Y-%m").fillna("unknown"), type=pa.string())
+
+def land_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    cols = {name: batch.column(name) for name in batch.schema.names}
+    cols[COL_PRODUCTS_CLEAN] = normalize_text(cols[COL_PRODUCTS_RAW])
+    cols[COL_AMOUNT] = clean_amount(cols[COL_AMOUNT])
+    cols[PARTITION_COL] = purchase_month(cols[COL_DATE])
+    return pa.RecordBatch.from_pydict(cols)
+
+# ---------- Streaming landing ----------
+def _kept_columns(path: Path, drop: list[str]) -> list[str]:
+    # only the header is read here; dropped columns are never parsed
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f))
+    return [c for c in header if c not in set(drop)]
+
+def iter_landed_batches(
+    raw_path: Path = RAW_ORDERS_PATH,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    drop: list[str] = DROP_COLS,
+) -> Iterator[pa.RecordBatch]:
+    """Cleaned record batches of the raw export; memory is bounded by `block_size`."""
+    keep = _kept_columns(raw_path, drop)
+    reader = pacsv.open_csv(
+        raw_path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=keep,
+            column_types={c: pa.string() for c in STRING_COLS if c in keep},
+        ),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield land_batch(batch)
+
+def land_orders(
+    raw_path: Path = RAW_ORDERS_PATH,
+    out_path: Path = LANDING_PATH,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    drop: list[str] = DROP_COLS,
+) -> pd.Series:
+    """
+    Stream the raw CSV into `orders_landing` partitioned by purchase month.
+
+    Only months present in `raw_path` are replaced, so landing a new export
+    rewrites those partitions and leaves the rest of the history untouched.
+    Returns landed rows per month.
+    """
+    batches = iter_landed_batches(raw_path, block_size, drop)
+    first = next(batches, None)
+    if first is None:
+        return pd.Series(dtype="int64", name="rows")
+
+    rows: dict[str, int] = {}
+
+    def counted(batch: pa.RecordBatch) -> pa.RecordBatch:
+        vc = pc.value_counts(batch.column(PARTITION_COL))
+        for month, n in zip(vc.field("values").to_pylist(), vc.field("counts").to_pylist()):
+            rows[month] = rows.get(month, 0) + n
+        return batch
+
+    def stream() -> Iterator[pa.RecordBatch]:
+        yield counted(first)
+        for batch in batches:
+            yield counted(batch)
+
+    if out_path.is_file():
+        raise FileExistsError(f"{out_path.as_posix()} is a single-file landing; remove it to switch to the partitioned layout")
+    out_path.mkdir(parents=True, exist_ok=True)
+    ds.write_dataset(
+        stream(),
+        out_path,
+        schema=first.schema,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COL, pa.string())]), flavor="hive"),
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+        preserve_order=True,
+    )
+    return pd.Series(rows, name="rows").sort_index()
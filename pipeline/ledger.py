@@ -0,0 +1,416 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+INTERIM = Path("data/interim")
+LEDGER_DIR = INTERIM / "equipment_ledger"
+LIVE_PATH = INTERIM / "live_customer_product_state.parquet"
+CUST_DAY_PATH = INTERIM / "cust_day_group.parquet"
+BENCHMARKS_PATH = INTERIM / "retention_benchmarks.parquet"
+
+GROUP_COL = "MATRIX GRUPA PRODUKTOWA"
+NAME_COL = "MATRIX NAZWA"
+FILTERS_COL = "ILOŚĆ FILTRÓW"
+
+BOTTLE_GROUPS_WITH_INCLUDED_FILTER = [
+    "02_butelki filtrujące SOFT",
+    "03_butelki filtrujące SOLID",
+]
+BOTTLE_FILTER_GROUP = "06_filtry do butelek Soft i Solid"
+
+DUE_SOON_DAYS = 14
+
+DAY_COLS = ["anon", "date", "bottles", "filters", "filter_units", "filter_day"]
+# cust_day_group columns the ledger reads; a row is "already applied" when these match
+ROW_KEY_COLS = ["anon", "date", "is_purchase", "matrix_qty", GROUP_COL, NAME_COL, FILTERS_COL]
+SCAN_BATCH_ROWS = 1 << 20
+
+# per-customer snapshot (index: anon)
+CUSTOMER_COLS = [
+    "bottles_total",              # cumulative filtering bottles bought
+    "filters_total",              # cumulative filter units (bought + included with bottles)
+    "last_event_date",            # latest day with any purchase event
+    "last_filter_date",           # latest bottle-filter purchase day
+    "filters_bought_last",        # filter units bought on that day
+    "bottles_bought_last",        # bottles bought on that day (1 included filter each)
+    "bottles_at_last_filter",     # bottles owned as of that day (inclusive)
+    "filters_cum_at_last_filter", # filter units acquired as of that day (inclusive)
+]
+
+# ---------- Events ----------
+def _row_hashes(cust_day: pd.DataFrame) -> np.ndarray:
+    cols = cust_day[[c for c in ROW_KEY_COLS if c in cust_day.columns]]
+    # same timestamps hash the same whatever unit they were read with
+    cols = cols.astype({c: "datetime64[ns]" for c in cols.columns if pd.api.types.is_datetime64_any_dtype(cols[c])})
+    return pd.util.hash_pandas_object(cols, index=False).to_numpy()
+
+def _number_repeats(h: np.ndarray) -> np.ndarray:
+    nth = pd.Series(h).groupby(h, sort=False).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame({"h": h, "nth": nth}), index=False).to_numpy()
+
+def row_keys(cust_day: pd.DataFrame) -> np.ndarray:
+    """uint64 key per row over ROW_KEY_COLS; repeats of an identical row get distinct keys."""
+    return _number_repeats(_row_hashes(cust_day))
+
+def _key_columns(f: pq.ParquetFile) -> list[str]:
+    return [c for c in f.schema_arrow.names if c in ROW_KEY_COLS]
+
+def _key_batches(cust_day_path: Path):
+    f = pq.ParquetFile(cust_day_path)
+    for batch in f.iter_batches(batch_size=SCAN_BATCH_ROWS, columns=_key_columns(f)):
+        yield batch.to_pandas()
+
+def scan_row_keys(cust_day_path: Path = CUST_DAY_PATH) -> np.ndarray:
+    """`row_keys` of a cust_day_group file, streamed over the key columns only."""
+    hashes = [_row_hashes(b) for b in _key_batches(cust_day_path)]
+    return _number_repeats(np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64))
+
+def read_rows(cust_day_path: Path, mask: np.ndarray) -> pd.DataFrame:
+    """The key columns of the rows selected by `mask`; memory scales with the selected rows."""
+    parts, start = [], 0
+    for b in _key_batches(cust_day_path):
+        sel = mask[start:start + len(b)]
+        start += len(b)
+        if sel.any():
+            parts.append(b[sel])
+    if parts:
+        return pd.concat(parts, ignore_index=True)
+    f = pq.ParquetFile(cust_day_path)
+    return f.schema_arrow.empty_table().select(_key_columns(f)).to_pandas()
+
+def purchase_rows(cust_day: pd.DataFrame) -> pd.DataFrame:
+    """Purchase rows of `cust_day_group` with parsed day dates (notebook 06 rules)."""
+    p = cust_day[cust_day["is_purchase"]] if "is_purchase" in cust_day.columns else cust_day[cust_day["matrix_qty"] > 0]
+    p = p.assign(
+        anon=p["anon"].astype(str),
+        date=pd.to_datetime(p["date"], errors="coerce", dayfirst=True),
+    )
+    return p.dropna(subset=["date"])
+
+def day_events(p: pd.DataFrame) -> pd.DataFrame:
+    """Customer-day deltas: bottles, filter units (bought + included) and bottle-filter days."""
+    group = p[GROUP_COL]
+    qty = pd.to_numeric(p["matrix_qty"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    n_filters = pd.to_numeric(p[FILTERS_COL], errors="coerce").fillna(0).to_numpy(dtype=float)
+    is_filter = group.eq(BOTTLE_FILTER_GROUP).to_numpy()
+
+    bottles = np.where(group.isin(BOTTLE_GROUPS_WITH_INCLUDED_FILTER).to_numpy(), qty, 0.0)
+    filter_units = np.where(is_filter, np.where(n_filters > 0, n_filters, qty), 0.0)
+    rows = pd.DataFrame({
+        "anon": p["anon"].to_numpy(),
+        "date": p["date"].to_numpy(),
+        "bottles": bottles,
+        "filters": filter_units + bottles,
+        "filter_units": filter_units,
+        "filter_day": is_filter,
+    })
+    return (
+        rows.groupby(["anon", "date"], as_index=False, sort=True)
+        .agg(bottles=("bottles", "sum"), filters=("filters", "sum"),
+             filter_units=("filter_units", "sum"), filter_day=("filter_day", "any"))
+    )
+
+def group_events(p: pd.DataFrame) -> pd.DataFrame:
+    return p[["anon", GROUP_COL, "date", NAME_COL]].rename(columns={GROUP_COL: "product_group"})
+
+# ---------- Folding ----------
+def fold_days(days: pd.DataFrame) -> pd.DataFrame:
+    """Customer snapshot from a complete day-event history (what notebook 06 rebuilds every run)."""
+    days = days.sort_values(["anon", "date"], kind="stable")
+    g = days.groupby("anon", sort=False)
+    cum_b = g["bottles"].cumsum()
+    cum_f = g["filters"].cumsum()
+
+    out = pd.DataFrame({
+        "bottles_total": g["bottles"].sum(),
+        "filters_total": g["filters"].sum(),
+        "last_event_date": g["date"].max(),
+    })
+    # days are sorted per customer, so the last filter day per customer is its last row
+    last = days.assign(cum_b=cum_b, cum_f=cum_f)[days["filter_day"].to_numpy()].groupby("anon").tail(1).set_index("anon")
+    out["last_filter_date"] = last["date"]
+    out["filters_bought_last"] = last["filter_units"]
+    out["bottles_bought_last"] = last["bottles"]
+    out["bottles_at_last_filter"] = last["cum_b"]
+    out["filters_cum_at_last_filter"] = last["cum_f"]
+    return out[CUSTOMER_COLS]
+
+def _append_fold(old: pd.DataFrame, days: pd.DataFrame) -> pd.DataFrame:
+    """
+    Snapshot after appending `days` that are all on/after each customer's last_event_date.
+
+    Every earlier event then precedes every new one, so the old totals are the
+    cumulative state right before the new events and no history is needed.
+    Exception: a new filter day on the old last_event_date also needs that day's
+    earlier bottles, which the snapshot only holds when it was the old last
+    filter day; `EquipmentLedger.apply` re-folds those customers instead.
+    """
+    new = fold_days(days)
+    old = old.reindex(new.index)
+    bt0, ft0 = old["bottles_total"].fillna(0.0), old["filters_total"].fillna(0.0)
+
+    # new events on the old last filter day (only possible when it was the last event day)
+    on_old_last = days[days["date"].to_numpy() == old["last_filter_date"].reindex(days["anon"]).to_numpy()]
+    same_b = on_old_last.groupby("anon")["bottles"].sum().reindex(new.index, fill_value=0.0)
+    same_f = on_old_last.groupby("anon")["filters"].sum().reindex(new.index, fill_value=0.0)
+
+    has_new = new["last_filter_date"].notna()
+    same_day = has_new & new["last_filter_date"].eq(old["last_filter_date"])
+
+    out = pd.DataFrame(index=new.index)
+    out["bottles_total"] = bt0 + new["bottles_total"]
+    out["filters_total"] = ft0 + new["filters_total"]
+    out["last_event_date"] = np.maximum(old["last_event_date"].fillna(new["last_event_date"]), new["last_event_date"])
+    out["last_filter_date"] = new["last_filter_date"].where(has_new, old["last_filter_date"])
+    out["filters_bought_last"] = (new["filters_bought_last"] + old["filters_bought_last"].where(same_day, 0.0)).where(has_new, old["filters_bought_last"])
+    out["bottles_bought_last"] = (new["bottles_bought_last"] + old["bottles_bought_last"].where(same_day, 0.0)).where(has_new, old["bottles_bought_last"] + same_b)
+    out["bottles_at_last_filter"] = (bt0 + new["bottles_at_last_filter"]).where(has_new, old["bottles_at_last_filter"] + same_b)
+    out["filters_cum_at_last_filter"] = (ft0 + new["filters_cum_at_last_filter"]).where(has_new, old["filters_cum_at_last_filter"] + same_f)
+    return out[CUSTOMER_COLS]
+
+def _fold_groups(old: pd.DataFrame, events: pd.DataFrame) -> pd.DataFrame:
+    # latest purchase per (anon, group); on equal dates the newer batch wins, like "last" in file order
+    both = pd.concat([old, events.rename(columns={"date": "last_purchase_date", NAME_COL: "last_matrix_name"})], ignore_index=True)
+    both = both.sort_values(["anon", "product_group", "last_purchase_date"], kind="stable")
+    return both.groupby(["anon", "product_group"], as_index=False, sort=False).agg(
+        last_purchase_date=("last_purchase_date", "last"),
+        last_matrix_name=("last_matrix_name", "last"),
+    )
+
+# ---------- Ledger ----------
+@dataclass
+class EquipmentLedger:
+    """
+    Append-only equipment ledger behind `live_customer_product_state`.
+
+    - `customers`: per-customer snapshot (CUSTOMER_COLS), index anon
+    - `groups`: latest purchase per (anon, product_group)
+    - the customer-day event log is appended batch by batch under `path / "events"`
+    - `row_keys`: keys of every applied `cust_day_group` row (None for ledgers saved without them)
+
+    `apply` folds only the new events into the snapshot. Customers whose new
+    events are older than something already applied (late arrivals) are
+    re-folded from their own logged history, nobody else's.
+    """
+    customers: pd.DataFrame
+    groups: pd.DataFrame
+    path: Path = LEDGER_DIR
+    batches: int = 0
+    asof: pd.Timestamp = pd.NaT   # latest date seen in any applied row (notebook 06's ASOF_DATE)
+    stats: dict = field(default_factory=dict)
+    row_keys: np.ndarray | None = field(default=None, repr=False)
+
+    @classmethod
+    def empty(cls, path: Path = LEDGER_DIR) -> "EquipmentLedger":
+        customers = pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c.endswith("date") else float) for c in CUSTOMER_COLS})
+        customers.index.name = "anon"
+        groups = pd.DataFrame({
+            "anon": pd.Series(dtype=object),
+            "product_group": pd.Series(dtype=object),
+            "last_purchase_date": pd.Series(dtype="datetime64[ns]"),
+            "last_matrix_name": pd.Series(dtype=object),
+        })
+        return cls(customers=customers, groups=groups, path=path, row_keys=np.empty(0, dtype=np.uint64))
+
+    def _history(self, anons: np.ndarray) -> pd.DataFrame:
+        events = self.path / "events"
+        if not events.exists():
+            return pd.DataFrame(columns=DAY_COLS)
+        table = ds.dataset(events, format="parquet").to_table(filter=ds.field("anon").isin(pa.array(anons, type=pa.string())))
+        return table.to_pandas()
+
+    def _log(self, days: pd.DataFrame) -> None:
+        events = self.path / "events"
+        events.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(days[DAY_COLS], preserve_index=False).cast(
+            pa.schema([("anon", pa.string()), ("date", pa.timestamp("ns")), ("bottles", pa.float64()),
+                       ("filters", pa.float64()), ("filter_units", pa.float64()), ("filter_day", pa.bool_())])
+        )
+        pq.write_table(table, events / f"batch-{self.batches:06d}.parquet")
+        self.batches += 1
+
+    def apply(self, cust_day_rows: pd.DataFrame, keys: np.ndarray | None = None) -> "EquipmentLedger":
+        """
+        Fold new `cust_day_group` rows into the ledger; cost scales with the new rows.
+
+        `keys`: the rows' `row_keys` when computed over a larger frame (default: over these rows).
+        """
+        seen = pd.to_datetime(cust_day_rows["date"], errors="coerce", dayfirst=True).max()
+        if pd.notna(seen) and (pd.isna(self.asof) or seen > self.asof):
+            self.asof = seen
+        if self.row_keys is not None:
+            self.row_keys = np.concatenate([self.row_keys, row_keys(cust_day_rows) if keys is None else keys])
+        p = purchase_rows(cust_day_rows)
+        days = day_events(p)
+        if days.empty:
+            return self
+
+        first_new = days.groupby("anon")["date"].min()
+        last_seen = self.customers["last_event_date"].reindex(first_new.index)
+        late = first_new.index[(first_new < last_seen).to_numpy()]
+        # a filter purchase added to the old last event day (not yet a filter day) needs that day's bottles
+        on_last = days[days["filter_day"].to_numpy() & (days["date"].to_numpy() == last_seen.reindex(days["anon"]).to_numpy())]["anon"].unique()
+        same_day = pd.Index(on_last)[(self.customers["last_filter_date"].reindex(on_last) != last_seen.reindex(on_last)).to_numpy()]
+        refold = late.union(same_day)
+
+        is_refold = days["anon"].isin(refold).to_numpy()
+        parts = []
+        if (~is_refold).any():
+            parts.append(_append_fold(self.customers, days[~is_refold]))
+        if len(refold):
+            # late-arriving events (or a new filter day on the old last event day): re-fold from history
+            history = self._history(refold.to_numpy(dtype=str))
+            merged = pd.concat([history, days[is_refold]], ignore_index=True)
+            merged = merged.groupby(["anon", "date"], as_index=False).agg(
+                bottles=("bottles", "sum"), filters=("filters", "sum"),
+                filter_units=("filter_units", "sum"), filter_day=("filter_day", "any"),
+            )
+            parts.append(fold_days(merged))
+        updated = pd.concat(parts)
+
+        keep = self.customers.drop(index=updated.index, errors="ignore")
+        self.customers = pd.concat([keep, updated])
+        self.customers.index.name = "anon"
+
+        ev = group_events(p)
+        touched = pd.MultiIndex.from_frame(ev[["anon", "product_group"]].drop_duplicates())
+        key = pd.MultiIndex.from_frame(self.groups[["anon", "product_group"]])
+        hit = key.isin(touched)
+        self.groups = pd.concat([self.groups[~hit], _fold_groups(self.groups[hit], ev)], ignore_index=True)
+
+        self._log(days)
+        self.stats = {"events": len(days), "customers_updated": len(updated), "late_customers": len(late)}
+        return self
+
+    # ---------- Persistence ----------
+    def save(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.customers.reset_index().to_parquet(self.path / "customers.parquet", index=False)
+        self.groups.to_parquet(self.path / "groups.parquet", index=False)
+        with open(self.path / "ledger.json", "w", encoding="utf-8") as f:
+            json.dump({"batches": self.batches, "asof": None if pd.isna(self.asof) else self.asof.isoformat()}, f)
+        if self.row_keys is not None:
+            np.save(self.path / "row_keys.npy", self.row_keys)
+
+def build_ledger(cust_day: pd.DataFrame, path: Path = LEDGER_DIR, keys: np.ndarray | None = None) -> EquipmentLedger:
+    """Initial ledger from the full `cust_day_group` (one fold, then incremental `apply`)."""
+    # batch files of an earlier ledger in `path` would be re-folded as history of late customers
+    shutil.rmtree(path / "events", ignore_errors=True)
+    return EquipmentLedger.empty(path).apply(cust_day, keys)
+
+def load_ledger(path: Path = LEDGER_DIR) -> EquipmentLedger:
+    with open(path / "ledger.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    customers = pd.read_parquet(path / "customers.parquet").set_index("anon")
+    keys = path / "row_keys.npy"
+    return EquipmentLedger(
+        customers=customers,
+        groups=pd.read_parquet(path / "groups.parquet"),
+        path=path,
+        batches=meta["batches"],
+        asof=pd.Timestamp(meta["asof"]) if meta.get("asof") else pd.NaT,
+        row_keys=np.load(keys) if keys.exists() else None,
+    )
+
+# ---------- Live table ----------
+def bottle_filter_benchmark(benchmarks: pd.DataFrame) -> float:
+    """Median days per unit of the bottle-filter group (notebook 06's column fallbacks)."""
+    median_col = next((c for c in ["median", "median_adj_retention_days", "median_adj", "median_adj_retention"] if c in benchmarks.columns), None)
+    group_col = next((c for c in [GROUP_COL, "product_group", "group"] if c in benchmarks.columns), None)
+    if median_col is None or group_col is None:
+        raise ValueError(f"Couldn't find median / product group columns in benchmarks. Columns: {benchmarks.columns.tolist()}")
+    bf = benchmarks.loc[benchmarks[group_col] == BOTTLE_FILTER_GROUP, median_col]
+    if bf.empty:
+        raise ValueError(f"No benchmark found for {BOTTLE_FILTER_GROUP} in benchmarks.")
+    return float(bf.iloc[0])
+
+def live_state(ledger: EquipmentLedger, benchmarks: pd.DataFrame, asof: pd.Timestamp | None = None) -> pd.DataFrame:
+    """
+    `live_customer_product_state` (notebook 06 schema) from the ledger snapshot.
+
+    Reads no event history: one vectorized pass over the snapshot rows, which is
+    needed anyway because every ASOF-relative column changes with the date.
+    """
+    asof = ledger.asof if asof is None else pd.Timestamp(asof)
+    days_per_unit = bottle_filter_benchmark(benchmarks)
+
+    live = ledger.groups.rename(columns={"product_group": GROUP_COL})
+    live = live.sort_values(["anon", GROUP_COL], kind="stable").reset_index(drop=True)
+    live["days_since_last_purchase"] = (asof - live["last_purchase_date"]).dt.days
+
+    c = ledger.customers[ledger.customers["last_filter_date"].notna()]
+    bf = pd.DataFrame({
+        "anon": c.index.to_numpy(),
+        GROUP_COL: BOTTLE_FILTER_GROUP,
+        "last_purchase_date": c["last_filter_date"].to_numpy(),
+        "filters_added_last_event": (c["filters_bought_last"] + c["bottles_bought_last"]).to_numpy(),
+        "bottles_owned": c["bottles_at_last_filter"].to_numpy(),
+    })
+    bf["bottles_owned_effective"] = bf["bottles_owned"].clip(lower=1)
+    bf["coverage_days_est"] = days_per_unit * (bf["filters_added_last_event"] / bf["bottles_owned_effective"])
+    bf["due_date"] = bf["last_purchase_date"] + pd.to_timedelta(bf["coverage_days_est"], unit="D")
+    bf["days_to_due"] = (bf["due_date"] - asof).dt.days
+    bf["status"] = np.select(
+        [bf["days_to_due"] < 0, (bf["days_to_due"] >= 0) & (bf["days_to_due"] <= DUE_SOON_DAYS)],
+        ["overdue", "due_soon_14d"],
+        default="ok",
+    )
+
+    bf_cols = ["due_date", "days_to_due", "status", "filters_added_last_event", "bottles_owned", "bottles_owned_effective", "coverage_days_est"]
+    live = live.merge(bf[["anon", GROUP_COL, "last_purchase_date", *bf_cols]], on=["anon", GROUP_COL, "last_purchase_date"], how="left")
+    live["actionable_status"] = np.where(
+        live[GROUP_COL].eq(BOTTLE_FILTER_GROUP),
+        live["status"].fillna("ok"),
+        "recency_only",
+    )
+    return live
+
+def update_live_state(
+    new_cust_day_rows: pd.DataFrame,
+    benchmarks: pd.DataFrame,
+    path: Path = LEDGER_DIR,
+    out_path: Path = LIVE_PATH,
+) -> dict:
+    """Daily refresh: apply new events to the saved ledger and rewrite the live table."""
+    ledger = load_ledger(path) if (path / "ledger.json").exists() else EquipmentLedger.empty(path)
+    ledger.apply(new_cust_day_rows)
+    ledger.save()
+    live_state(ledger, benchmarks).to_parquet(out_path, index=False)
+    return ledger.stats
+
+def refresh_live_state(
+    cust_day_path: Path = CUST_DAY_PATH,
+    benchmarks_path: Path = BENCHMARKS_PATH,
+    path: Path = LEDGER_DIR,
+    out_path: Path = LIVE_PATH,
+) -> dict:
+    """
+    Pipeline stage: bring the saved ledger up to date with `cust_day_group` and rewrite the live table.
+
+    Only rows whose key the ledger has not applied yet are folded in (late arrivals
+    included). When an applied row is gone or changed, or the ledger is missing or
+    has no row keys, the ledger is rebuilt from the full table instead.
+
+    Upstream rewrites cust_day_group whole (in anon order), so finding the new rows
+    is one streaming pass over the key columns, 8 bytes per row in memory; only the
+    new rows are materialized, logged and folded.
+    """
+    keys = scan_row_keys(cust_day_path)
+    ledger = load_ledger(path) if (path / "ledger.json").exists() else None
+    rebuild = ledger is None or ledger.row_keys is None or not np.isin(ledger.row_keys, keys).all()
+    if rebuild:
+        cols = _key_columns(pq.ParquetFile(cust_day_path))
+        ledger = build_ledger(pd.read_parquet(cust_day_path, columns=cols), path, keys)
+    else:
+        new = ~np.isin(keys, ledger.row_keys)
+        ledger.apply(read_rows(cust_day_path, new), keys[new])
+    ledger.save()
+    live_state(ledger, pd.read_parquet(benchmarks_path)).to_parquet(out_path, index=False)
+    return {**ledger.stats, "rebuilt": rebuild}
@@ -0,0 +1,125 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from pipeline.runner import Hasher
+
+INTERIM = Path("data/interim")
+INTERVALS_PATH = INTERIM / "purchase_intervals.parquet"
+DISTRIBUTIONS_PATH = INTERIM / "retention_distributions.npz"
+
+GROUP_COL = "MATRIX GRUPA PRODUKTOWA"
+VALUE_COL = "adj_retention_days"
+
+STAT_COLS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+# ---------- Per-group sorted intervals ----------
+@dataclass(frozen=True)
+class RetentionDistributions:
+    """
+    Sorted positive `adj_retention_days` per product group, stored flat.
+
+    Group g owns `values[offsets[g]:offsets[g + 1]]`; `stats` holds the same
+    numbers `Series.describe(percentiles=[.25, .5, .75])` would return.
+    `source_version` is the content hash of the purchase_intervals file it was
+    built from (the pipeline manifest's hash of that file).
+    """
+    product_groups: np.ndarray
+    offsets: np.ndarray
+    values: np.ndarray
+    stats: pd.DataFrame
+    source_version: str
+
+    def values_for(self, product_group) -> np.ndarray:
+        pos = np.flatnonzero(self.product_groups == str(product_group))
+        if len(pos) == 0:
+            return np.empty(0, dtype=float)
+        g = int(pos[0])
+        return self.values[self.offsets[g]:self.offsets[g + 1]]
+
+def sorted_quantile(xs: np.ndarray, q: float) -> float:
+    """Linear-interpolated quantile of an already sorted array (numpy's default method)."""
+    pos = q * (len(xs) - 1)
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, len(xs) - 1)
+    return float(xs[lo] + (xs[hi] - xs[lo]) * (pos - lo))
+
+def _describe_sorted(xs: np.ndarray) -> dict:
+    if len(xs) == 0:
+        return {c: (0.0 if c == "count" else np.nan) for c in STAT_COLS}
+    return {
+        "count": float(len(xs)),
+        "mean": float(xs.mean()),
+        "std": float(xs.std(ddof=1)) if len(xs) > 1 else np.nan,
+        "min": float(xs[0]),
+        "25%": sorted_quantile(xs, 0.25),
+        "50%": sorted_quantile(xs, 0.50),
+        "75%": sorted_quantile(xs, 0.75),
+        "max": float(xs[-1]),
+    }
+
+def build_retention_distributions(intervals: pd.DataFrame, source_version: str = "") -> RetentionDistributions:
+    x = pd.to_numeric(intervals[VALUE_COL], errors="coerce").to_numpy(dtype=float)
+    keep = np.isfinite(x) & (x > 0) & intervals["product_group"].notna().to_numpy()
+
+    codes, product_groups = pd.factorize(intervals["product_group"].to_numpy()[keep].astype(str), sort=True)
+    x = x[keep]
+
+    # one lexsort gives every group's values sorted and contiguous
+    order = np.lexsort((x, codes))
+    values = x[order]
+    offsets = np.searchsorted(codes[order], np.arange(len(product_groups) + 1), side="left")
+
+    stats = pd.DataFrame(
+        [_describe_sorted(values[offsets[g]:offsets[g + 1]]) for g in range(len(product_groups))],
+        index=pd.Index(product_groups, name="product_group"),
+        columns=STAT_COLS,
+    )
+    return RetentionDistributions(
+        product_groups=np.asarray(product_groups, dtype=str),
+        offsets=offsets.astype(np.int64),
+        values=values,
+        stats=stats,
+        source_version=source_version,
+    )
+
+# ---------- Sidecar artifact ----------
+def write_retention_distributions(dist: RetentionDistributions, path: Path = DISTRIBUTIONS_PATH) -> None:
+    np.savez(
+        path,
+        product_groups=dist.product_groups,
+        offsets=dist.offsets,
+        values=dist.values,
+        stats=dist.stats.to_numpy(dtype=float),
+        source_version=np.array(dist.source_version),
+    )
+
+def read_retention_distributions(path: Path = DISTRIBUTIONS_PATH) -> RetentionDistributions:
+    with np.load(path) as z:
+        product_groups = z["product_groups"]
+        return RetentionDistributions(
+            product_groups=product_groups,
+            offsets=z["offsets"],
+            values=z["values"],
+            stats=pd.DataFrame(z["stats"], index=pd.Index(product_groups, name="product_group"), columns=STAT_COLS),
+            source_version=str(z["source_version"]),
+        )
+
+def build_distributions(
+    intervals_path: Path = INTERVALS_PATH,
+    out_path: Path = DISTRIBUTIONS_PATH,
+) -> RetentionDistributions:
+    """Sidecar from the full purchase_intervals (pipeline stage), tagged with that file's content hash."""
+    names = pq.read_schema(intervals_path).names
+    group_col = GROUP_COL if GROUP_COL in names else "product_group"
+    intervals = pq.read_table(intervals_path, columns=[group_col, VALUE_COL]).to_pandas()
+    dist = build_retention_distributions(
+        intervals.rename(columns={group_col: "product_group"}),
+        source_version=Hasher().file(Path(intervals_path)),
+    )
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    write_retention_distributions(dist, out_path)
+    return dist
@@ -0,0 +1,263 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+import hashlib
+import inspect
+import json
+import os
+import time
+import pandas as pd
+
+INTERIM = Path("data/interim")
+MANIFEST_PATH = INTERIM / ".pipeline_manifest.json"
+
+_HASH_CHUNK = 1 << 20
+
+# ---------- Stages ----------
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of the data pipeline with explicit inputs and outputs.
+
+    `fn` must be a picklable top-level callable (or a partial of one): stages
+    run in worker processes. Its source file counts as an input, so editing
+    the code (or the notebook) of a stage reruns it.
+    """
+    name: str
+    inputs: tuple[Path, ...]
+    outputs: tuple[Path, ...]
+    fn: Callable[[], object]
+
+    def code_paths(self) -> tuple[Path, ...]:
+        fn = self.fn.func if isinstance(self.fn, partial) else self.fn
+        if fn is run_notebook and isinstance(self.fn, partial):
+            return (Path(self.fn.args[0]),)
+        src = inspect.getsourcefile(fn)
+        return (Path(os.path.relpath(src)),) if src else ()
+
+def run_notebook(path: Path, timeout: int | None = None) -> None:
+    """
+    Execute a numbered notebook from its own folder (they read ../data).
+
+    The executed copy is discarded: writing outputs back would change the
+    notebook, which is a code input of its stage, and rerun it every time.
+    """
+    try:
+        import nbformat
+        from nbclient import NotebookClient
+    except ImportError as e:
+        raise ImportError("notebook stages need nbclient and nbformat (pip install nbclient)") from e
+
+    path = Path(path)
+    nb = nbformat.read(path, as_version=4)
+    NotebookClient(nb, timeout=timeout, resources={"metadata": {"path": str(path.parent)}}).execute()
+
+def notebook_stage(name: str, notebook: str, inputs: Iterable[Path], outputs: Iterable[Path]) -> Stage:
+    return Stage(name, tuple(inputs), tuple(outputs), partial(run_notebook, Path(notebook)))
+
+# ---------- Content hashes ----------
+def _notebook_code(path: Path) -> bytes:
+    # code-cell sources only: outputs, execution counts and metadata change on every run
+    with path.open("r", encoding="utf-8") as f:
+        cells = json.load(f).get("cells", [])
+    sources = ["".join(c["source"]) if isinstance(c["source"], list) else c["source"] for c in cells if c.get("cell_type") == "code"]
+    return json.dumps(sources).encode()
+
+class Hasher:
+    """
+    Content hashes of files and directories, memoized in the manifest by (mtime, size).
+
+    Notebooks (.ipynb) hash only their code-cell sources.
+    """
+
+    def __init__(self, cache: dict | None = None):
+        self.cache: dict = cache if cache is not None else {}
+
+    def file(self, path: Path) -> str:
+        stat = path.stat()
+        notebook = path.suffix == ".ipynb"
+        key = path.as_posix() + ("#code" if notebook else "")
+        hit = self.cache.get(key)
+        if hit and hit["mtime_ns"] == stat.st_mtime_ns and hit["size"] == stat.st_size:
+            return hit["hash"]
+        h = hashlib.blake2b(digest_size=16)
+        if notebook:
+            h.update(_notebook_code(path))
+        else:
+            with path.open("rb") as f:
+                while chunk := f.read(_HASH_CHUNK):
+                    h.update(chunk)
+        self.cache[key] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": h.hexdigest()}
+        return h.hexdigest()
+
+    def path(self, path: Path) -> str | None:
+        """File hash, hash over (relative name, file hash) for directories, None if missing."""
+        if path.is_file():
+            return self.file(path)
+        if path.is_dir():
+            h = hashlib.blake2b(digest_size=16)
+            for f in sorted(p for p in path.rglob("*") if p.is_file()):
+                h.update(f"{f.relative_to(path).as_posix()}:{self.file(f)};".encode())
+            return h.hexdigest()
+        return None
+
+    def many(self, paths: Iterable[Path]) -> dict[str, str | None]:
+        return {p.as_posix(): self.path(p) for p in paths}
+
+# ---------- Manifest ----------
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_PATH) -> None:
+    # write-then-rename: an interrupted run never leaves a truncated manifest
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+# ---------- Graph ----------
+def stage_graph(stages: list[Stage]) -> dict[str, set[str]]:
+    """Upstream stage names per stage, from matching inputs to outputs."""
+    producer: dict[str, str] = {}
+    for s in stages:
+        for out in s.outputs:
+            if out.as_posix() in producer:
+                raise ValueError(f"{out.as_posix()} is produced by both {producer[out.as_posix()]} and {s.name}")
+            producer[out.as_posix()] = s.name
+    deps = {s.name: {producer[i.as_posix()] for i in s.inputs if i.as_posix() in producer} - {s.name} for s in stages}
+
+    # reject cycles up front instead of deadlocking the scheduler
+    seen, done = set(), set()
+    def visit(name: str) -> None:
+        if name in done:
+            return
+        if name in seen:
+            raise ValueError(f"pipeline has a cycle through {name}")
+        seen.add(name)
+        for d in deps[name]:
+            visit(d)
+        done.add(name)
+    for name in deps:
+        visit(name)
+    return deps
+
+def _upstream(deps: dict[str, set[str]], targets: Iterable[str]) -> set[str]:
+    out, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in deps:
+            raise KeyError(f"unknown stage: {name}")
+        if name not in out:
+            out.add(name)
+            todo.extend(deps[name])
+    return out
+
+# ---------- Runner ----------
+def _is_fresh(record: dict | None, inputs: dict, outputs: dict) -> bool:
+    if record is None or any(h is None for h in outputs.values()):
+        return False
+    return record.get("inputs") == inputs and record.get("outputs") == outputs
+
+def _timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def run_pipeline(
+    stages: list[Stage],
+    targets: Iterable[str] | None = None,
+    workers: int = 4,
+    force: Iterable[str] = (),
+    dry_run: bool = False,
+    manifest_path: Path = MANIFEST_PATH,
+) -> pd.DataFrame:
+    """
+    Run the stages needed for `targets` (default: all), skipping up-to-date ones.
+
+    A stage is up to date when the content hashes of its inputs (including its
+    code) and outputs match the manifest entry of its last successful run.
+    Stages run as soon as their upstream stages are done, up to `workers` at a
+    time, so independent branches proceed in parallel. A rerun stage whose
+    outputs come out byte-identical leaves its downstream stages skipped.
+    A failed stage blocks only its own downstream stages.
+    """
+    deps = stage_graph(stages)
+    by_name = {s.name: s for s in stages}
+    wanted = _upstream(deps, targets) if targets is not None else set(by_name)
+    force = set(force)
+
+    manifest = load_manifest(manifest_path)
+    hasher = Hasher(manifest.setdefault("files", {}))
+    records = manifest.setdefault("stages", {})
+
+    status: dict[str, str] = {}
+    report: list[dict] = []
+    running: dict[Future, tuple[str, dict]] = {}
+
+    def ready() -> list[str]:
+        return sorted(
+            n for n in wanted
+            if n not in status and all(status.get(d) in ("skipped", "ran", "would run") for d in deps[n] if d in wanted)
+        )
+
+    def finish(name: str, state: str, seconds: float = 0.0, error: str = "") -> None:
+        status[name] = state
+        report.append({"stage": name, "status": state, "seconds": round(seconds, 3), "error": error})
+
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+        while True:
+            # stages downstream of a failure can never run
+            for n in wanted:
+                if n not in status and any(status.get(d) in ("failed", "blocked") for d in deps[n]):
+                    finish(n, "blocked")
+
+            for name in ready():
+                if len(running) >= max(workers, 1):
+                    break
+                stage = by_name[name]
+                inputs = hasher.many([*stage.inputs, *stage.code_paths()])
+                outputs = hasher.many(stage.outputs)
+                missing = [p for p, h in inputs.items() if h is None]
+                upstream_changes = any(status.get(d) == "would run" for d in deps[name])
+                if name not in force and not upstream_changes and _is_fresh(records.get(name), inputs, outputs):
+                    finish(name, "skipped")
+                elif dry_run:
+                    finish(name, "would run")
+                elif missing:
+                    finish(name, "failed", error=f"missing inputs: {missing}")
+                else:
+                    status[name] = "running"
+                    running[pool.submit(_timed, stage.fn)] = (name, inputs)
+
+            if not running:
+                if not ready():
+                    break
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, inputs = running.pop(fut)
+                try:
+                    seconds = fut.result()
+                except Exception as e:  # noqa: BLE001 - reported per stage, other branches continue
+                    finish(name, "failed", error=f"{type(e).__name__}: {e}")
+                    continue
+                records[name] = {
+                    "inputs": inputs,
+                    "outputs": hasher.many(by_name[name].outputs),
+                    "finished_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+                    "seconds": round(seconds, 3),
+                }
+                save_manifest(manifest, manifest_path)
+                finish(name, "ran", seconds)
+
+    if not dry_run:
+        save_manifest(manifest, manifest_path)
+    return pd.DataFrame(report, columns=["stage", "status", "seconds", "error"])
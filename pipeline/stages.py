@@ -0,0 +1,155 @@
+from __future__ import annotations
+from functools import partial
+from pathlib import Path
+
+from pipeline.benchmarks import build_sketches
+from pipeline.decode import decode_orders
+from pipeline.landing import land_orders
+from pipeline.ledger import refresh_live_state
+from pipeline.retention import build_distributions
+from pipeline.runner import Stage, notebook_stage
+from pipeline.transitions import write_transitions
+from simulation.ltv import write_scores
+
+RAW = Path("data/raw")
+REFERENCE = Path("data/reference")
+INTERIM = Path("data/interim")
+MODELS = Path("data/models")
+
+ORDERS_LANDING = INTERIM / "orders_landing.parquet"
+SKU_LOOKUP = INTERIM / "sku_lookup.json"
+SKU_MAP = INTERIM / "sku_map.parquet"
+ORDER_LINES = INTERIM / "order_lines_canonical.parquet"
+CUST_DAY_GROUP = INTERIM / "cust_day_group.parquet"
+PURCHASE_INTERVALS = INTERIM / "purchase_intervals.parquet"
+RETENTION_BENCHMARKS = INTERIM / "retention_benchmarks.parquet"
+ENTRY_COUNTS = INTERIM / "entry_counts.parquet"
+ECOSYSTEM_EVENTS = INTERIM / "ecosystem_add_events.parquet"
+ORDER_SETS_RAW = INTERIM / "order_pg_ecosystem_sets_RAW.parquet"
+ORDER_SETS_K5 = INTERIM / "order_pg_ecosystem_sets_3y_k5.parquet"
+ECOSYSTEM_TRANSITIONS = INTERIM / "ecosystem_transitions"
+P_G_EK = INTERIM / "P_product_group_given_ecosystem_k.parquet"
+
+TRANSITION_TENSOR_PG = INTERIM / "transition_tensor_product_group.parquet"
+TRANSITION_TENSOR_ECO = INTERIM / "transition_tensor_ecosystem.parquet"
+
+PG_TRANSITIONS = tuple(INTERIM / f"transition_{k}_to_{k + 1}.parquet" for k in range(1, 5))
+
+# landing → decode → aggregate → cust_day_group → intervals/benchmarks (+ quantile sketches, distributions) → live state
+#                                              ↘ entry / transitions → structural inputs → Markov kernel → LTV scores
+# Stages not yet ported to the pipeline package run their numbered notebook.
+STAGES = [
+    Stage(
+        "landing",
+        inputs=(RAW / "full_orders_data.csv",),
+        outputs=(ORDERS_LANDING,),
+        fn=land_orders,
+    ),
+    notebook_stage(
+        "sku_lookup", "prepocessing/02_product_matrix_build_lookup.ipynb",
+        inputs=(RAW / "product_matrix.csv",),
+        outputs=(SKU_LOOKUP, SKU_MAP),
+    ),
+    Stage(
+        "decode",
+        inputs=(ORDERS_LANDING, SKU_LOOKUP),
+        outputs=(ORDER_LINES,),
+        fn=partial(decode_orders, workers=4),
+    ),
+    notebook_stage(
+        "aggregate", "decoding/04_orders_aggregation.ipynb",
+        inputs=(ORDER_LINES, SKU_MAP),
+        outputs=(CUST_DAY_GROUP,),
+    ),
+    notebook_stage(
+        "retention", "EDA/05_retetnion_analysis.ipynb",
+        inputs=(CUST_DAY_GROUP,),
+        outputs=(
+            INTERIM / "product_group_retention.parquet",
+            PURCHASE_INTERVALS,
+            RETENTION_BENCHMARKS,
+        ),
+    ),
+    Stage(
+        "benchmark_sketches",
+        inputs=(PURCHASE_INTERVALS,),
+        outputs=(INTERIM / "retention_benchmark_sketches.parquet",),
+        fn=build_sketches,
+    ),
+    Stage(
+        "retention_distributions",
+        inputs=(PURCHASE_INTERVALS,),
+        outputs=(INTERIM / "retention_distributions.npz",),
+        fn=build_distributions,
+    ),
+    Stage(
+        "live_state",
+        inputs=(CUST_DAY_GROUP, RETENTION_BENCHMARKS),
+        outputs=(INTERIM / "live_customer_product_state.parquet",),
+        fn=refresh_live_state,
+    ),
+    notebook_stage(
+        "entry_products", "LTV_analysis/08_entry_products.ipynb",
+        inputs=(CUST_DAY_GROUP,),
+        outputs=(ENTRY_COUNTS, INTERIM / "entry_counts_ret.parquet"),
+    ),
+    Stage(
+        "pg_transitions",
+        inputs=(CUST_DAY_GROUP, REFERENCE / "products_ecosystem.csv"),
+        outputs=(*PG_TRANSITIONS, TRANSITION_TENSOR_PG, TRANSITION_TENSOR_ECO),
+        fn=write_transitions,
+    ),
+    notebook_stage(
+        "ecosystems", "LTV_analysis/10_ecosystem_aggregation.ipynb",
+        inputs=(CUST_DAY_GROUP, REFERENCE / "products_ecosystem.csv"),
+        outputs=(ORDER_SETS_RAW, ECOSYSTEM_EVENTS, INTERIM / "order_ecosystem_sets.parquet"),
+    ),
+    notebook_stage(
+        "ecosystem_transitions", "LTV_analysis/11_ecosystem_transition_exploration.ipynb",
+        inputs=(ECOSYSTEM_EVENTS,),
+        outputs=(ECOSYSTEM_TRANSITIONS,),
+    ),
+    notebook_stage(
+        "timeline", "Logical_Framework/13_product_group_foundation.ipynb",
+        inputs=(CUST_DAY_GROUP, ENTRY_COUNTS, *PG_TRANSITIONS),
+        outputs=(INTERIM / "order_timeline_3y_k5.parquet",),
+    ),
+    notebook_stage(
+        "structural_inputs", "Logical_Framework/14_LTV_model_framework.ipynb",
+        inputs=(
+            ENTRY_COUNTS, *PG_TRANSITIONS, ECOSYSTEM_TRANSITIONS, ORDER_SETS_RAW,
+            INTERIM / "order_timeline_3y_k5.parquet",
+        ),
+        outputs=(ORDER_SETS_K5, P_G_EK),
+    ),
+    notebook_stage(
+        "entry_distribution", "Logical_Framework/15_structural_simulation.ipynb",
+        inputs=(ENTRY_COUNTS, P_G_EK, ECOSYSTEM_TRANSITIONS, REFERENCE / "products_ecosystem.csv"),
+        outputs=(INTERIM / "ecosystem_entry_distribution.parquet",),
+    ),
+    notebook_stage(
+        "markov_transitions", "Markov_chains/17_Markov_chain_v1.ipynb",
+        inputs=(ORDER_SETS_K5, ECOSYSTEM_EVENTS),
+        outputs=(INTERIM / "markov_transitions_v1.parquet",),
+    ),
+    notebook_stage(
+        "markov_kernel", "Markov_chains/18_Markov_chain_v2.ipynb",
+        # the last cell scores customers from the ecosystem events and landed orders
+        inputs=(INTERIM / "markov_transitions_v1.parquet", ECOSYSTEM_EVENTS, ORDERS_LANDING),
+        outputs=(
+            Path("Markov_chains/markov_transition_probs_v2.parquet"),   # written next to the notebook
+            MODELS / "markov_v2" / "markov_transition_probs.parquet",
+            MODELS / "markov_v2" / "markov_kernel.pkl",
+            MODELS / "markov_v2" / "markov_kernel",
+            MODELS / "markov_v2" / "simulated_states.parquet",
+            MODELS / "markov_v2" / "validation_diagnostics.parquet",
+            MODELS / "markov_v2" / "validation_diagnostics_ci.parquet",
+        ),
+    ),
+    Stage(
+        "ltv_scores",
+        inputs=(ECOSYSTEM_EVENTS, ORDERS_LANDING, MODELS / "markov_v2" / "markov_kernel"),
+        outputs=(INTERIM / "customer_ltv_scores.parquet",),
+        fn=write_scores,
+    ),
+]
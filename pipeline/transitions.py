@@ -0,0 +1,302 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+INTERIM = Path("data/interim")
+CUST_DAY_PATH = INTERIM / "cust_day_group.parquet"
+ECOSYSTEM_MAP_PATH = Path("data/reference/products_ecosystem.csv")
+PG_TENSOR_PATH = INTERIM / "transition_tensor_product_group.parquet"
+ECO_TENSOR_PATH = INTERIM / "transition_tensor_ecosystem.parquet"
+
+GROUP_COL = "MATRIX GRUPA PRODUKTOWA"
+UNMAPPED = "UNMAPPED"
+
+PG_MATRIX_STEPS = (1, 2, 3, 4)   # transition_{k}_to_{k+1}.parquet written by the pipeline
+
+# ---------- Tensor ----------
+@dataclass
+class TransitionTensor:
+    """
+    Weighted k -> k+1 transition counts in COO form.
+
+    Entry t adds `weight[t]` to (k[t], src[t], dst[t]); `k` is the 1-based
+    purchase the transition starts from, src/dst index `labels`. `support`
+    (k_max, n_labels) counts the orders at k + 1 whose source set contained
+    each label, where rows are normalized by it instead of by their weight.
+    """
+    labels: np.ndarray
+    k: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+    weight: np.ndarray
+    support: np.ndarray | None = None
+
+    @property
+    def k_max(self) -> int:
+        return int(self.k.max()) if len(self.k) else 0
+
+    @classmethod
+    def from_parts(cls, labels: np.ndarray, parts: list[tuple], with_support: bool) -> "TransitionTensor":
+        """Sum partial COO entries (k, src, dst, weight[, support rows]) from customer shards."""
+        n = len(labels)
+        k = np.concatenate([p[0] for p in parts]).astype(np.int64)
+        src = np.concatenate([p[1] for p in parts]).astype(np.int64)
+        dst = np.concatenate([p[2] for p in parts]).astype(np.int64)
+        w = np.concatenate([p[3] for p in parts])
+        keys, inv = np.unique((k * n + src) * n + dst, return_inverse=True)
+        weight = np.bincount(inv, weights=w, minlength=len(keys))
+
+        support = None
+        if with_support:
+            sk = np.concatenate([p[4] for p in parts]).astype(np.int64)
+            ss = np.concatenate([p[5] for p in parts]).astype(np.int64)
+            k_max = int(max(sk.max(initial=0), keys.max(initial=0) // (n * n)))
+            support = np.bincount((sk - 1) * n + ss, minlength=k_max * n)[:k_max * n].reshape(k_max, n) if k_max else np.zeros((0, n), dtype=np.int64)
+
+        return cls(
+            labels=np.asarray(labels, dtype=object),
+            k=(keys // (n * n)).astype(np.int16),
+            src=(keys // n % n).astype(np.int32),
+            dst=(keys % n).astype(np.int32),
+            weight=weight,
+            support=support,
+        )
+
+    def edges(self, k: int) -> pd.DataFrame:
+        m = self.k == k
+        return pd.DataFrame({
+            "from": self.labels[self.src[m]],
+            "to": self.labels[self.dst[m]],
+            "weight": self.weight[m],
+        })
+
+    def matrix(self, k: int, row_names: tuple[str, str] = ("entry_group", "next_group")) -> pd.DataFrame:
+        """
+        Row-normalized k -> k+1 matrix over the labels seen at that step.
+
+        Rows are divided by their weight sum, or by `support` when present
+        (the share of orders owning `from` that bought `to`).
+        """
+        e = self.edges(k)
+        mat = e.pivot(index="from", columns="to", values="weight").fillna(0)
+        if self.support is None:
+            mat = mat.div(mat.sum(axis=1), axis=0)
+        else:
+            # square over every label owned or bought at this step, like notebook 11
+            support = pd.Series(self.support[k - 1] if k <= len(self.support) else 0, index=self.labels)
+            labels = sorted(set(mat.index) | set(mat.columns) | set(support.index[support > 0]))
+            mat = mat.reindex(index=labels, columns=labels, fill_value=0.0)
+            mat = mat.div(support.reindex(labels), axis=0).fillna(0)
+        mat.index.name, mat.columns.name = row_names
+        return mat
+
+    # ---------- Persistence ----------
+    def save(self, path: Path) -> None:
+        table = pa.table({
+            "k": pa.array(self.k, type=pa.int16()),
+            "src": pa.array(self.src, type=pa.int32()),
+            "dst": pa.array(self.dst, type=pa.int32()),
+            "weight": pa.array(self.weight, type=pa.float64()),
+        })
+        meta = {
+            "labels": [str(x) for x in self.labels],
+            "support": None if self.support is None else self.support.tolist(),
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table.replace_schema_metadata({"transition_tensor": json.dumps(meta)}), path)
+
+def load_tensor(path: Path) -> TransitionTensor:
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[b"transition_tensor"])
+    return TransitionTensor(
+        labels=np.asarray(meta["labels"], dtype=object),
+        k=table.column("k").to_numpy(),
+        src=table.column("src").to_numpy(),
+        dst=table.column("dst").to_numpy(),
+        weight=table.column("weight").to_numpy(),
+        support=None if meta["support"] is None else np.asarray(meta["support"], dtype=np.int64),
+    )
+
+# ---------- Baskets ----------
+def _sets(cust: np.ndarray, k: np.ndarray, item: np.ndarray, n_items: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct (customer, k, item) rows sorted by customer, k, item."""
+    key = np.unique((cust.astype(np.int64) * (k.max(initial=0) + 1) + k) * n_items + item)
+    ck, item = np.divmod(key, n_items)
+    cust, k = np.divmod(ck, k.max(initial=0) + 1)
+    return cust, k, item
+
+def _cross(a_start: np.ndarray, a_len: np.ndarray, b_start: np.ndarray, b_len: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """All (a, b) position pairs of each block pair; returns (block, a_pos, b_pos)."""
+    sizes = a_len * b_len
+    block = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    i, j = np.divmod(local, b_len[block])
+    return block, a_start[block] + i, b_start[block] + j
+
+def _basket_transitions(cust: np.ndarray, k: np.ndarray, item: np.ndarray) -> tuple:
+    """
+    Basket k -> basket k+1 pairs per customer (notebook 09).
+
+    Every customer contributes weight 1 per step, split evenly over the
+    |B_k| x |B_k+1| pairs.
+    """
+    if len(cust) == 0:
+        return (np.empty(0, np.int64),) * 3 + (np.empty(0),)
+    start = np.flatnonzero(np.r_[True, (cust[1:] != cust[:-1]) | (k[1:] != k[:-1])])
+    length = np.diff(np.r_[start, len(cust)])
+    b_cust, b_k = cust[start], k[start]
+    has_next = np.r_[(b_cust[1:] == b_cust[:-1]) & (b_k[1:] == b_k[:-1] + 1), False]
+    a = np.flatnonzero(has_next)
+    block, pi, pj = _cross(start[a], length[a], start[a + 1], length[a + 1])
+    w = 1.0 / (length[a] * length[a + 1])[block]
+    return b_k[a][block], item[pi], item[pj], w
+
+def _owned_transitions(cust: np.ndarray, k: np.ndarray, item: np.ndarray) -> tuple:
+    """
+    Owned-before set -> order set pairs per customer (notebook 11).
+
+    For each order after a customer's first one, every label owned before it
+    (bought at any earlier k) pairs with every label of the order, weight 1;
+    `support` counts that order once for each owned label.
+    """
+    if len(cust) == 0:
+        return (np.empty(0, np.int64),) * 3 + (np.empty(0),) + (np.empty(0, np.int64),) * 2
+    # first k each customer bought each label, ordered by customer and first k
+    first = pd.DataFrame({"cust": cust, "k": k, "item": item}).groupby(["cust", "item"], sort=False)["k"].min().reset_index()
+    first = first.sort_values(["cust", "k", "item"], kind="stable")
+    f_cust, f_k, f_item = first["cust"].to_numpy(), first["k"].to_numpy(), first["item"].to_numpy()
+
+    start = np.flatnonzero(np.r_[True, (cust[1:] != cust[:-1]) | (k[1:] != k[:-1])])
+    length = np.diff(np.r_[start, len(cust)])
+    b_cust, b_k = cust[start], k[start]
+
+    # owned before order (c, k) = first-seen rows of c with first k < k: a prefix of c's block
+    f_lo = np.searchsorted(f_cust, b_cust, side="left")
+    f_key = f_cust.astype(np.int64) * (int(k.max(initial=0)) + 1) + f_k
+    owned = np.searchsorted(f_key, b_cust.astype(np.int64) * (int(k.max(initial=0)) + 1) + b_k, side="left") - f_lo
+    a = np.flatnonzero(owned > 0)
+
+    block, pi, pj = _cross(f_lo[a], owned[a], start[a], length[a])
+    sup_block = np.repeat(np.arange(len(a)), owned[a])
+    sup_pos = np.repeat(f_lo[a], owned[a]) + (np.arange(owned[a].sum()) - np.repeat(np.cumsum(owned[a]) - owned[a], owned[a]))
+    return (
+        b_k[a][block] - 1, f_item[pi], item[pj], np.ones(len(block)),
+        b_k[a][sup_block] - 1, f_item[sup_pos],
+    )
+
+def _shard_counts(args: tuple) -> tuple[tuple, tuple]:
+    pg, eco = args
+    return _basket_transitions(*pg), _owned_transitions(*eco)
+
+# ---------- Builder ----------
+def purchase_baskets(cust_day: pd.DataFrame, ecosystem_map: pd.DataFrame) -> dict:
+    """
+    Purchase numbers from one sort by (anon, date) and the k-indexed baskets.
+
+    - product groups: every row on a customer's k-th purchase day (notebook 09)
+    - ecosystems: purchase rows mapped through `ecosystem_map`, unmapped
+      groups left out (notebook 10)
+    """
+    df = cust_day[["anon", "date", GROUP_COL, "is_purchase"]].assign(
+        date=pd.to_datetime(cust_day["date"], errors="coerce", dayfirst=True).dt.normalize(),
+    ).dropna(subset=["anon", "date", GROUP_COL])
+
+    cust, customers = pd.factorize(df["anon"], sort=True)
+    day = df["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    groups_codes, groups = pd.factorize(df[GROUP_COL].astype(str).str.strip(), sort=True)
+    is_purchase = df["is_purchase"].to_numpy(dtype=bool)
+
+    # purchase_k: dense rank of purchase days within the customer
+    order = np.lexsort((day, cust))
+    c_s, d_s, p_s = cust[order], day[order], is_purchase[order]
+    pd_c, pd_d = c_s[p_s], d_s[p_s]
+    new_day = np.r_[True, (pd_c[1:] != pd_c[:-1]) | (pd_d[1:] != pd_d[:-1])]
+    new_cust = np.r_[True, pd_c[1:] != pd_c[:-1]]
+    rank = np.cumsum(new_day)
+    rank -= np.maximum.accumulate(np.where(new_cust, rank - 1, 0))
+    u_c, u_d, u_k = pd_c[new_day], pd_d[new_day], rank[new_day]
+
+    # every row on a purchase day gets that day's k
+    key_rows = c_s.astype(np.int64) * (d_s.max(initial=0) + 1 - d_s.min(initial=0)) + (d_s - d_s.min(initial=0))
+    key_days = u_c.astype(np.int64) * (d_s.max(initial=0) + 1 - d_s.min(initial=0)) + (u_d - d_s.min(initial=0))
+    pos = np.searchsorted(key_days, key_rows)
+    on_day = (pos < len(key_days)) & (key_days[np.minimum(pos, len(key_days) - 1)] == key_rows)
+    k_s = np.where(on_day, u_k[np.minimum(pos, len(u_k) - 1)], 0)
+
+    g_s = groups_codes[order]
+    pg = _sets(c_s[on_day], k_s[on_day], g_s[on_day], len(groups))
+
+    emap = ecosystem_map.assign(
+        product_group=ecosystem_map["product_group"].astype(str).str.strip(),
+        ecosystem=ecosystem_map["ecosystem"].astype(str).str.strip(),
+    ).drop_duplicates("product_group").set_index("product_group")["ecosystem"]
+    eco_of_group = emap.reindex(groups).fillna(UNMAPPED).to_numpy()
+    eco_codes, ecosystems = pd.factorize(eco_of_group, sort=True)
+    mapped = p_s & (eco_of_group[g_s] != UNMAPPED)
+    eco = _sets(c_s[mapped], k_s[mapped], eco_codes[g_s[mapped]], len(ecosystems))
+
+    return {
+        "customers": np.asarray(customers, dtype=object),
+        "product_groups": np.asarray(groups, dtype=object),
+        "ecosystems": np.asarray(ecosystems, dtype=object),
+        "pg": pg,
+        "eco": eco,
+    }
+
+def _shards(baskets: dict, n_shards: int) -> list[tuple]:
+    # contiguous customer ranges, so no basket or history spans two shards
+    n_customers = len(baskets["customers"])
+    edges = np.linspace(0, n_customers, max(n_shards, 1) + 1).astype(np.int64)
+    out = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        parts = []
+        for level in ("pg", "eco"):
+            cust, k, item = baskets[level]
+            a, b = np.searchsorted(cust, [lo, hi])
+            parts.append((cust[a:b], k[a:b], item[a:b]))
+        out.append(tuple(parts))
+    return out
+
+def build_transition_tensors(
+    cust_day: pd.DataFrame,
+    ecosystem_map: pd.DataFrame,
+    workers: int = 1,
+    n_shards: int | None = None,
+) -> tuple[TransitionTensor, TransitionTensor]:
+    """
+    Product-group and ecosystem transition tensors for every k -> k+1.
+
+    Purchases are sorted by (anon, date) once; customer shards are counted
+    independently (in `workers` processes) and their COO partials summed.
+    """
+    baskets = purchase_baskets(cust_day, ecosystem_map)
+    shards = _shards(baskets, n_shards or max(workers, 1) * 4)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_shard_counts, shards))
+    else:
+        results = [_shard_counts(s) for s in shards]
+
+    pg = TransitionTensor.from_parts(baskets["product_groups"], [r[0] for r in results], with_support=False)
+    eco = TransitionTensor.from_parts(baskets["ecosystems"], [r[1] for r in results], with_support=True)
+    return pg, eco
+
+def write_transitions(
+    cust_day_path: Path = CUST_DAY_PATH,
+    ecosystem_map_path: Path = ECOSYSTEM_MAP_PATH,
+    out_dir: Path = INTERIM,
+    workers: int = 4,
+) -> None:
+    """Pipeline stage: both tensors plus notebook 09's transition_{k}_to_{k+1} matrices."""
+    cust_day = pd.read_parquet(cust_day_path, columns=["anon", "date", GROUP_COL, "is_purchase"])
+    pg, eco = build_transition_tensors(cust_day, pd.read_csv(ecosystem_map_path, encoding="utf-8-sig"), workers=workers)
+    pg.save(out_dir / PG_TENSOR_PATH.name)
+    eco.save(out_dir / ECO_TENSOR_PATH.name)
+    for k in PG_MATRIX_STEPS:
+        pg.matrix(k).to_parquet(out_dir / f"transition_{k}_to_{k + 1}.parquet")
@@ -0,0 +1,160 @@
+from __future__ import annotations
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from simulation.markov_exact import expected_value_table
+from simulation.markov_kernel import KERNEL_DIR, MarkovKernel, open_kernel
+
+INTERIM = Path("data/interim")
+EVENTS_PATH = INTERIM / "ecosystem_add_events.parquet"
+ORDERS_PATH = INTERIM / "orders_landing.parquet"
+SCORES_PATH = INTERIM / "customer_ltv_scores.parquet"
+
+DEFAULT_K_MAX = 15          # same horizon as notebook 18
+DEFAULT_BATCH_SIZE = 1_000_000
+
+SCORE_COLS = ["anon", "purchase_k", "S_k_key", "expected_purchases", "expected_revenue"]
+
+# ---------- Inputs ----------
+def customer_states(events: pd.DataFrame) -> pd.DataFrame:
+    """Latest (purchase_k, owned-ecosystem state) per customer from ecosystem_add_events."""
+    anon = events["anon"].astype(str).to_numpy()
+    k = events["purchase_k"].to_numpy(dtype=np.int64)
+    order = np.lexsort((k, anon))
+    last = order[np.r_[anon[order][1:] != anon[order][:-1], True]]
+    return pd.DataFrame({
+        "anon": anon[last],
+        "purchase_k": k[last],
+        "S_k_key": events["curr_ecos_str"].astype(str).to_numpy()[last],
+    })
+
+def order_value_by_k(orders: pd.DataFrame, k_max: int = DEFAULT_K_MAX) -> np.ndarray:
+    """
+    Mean revenue of a customer's k-th purchase day, index k = 1..k_max (index 0 unused).
+
+    Orders are summed per customer-day (the purchase unit of purchase_k); steps
+    with no observed purchases fall back to the overall mean.
+    """
+    day = pd.to_datetime(orders["date"], errors="coerce", dayfirst=True).dt.normalize()
+    df = pd.DataFrame({"anon": orders["anon"].astype(str), "day": day, "amount": pd.to_numeric(orders["amount"], errors="coerce")})
+    daily = df.dropna(subset=["day"]).groupby(["anon", "day"], sort=True)["amount"].sum(min_count=1).reset_index()
+    daily["k"] = daily.groupby("anon").cumcount() + 1
+
+    by_k = daily.groupby("k")["amount"].mean()
+    overall = float(daily["amount"].mean()) if daily["amount"].notna().any() else 0.0
+    return by_k.reindex(np.arange(k_max + 1)).fillna(overall).to_numpy(dtype=float)
+
+def continuation_by_k(events: pd.DataFrame, kernel: MarkovKernel, k_max: int = DEFAULT_K_MAX) -> np.ndarray:
+    """
+    P(a customer at (k, state) makes purchase k + 1), shape (k_max + 1, n_states), index k = 0..k_max.
+
+    Estimated from ecosystem_add_events (one row per purchase k >= 2): of the
+    customers observed at (k, state), the share also observed at k + 1. States
+    never observed at k fall back to that step's pooled share (0 if the step
+    has no customers).
+    """
+    anon = events["anon"].astype(str).to_numpy()
+    k = events["purchase_k"].to_numpy(dtype=np.int64)
+    code = pd.Index(kernel.states).get_indexer(events["curr_ecos_str"].astype(str)).astype(np.int64)
+    order = np.lexsort((k, anon))
+    anon, k, code = anon[order], k[order], code[order]
+    reached = np.r_[(anon[1:] == anon[:-1]) & (k[1:] == k[:-1] + 1), False]
+
+    keep = (code >= 0) & (k >= 0) & (k <= k_max)
+    cell = k[keep] * kernel.n_states + code[keep]
+    size = (k_max + 1) * kernel.n_states
+    at = np.bincount(cell, minlength=size).reshape(k_max + 1, kernel.n_states)
+    nxt = np.bincount(cell, weights=reached[keep], minlength=size).reshape(k_max + 1, kernel.n_states)
+
+    pooled = np.divide(nxt.sum(axis=1), at.sum(axis=1), out=np.zeros(k_max + 1), where=at.sum(axis=1) > 0)
+    return np.where(at > 0, nxt / np.maximum(at, 1), pooled[:, None])
+
+def read_orders(path: Path = ORDERS_PATH) -> pd.DataFrame:
+    # only the three columns needed, from the month-partitioned landing
+    table = ds.dataset(path, format="parquet", partitioning="hive").to_table(columns=["Anon", "Data zakupu", "Kwota"])
+    return table.to_pandas().rename(columns={"Anon": "anon", "Data zakupu": "date", "Kwota": "amount"})
+
+# ---------- Scoring ----------
+def future_value_tables(
+    kernel: MarkovKernel,
+    order_values: np.ndarray,
+    continuation: np.ndarray,
+    k_start: int,
+    k_max: int = DEFAULT_K_MAX,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Expected purchases and revenue after (k, state), for every k in [k_start, k_max] and state.
+
+    `continuation` (from `continuation_by_k`) is the chance of any next
+    purchase, the kernel only says where it goes. `expected_value_table`
+    counts the starting step, so its value is subtracted: a customer is
+    scored on what is still to come.
+    """
+    n_steps = k_max - k_start + 1
+    per_step = np.broadcast_to(np.asarray(order_values, dtype=float)[k_start:k_max + 1, None], (n_steps, kernel.n_states))
+    cont = np.asarray(continuation, dtype=float)[k_start:k_max + 1]
+    purchases = expected_value_table(kernel, 1.0, k_start, k_max, cont) - 1.0
+    revenue = expected_value_table(kernel, per_step, k_start, k_max, cont) - per_step
+    return purchases, revenue
+
+def score_customers(
+    kernel: MarkovKernel,
+    states: pd.DataFrame,
+    order_values: np.ndarray,
+    continuation: np.ndarray,
+    k_max: int = DEFAULT_K_MAX,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> pd.DataFrame:
+    """
+    Expected future purchases / revenue up to `k_max` for every customer in `states`.
+
+    The value tables are built once per kernel (one backward pass); scoring is a
+    table lookup per batch of customers. Customers the kernel cannot place (k
+    before its first step or an unseen state) get NaN; customers at or past
+    `k_max` get 0.
+    """
+    k_start = int(kernel.ks.min())
+    purchases, revenue = future_value_tables(kernel, order_values, continuation, k_start, k_max)
+
+    out = []
+    for lo in range(0, len(states), batch_size):
+        batch = states.iloc[lo:lo + batch_size]
+        k = batch["purchase_k"].to_numpy(dtype=np.int64)
+        # unknown states -> -1, no per-row string search
+        code = pd.Index(kernel.states).get_indexer(batch["S_k_key"].astype(str)).astype(np.int64)
+
+        step = np.clip(k - k_start, 0, len(purchases) - 1)
+        placed = (code >= 0) & (k >= k_start)
+        exp_p = np.where(placed, purchases[step, np.maximum(code, 0)], np.nan)
+        exp_r = np.where(placed, revenue[step, np.maximum(code, 0)], np.nan)
+        beyond = placed & (k >= k_max)
+        exp_p[beyond] = 0.0
+        exp_r[beyond] = 0.0
+        out.append(batch.assign(expected_purchases=exp_p, expected_revenue=exp_r))
+    if not out:
+        return pd.DataFrame(columns=SCORE_COLS)
+    return pd.concat(out, ignore_index=True)[SCORE_COLS]
+
+def write_scores(
+    events_path: Path = EVENTS_PATH,
+    orders_path: Path = ORDERS_PATH,
+    kernel_path: Path = KERNEL_DIR,
+    out_path: Path = SCORES_PATH,
+    k_max: int = DEFAULT_K_MAX,
+) -> pd.DataFrame:
+    """Pipeline stage: score every customer with the current kernel and order values."""
+    events = pq.read_table(events_path, columns=["anon", "purchase_k", "curr_ecos_str"]).to_pandas()
+    kernel = open_kernel(kernel_path)
+    scores = score_customers(
+        kernel,
+        customer_states(events),
+        order_value_by_k(read_orders(orders_path), k_max),
+        continuation_by_k(events, kernel, k_max),
+        k_max,
+    )
+    pq.write_table(pa.Table.from_pandas(scores, preserve_index=False), out_path)
+    return scores
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from simulation.markov_kernel import MarkovKernel
+
+def _step_entries(kernel: MarkovKernel, k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(source state, next state, probability) of every transition entry at step k."""
+    slot = np.searchsorted(kernel.ks, k)
+    if slot >= len(kernel.ks) or kernel.ks[slot] != k:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    n = kernel.n_states
+    row_ptr = kernel.indptr[slot * n:(slot + 1) * n + 1]
+    lo, hi = row_ptr[0], row_ptr[-1]
+    src = np.repeat(np.arange(n), np.diff(row_ptr))
+    return src, kernel.indices[lo:hi], kernel.probs[lo:hi]
+
+def _entry_vector(kernel: MarkovKernel, s0) -> np.ndarray:
+    pi = np.zeros(kernel.n_states)
+    if isinstance(s0, pd.Series):
+        np.add.at(pi, kernel.encode(s0.index.to_numpy()), s0.to_numpy(dtype=float))
+        return pi / pi.sum()
+    pi[kernel.encode(s0)[0]] = 1.0
+    return pi
+
+@dataclass(frozen=True)
+class ExactPaths:
+    """
+    Exact path-state distribution of the markov_v2 process.
+
+    `reach[i, s]` is P(path reaches step k_start + i in state s); `stop[i, s]`
+    is P(path ends at that step in state s), either because (k, s) has no
+    outgoing transitions or because k == k_max.
+    """
+    kernel: MarkovKernel
+    k_start: int
+    reach: np.ndarray
+    stop: np.ndarray
+
+    @property
+    def ks(self) -> np.ndarray:
+        return np.arange(self.k_start, self.k_start + len(self.reach))
+
+    def state_marginals(self) -> pd.DataFrame:
+        """P(S_k | path reached k): the exact counterpart of notebook 18's `state_freq`."""
+        i, s = np.nonzero(self.reach)
+        mass = self.reach[i, s]
+        return pd.DataFrame({
+            "purchase_k": self.ks[i],
+            "S_k_key": self.kernel.states[s],
+            "p": mass / self.reach.sum(axis=1)[i],
+        })
+
+    def terminal_distribution(self) -> pd.DataFrame:
+        """P(last purchase step = k): the exact counterpart of `terminal_k`."""
+        return pd.DataFrame({"purchase_k": self.ks, "p": self.stop.sum(axis=1)})
+
+    def expected_purchases(self) -> float:
+        return float(self.reach.sum())
+
+    def expected_value(self, values: np.ndarray) -> float:
+        """E[sum of values[k - k_start, S_k] over visited steps]; values shaped like `reach` or (n_states,)."""
+        return float((self.reach * values).sum())
+
+def propagate(kernel: MarkovKernel, s0, k_start: int = 1, k_max: int = 5) -> ExactPaths:
+    """Push the entry distribution through P_k with one sparse vector-matrix product per step."""
+    n_steps = k_max - k_start + 1
+    reach = np.zeros((n_steps, kernel.n_states))
+    stop = np.zeros_like(reach)
+
+    pi = _entry_vector(kernel, s0)
+    for i, k in enumerate(range(k_start, k_max + 1)):
+        reach[i] = pi
+        if k == k_max:
+            stop[i] = pi
+            break
+        src, dst, p = _step_entries(kernel, k)
+        has_next = np.zeros(kernel.n_states, dtype=bool)
+        has_next[src] = True
+        stop[i] = np.where(has_next, 0.0, pi)
+        pi = np.bincount(dst, weights=pi[src] * p, minlength=kernel.n_states)
+    return ExactPaths(kernel=kernel, k_start=k_start, reach=reach, stop=stop)
+
+def expected_value_table(
+    kernel: MarkovKernel,
+    values: np.ndarray,
+    k_start: int = 1,
+    k_max: int = 5,
+    continuation: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    V[i, s] = expected sum of values over the steps a path visits from (k_start + i, s) to the end,
+    counting the starting step.
+
+    One backward sparse matrix-vector product per step gives the answer for every
+    (k, state) at once. `values` is (n_steps, n_states) or (n_states,).
+    `continuation[i, s]` (same shapes) is P(path at (k_start + i, s) takes
+    another step); the kernel itself is conditional on a next step, so
+    without it a path only stops where (k, s) has no outgoing transitions.
+    """
+    n_steps = k_max - k_start + 1
+    values = np.broadcast_to(np.asarray(values, dtype=float), (n_steps, kernel.n_states))
+    cont = np.broadcast_to(np.asarray(1.0 if continuation is None else continuation, dtype=float), (n_steps, kernel.n_states))
+    V = np.zeros((n_steps, kernel.n_states))
+
+    V[-1] = values[-1]
+    for i in range(n_steps - 2, -1, -1):
+        src, dst, p = _step_entries(kernel, k_start + i)
+        V[i] = values[i] + cont[i] * np.bincount(src, weights=p * V[i + 1][dst], minlength=kernel.n_states)
+    return V
+
+def compare_to_empirical(paths: ExactPaths, counts: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Notebook 18 Step 7 with exact instead of simulated marginals: (compare, diagnostics)."""
+    empirical = counts.groupby(["purchase_k", "S_k_key"])["n"].sum().reset_index()
+    empirical["p_emp"] = empirical["n"] / empirical.groupby("purchase_k")["n"].transform("sum")
+
+    exact = paths.state_marginals().rename(columns={"p": "p_sim"})
+    exact["S_k_key"] = exact["S_k_key"].astype(str)
+
+    compare = (
+        empirical[["purchase_k", "S_k_key", "p_emp"]]
+        .merge(exact, on=["purchase_k", "S_k_key"], how="outer")
+        .fillna(0.0)
+    )
+    compare["abs_diff"] = (compare["p_sim"] - compare["p_emp"]).abs()
+
+    diagnostics = (
+        compare.groupby("purchase_k")["abs_diff"]
+        .agg(mean_abs_diff="mean", max_abs_diff="max")
+        .reset_index()
+    )
+    return compare, diagnostics
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import numpy as np
+import pandas as pd
+
+MODEL_DIR = Path("data/models/markov_v2")
+TRANSITION_PROBS = MODEL_DIR / "markov_transition_probs.parquet"
+
+# directory of raw .npy arrays + header.json; notebook 18 still exports the pickled dict P
+# (markov_kernel.pkl) next to it for older readers
+KERNEL_DIR = MODEL_DIR / "markov_kernel"
+KERNEL_FORMAT = "markov-kernel-csr"
+KERNEL_VERSION = 1
+_ARRAYS = {"ks": np.int64, "indptr": np.int64, "indices": np.int64, "probs": np.float64, "cum_key": np.float64}
+
+@dataclass(frozen=True, eq=False)
+class MarkovKernel:
+    """
+    Integer-coded P_k(S_next | S_k) for every purchase step k.
+
+    Row r = slot(k) * n_states + state indexes a CSR segment
+    `indices[indptr[r]:indptr[r + 1]]` of next-state codes. `cum_key` holds
+    r + cumulative probability, so it increases across the whole array and one
+    searchsorted of (r + u) samples every path at once. An empty segment means
+    (k, S_k) has no observed outgoing transition: the path terminates there.
+
+    `==` is identity (the fields are arrays); compare contents with `kernels_equal`.
+    """
+    states: np.ndarray      # state labels, position = code
+    ks: np.ndarray          # purchase_k values present, sorted
+    indptr: np.ndarray      # len = len(ks) * n_states + 1
+    indices: np.ndarray     # next-state code per entry
+    probs: np.ndarray       # probability per entry
+    cum_key: np.ndarray     # row + cumulative probability per entry
+    path: Path | None = field(default=None, compare=False, repr=False)  # set when memory-mapped
+
+    def __reduce__(self):
+        # a mapped kernel pickles as its directory: workers re-map the same
+        # read-only pages instead of receiving a copy of every array
+        if self.path is not None:
+            return (open_kernel, (self.path,))
+        return super().__reduce__()
+
+    @property
+    def n_states(self) -> int:
+        return len(self.states)
+
+    def encode(self, labels) -> np.ndarray:
+        labels = np.atleast_1d(np.asarray(labels, dtype=object))
+        codes = np.searchsorted(self.states, labels)
+        codes = np.minimum(codes, self.n_states - 1)
+        if not (self.states[codes] == labels).all():
+            raise KeyError(f"Unknown states: {sorted(set(labels) - set(self.states))}")
+        return codes.astype(np.int64)
+
+    def rows(self, k: int, codes: np.ndarray) -> np.ndarray:
+        """CSR row per state code at step k, or -1 where step k has no transitions."""
+        slot = np.searchsorted(self.ks, k)
+        if slot >= len(self.ks) or self.ks[slot] != k:
+            return np.full(len(codes), -1, dtype=np.int64)
+        return slot * self.n_states + codes
+
+def kernels_equal(a: MarkovKernel, b: MarkovKernel) -> bool:
+    """Same states, steps and CSR arrays (compiled, loaded or memory-mapped alike)."""
+    return all(np.array_equal(getattr(a, name), getattr(b, name)) for name in ("states", *_ARRAYS))
+
+def compile_kernel(counts: pd.DataFrame) -> MarkovKernel:
+    """Compile long-form transition probabilities (purchase_k, S_k_key, S_next_key, p)."""
+    states = np.unique(np.concatenate([
+        counts["S_k_key"].astype(str).to_numpy(),
+        counts["S_next_key"].astype(str).to_numpy(),
+    ])).astype(object)
+    ks = np.unique(counts["purchase_k"].to_numpy()).astype(np.int64)
+
+    slot = np.searchsorted(ks, counts["purchase_k"].to_numpy())
+    src = np.searchsorted(states, counts["S_k_key"].astype(str).to_numpy())
+    dst = np.searchsorted(states, counts["S_next_key"].astype(str).to_numpy())
+    row = slot * len(states) + src
+
+    order = np.lexsort((dst, row))
+    row, dst = row[order], dst[order]
+    probs = counts["p"].to_numpy(dtype=float)[order]
+
+    n_rows = len(ks) * len(states)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.add.at(indptr, row + 1, 1)
+    indptr = np.cumsum(indptr)
+
+    # cumulative probability within each row, renormalized so every row ends at exactly 1
+    row_total = np.bincount(row, weights=probs, minlength=n_rows)
+    cum = np.cumsum(probs)
+    first = indptr[row]
+    cum_within = (cum - cum[first] + probs[first]) / row_total[row]
+    cum_within[indptr[1:][np.diff(indptr) > 0] - 1] = 1.0
+
+    return MarkovKernel(
+        states=states,
+        ks=ks,
+        indptr=indptr,
+        indices=dst.astype(np.int64),
+        probs=probs / row_total[row],
+        cum_key=row + cum_within,
+    )
+
+def load_kernel(path: Path = TRANSITION_PROBS) -> MarkovKernel:
+    return compile_kernel(pd.read_parquet(path, columns=["purchase_k", "S_k_key", "S_next_key", "p"]))
+
+# ---------- Memory-mapped format ----------
+def save_kernel(kernel: MarkovKernel, path: Path = KERNEL_DIR) -> None:
+    """
+    Write `kernel` as one .npy file per CSR array plus a versioned header.
+
+    The header is written last, so a directory without a readable header
+    (interrupted write) is never opened as a kernel.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "header.json").unlink(missing_ok=True)
+    for name, dtype in _ARRAYS.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(getattr(kernel, name), dtype=dtype))
+    header = {
+        "format": KERNEL_FORMAT,
+        "version": KERNEL_VERSION,
+        "n_states": kernel.n_states,
+        "n_entries": int(len(kernel.indices)),
+        "states": [str(s) for s in kernel.states],
+    }
+    tmp = path / "header.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    tmp.replace(path / "header.json")
+
+def open_kernel(path: Path = KERNEL_DIR, mmap: bool = True) -> MarkovKernel:
+    """
+    Open a kernel written by `save_kernel`.
+
+    With `mmap` the arrays are read-only memory maps: opening costs a header
+    read, pages load on first use and are shared by every process (pool
+    workers, Streamlit sessions) mapping the same files.
+    """
+    path = Path(path)
+    with open(path / "header.json", "r", encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format") != KERNEL_FORMAT or header.get("version") != KERNEL_VERSION:
+        raise ValueError(
+            f"{path.as_posix()} is {header.get('format')} v{header.get('version')}, "
+            f"expected {KERNEL_FORMAT} v{KERNEL_VERSION}; rebuild it with save_kernel"
+        )
+    arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None) for name in _ARRAYS}
+    if len(arrays["indptr"]) != len(arrays["ks"]) * header["n_states"] + 1 or len(arrays["indices"]) != header["n_entries"]:
+        raise ValueError(f"{path.as_posix()}: arrays do not match header.json")
+    return MarkovKernel(
+        states=np.asarray(header["states"], dtype=object),
+        **arrays,
+        path=path if mmap else None,
+    )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from simulation.markov_kernel import MarkovKernel
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+def step_batch(kernel: MarkovKernel, k: int, codes: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample S_{k+1} for a whole batch of paths in state `codes` at step k.
+
+    Returns next-state codes, -1 where (k, S_k) has no outgoing transitions
+    (truncate, same rule as `sample_next_state` in notebook 18).
+    """
+    rows = kernel.rows(k, codes)
+    alive = rows >= 0
+    alive[alive] = kernel.indptr[rows[alive] + 1] > kernel.indptr[rows[alive]]
+
+    out = np.full(len(codes), -1, dtype=np.int64)
+    if alive.any():
+        u = rng.random(int(alive.sum()))
+        pos = np.searchsorted(kernel.cum_key, rows[alive] + u, side="right")
+        out[alive] = kernel.indices[pos]
+    return out
+
+def simulate_codes(
+    kernel: MarkovKernel,
+    s0: np.ndarray,
+    k_start: int = 1,
+    k_max: int = 5,
+    rng: np.random.Generator | None = None,
+    sim_id_offset: int = 0,
+) -> dict[str, np.ndarray]:
+    """
+    Simulate one batch of paths from entry state codes `s0`.
+
+    Returns columns sim_id / purchase_k / S_k (state code), ordered by step;
+    each path has one row per step it reached.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    sim_id = np.arange(len(s0), dtype=np.int64) + sim_id_offset
+    codes = np.asarray(s0, dtype=np.int64)
+    out_id, out_k, out_s = [], [], []
+
+    for k in range(k_start, k_max + 1):
+        out_id.append(sim_id)
+        out_k.append(np.full(len(sim_id), k, dtype=np.int16))
+        out_s.append(codes)
+        if k == k_max:
+            break
+        nxt = step_batch(kernel, k, codes, rng)
+        keep = nxt >= 0
+        sim_id, codes = sim_id[keep], nxt[keep]
+        if len(codes) == 0:
+            break
+
+    return {
+        "sim_id": np.concatenate(out_id),
+        "purchase_k": np.concatenate(out_k),
+        "S_k": np.concatenate(out_s),
+    }
+
+def to_frame(kernel: MarkovKernel, cols: dict[str, np.ndarray]) -> pd.DataFrame:
+    """Columnar `simulated_states` table; S_k_key is a categorical over the kernel vocabulary."""
+    return pd.DataFrame({
+        "sim_id": cols["sim_id"],
+        "purchase_k": cols["purchase_k"].astype(np.int64),
+        "S_k_key": pd.Categorical.from_codes(cols["S_k"], categories=kernel.states),
+    })
+
+def entry_codes(kernel: MarkovKernel, s0, n: int, rng: np.random.Generator) -> np.ndarray:
+    """`n` entry state codes; s0 is one state label or a pd.Series of entry probabilities indexed by label."""
+    if isinstance(s0, pd.Series):
+        p = s0.to_numpy(dtype=float)
+        return kernel.encode(s0.index.to_numpy())[rng.choice(len(p), size=n, p=p / p.sum())]
+    return np.full(n, kernel.encode(s0)[0], dtype=np.int64)
+
+def simulate_chunks(
+    kernel: MarkovKernel,
+    s0,
+    n_paths: int,
+    k_start: int = 1,
+    k_max: int = 5,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[dict[str, np.ndarray]]:
+    """
+    Simulate `n_paths` in chunks of at most `chunk_size` paths.
+
+    Chunk i draws from the i-th child of SeedSequence(seed), so the result does
+    not depend on how chunks are scheduled; memory stays bounded by one chunk.
+    """
+    n_chunks = -(-n_paths // chunk_size)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        rng = np.random.default_rng(child)
+        n = min(chunk_size, n_paths - i * chunk_size)
+        yield simulate_codes(
+            kernel,
+            entry_codes(kernel, s0, n, rng),
+            k_start=k_start,
+            k_max=k_max,
+            rng=rng,
+            sim_id_offset=i * chunk_size,
+        )
+
+def simulate_batch(
+    kernel: MarkovKernel,
+    s0,
+    n_paths: int,
+    k_start: int = 1,
+    k_max: int = 5,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> pd.DataFrame:
+    """Vectorized replacement for notebook 18's simulate_batch + flatten: returns `sim_states`."""
+    chunks = list(simulate_chunks(kernel, s0, n_paths, k_start, k_max, seed, chunk_size))
+    cols = {c: np.concatenate([ch[c] for ch in chunks]) for c in ("sim_id", "purchase_k", "S_k")}
+    return to_frame(kernel, cols)
+
+def write_simulated_states(
+    path: Path,
+    kernel: MarkovKernel,
+    s0,
+    n_paths: int,
+    k_start: int = 1,
+    k_max: int = 5,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Stream simulated paths to a parquet file chunk by chunk; returns rows written."""
+    rows = 0
+    writer = None
+    try:
+        for cols in simulate_chunks(kernel, s0, n_paths, k_start, k_max, seed, chunk_size):
+            table = pa.Table.from_pandas(to_frame(kernel, cols), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
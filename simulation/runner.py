@@ -0,0 +1,204 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+import numpy as np
+import pandas as pd
+
+from simulation.markov_kernel import MarkovKernel
+from simulation.markov_sim import entry_codes, simulate_codes
+from simulation.structural import StructuralSampler
+
+# chunk_fn(model, n, seed_seq) -> {table name: counts (rows × outcomes)}; every row is one distribution
+ChunkFn = Callable[[object, int, np.random.SeedSequence], dict[str, np.ndarray]]
+
+Z_95 = 1.959963984540054
+
+# ---------- Chunk functions ----------
+def markov_chunk_counts(model: tuple, n: int, seed_seq: np.random.SeedSequence) -> dict[str, np.ndarray]:
+    """model = (kernel, s0, k_start, k_max); counts of S_k per step k."""
+    kernel, s0, k_start, k_max = model
+    rng = np.random.default_rng(seed_seq)
+    cols = simulate_codes(kernel, entry_codes(kernel, s0, n, rng), k_start, k_max, rng)
+    n_steps = k_max - k_start + 1
+    flat = (cols["purchase_k"].astype(np.int64) - k_start) * kernel.n_states + cols["S_k"]
+    return {"S": np.bincount(flat, minlength=n_steps * kernel.n_states).reshape(n_steps, kernel.n_states)}
+
+def structural_chunk_counts(model: StructuralSampler, n: int, seed_seq: np.random.SeedSequence) -> dict[str, np.ndarray]:
+    """Counts of E_k and G_k per step, plus E_k → E_{k+1} counts per from-ecosystem."""
+    E, G = model.sample_codes(n, np.random.default_rng(seed_seq))
+    n_e, n_g, K = len(model.ecosystems), len(model.product_groups), model.K
+    steps = np.arange(K)
+    out = {
+        "E": np.bincount((steps * n_e + E).ravel(), minlength=K * n_e).reshape(K, n_e),
+        "G": np.bincount((steps * n_g + G).ravel(), minlength=K * n_g).reshape(K, n_g),
+    }
+    for k in range(1, K):
+        out[f"E{k}E{k+1}"] = np.bincount(E[:, k - 1] * n_e + E[:, k], minlength=n_e * n_e).reshape(n_e, n_e)
+    return out
+
+# ---------- Confidence bounds ----------
+def l1_halfwidth(counts: np.ndarray, z: float = Z_95) -> np.ndarray:
+    """
+    Per-row confidence half-width for any L1 distance computed from `counts`.
+
+    By the triangle inequality |L1(p̂, q) - L1(p, q)| <= Σ_s |p̂_s - p_s|, and each
+    term is bounded by its normal-approximation half-width z·sqrt(p̂(1-p̂)/n).
+    """
+    n = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.where(n > 0, counts / n, 0.0)
+        hw = z * np.sqrt(p * (1 - p) / np.where(n > 0, n, 1))
+    # rows never reached carry no estimate
+    return np.where(n[..., 0] > 0, hw.sum(axis=-1), np.nan)
+
+def _max_halfwidth(totals: dict[str, np.ndarray], z: float) -> float:
+    hws = np.concatenate([l1_halfwidth(c, z).ravel() for c in totals.values()])
+    return float(np.nanmax(hws)) if np.isfinite(hws).any() else float("inf")
+
+# ---------- Runner ----------
+_WORKER: dict = {}
+
+def _init_worker(chunk_fn: ChunkFn, model) -> None:
+    # the model is sent once per worker, not once per chunk
+    _WORKER["fn"], _WORKER["model"] = chunk_fn, model
+
+def _run_chunk(n: int, seed_seq: np.random.SeedSequence) -> dict[str, np.ndarray]:
+    return _WORKER["fn"](_WORKER["model"], n, seed_seq)
+
+@dataclass
+class MonteCarloResult:
+    counts: dict[str, np.ndarray]
+    n_samples: int
+    n_chunks: int
+    converged: bool
+    history: pd.DataFrame = field(repr=False)
+
+    def halfwidths(self, z: float = Z_95) -> dict[str, np.ndarray]:
+        return {name: l1_halfwidth(c, z) for name, c in self.counts.items()}
+
+def run_monte_carlo(
+    chunk_fn: ChunkFn,
+    model,
+    seed: int = 42,
+    chunk_size: int = 200_000,
+    max_samples: int = 50_000_000,
+    tol: float = 0.01,
+    min_chunks: int = 2,
+    workers: int = 1,
+    z: float = Z_95,
+    on_chunk: Callable[[int, dict[str, np.ndarray], float], None] | None = None,
+) -> MonteCarloResult:
+    """
+    Run `chunk_fn` over chunks until every L1 confidence half-width is below `tol`
+    (or `max_samples`, rounded up to whole chunks, is reached).
+
+    Chunk i is always seeded with SeedSequence(seed, spawn_key=(i,)), the i-th
+    child of SeedSequence(seed), and results are merged strictly in chunk order
+    with the stopping rule checked after each one. Counts, the stopping point
+    and therefore every reported number are bit-identical for any `workers`.
+    `on_chunk(i, counts, max_halfwidth)` receives the running totals.
+    """
+    max_chunks = max(-(-max_samples // chunk_size), 1)
+    totals: dict[str, np.ndarray] = {}
+    history = []
+    n_samples, converged, i = 0, False, 0
+
+    def merge(res: dict[str, np.ndarray]) -> bool:
+        nonlocal n_samples
+        for name, c in res.items():
+            totals[name] = totals[name] + c if name in totals else c.astype(np.int64)
+        n_samples += chunk_size
+        hw = _max_halfwidth(totals, z)
+        history.append({"chunk": len(history), "n_samples": n_samples, "max_l1_halfwidth": hw})
+        if on_chunk is not None:
+            on_chunk(len(history) - 1, totals, hw)
+        return len(history) >= min_chunks and hw < tol
+
+    if workers <= 1:
+        _init_worker(chunk_fn, model)
+        for i in range(max_chunks):
+            if merge(_run_chunk(chunk_size, np.random.SeedSequence(seed, spawn_key=(i,)))):
+                converged = True
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(chunk_fn, model)) as pool:
+            pending = {}
+            next_submit = 0
+            for i in range(max_chunks):
+                # keep a bounded window of chunks in flight, consume them in order
+                while next_submit < max_chunks and next_submit < i + 2 * workers:
+                    pending[next_submit] = pool.submit(_run_chunk, chunk_size, np.random.SeedSequence(seed, spawn_key=(next_submit,)))
+                    next_submit += 1
+                if merge(pending.pop(i).result()):
+                    converged = True
+                    break
+            for fut in pending.values():
+                fut.cancel()
+
+    return MonteCarloResult(
+        counts=totals,
+        n_samples=n_samples,
+        n_chunks=len(history),
+        converged=converged,
+        history=pd.DataFrame(history),
+    )
+
+# ---------- Diagnostics with confidence intervals ----------
+def markov_diagnostics(
+    result: MonteCarloResult,
+    kernel: MarkovKernel,
+    counts: pd.DataFrame,
+    k_start: int = 1,
+    z: float = Z_95,
+) -> pd.DataFrame:
+    """
+    Notebook 18's validation_diagnostics (mean / max abs diff per k) from runner
+    counts, plus the L1 distance to the empirical marginals with its confidence interval.
+    """
+    sim = result.counts["S"].astype(float)
+    n_k = sim.sum(axis=1)
+    p_sim = np.divide(sim, n_k[:, None], out=np.zeros_like(sim), where=n_k[:, None] > 0)
+    hw = l1_halfwidth(result.counts["S"], z)
+
+    emp = counts.groupby(["purchase_k", "S_k_key"])["n"].sum().reset_index()
+    p_emp = np.zeros_like(p_sim)
+    i = emp["purchase_k"].to_numpy() - k_start
+    in_range = (i >= 0) & (i < len(p_sim))
+    np.add.at(p_emp, (i[in_range], kernel.encode(emp["S_k_key"].astype(str).to_numpy()[in_range])), emp["n"].to_numpy()[in_range])
+    emp_n = p_emp.sum(axis=1, keepdims=True)
+    p_emp = np.divide(p_emp, emp_n, out=np.zeros_like(p_emp), where=emp_n > 0)
+
+    diff = np.abs(p_sim - p_emp)
+    support = (p_sim > 0) | (p_emp > 0)
+    l1 = diff.sum(axis=1)
+    return pd.DataFrame({
+        "purchase_k": np.arange(k_start, k_start + len(p_sim)),
+        "mean_abs_diff": np.where(support.any(axis=1), (diff * support).sum(axis=1) / np.maximum(support.sum(axis=1), 1), 0.0),
+        "max_abs_diff": diff.max(axis=1),
+        "l1": l1,
+        "l1_ci_low": np.maximum(l1 - hw, 0.0),
+        "l1_ci_high": l1 + hw,
+        "n_sim": n_k.astype(np.int64),
+    })
+
+def structural_marginals_ci(
+    result: MonteCarloResult,
+    sampler: StructuralSampler,
+    real_df: pd.DataFrame,
+    prefix: str,
+    z: float = Z_95,
+) -> pd.DataFrame:
+    """notebook 16's marginals_table L1 per k from runner counts, with confidence intervals."""
+    labels = sampler.ecosystems if prefix == "E" else sampler.product_groups
+    sim = result.counts[prefix].astype(float)
+    hw = l1_halfwidth(result.counts[prefix], z)
+    rows = []
+    for k in range(1, sampler.K + 1):
+        s = pd.Series(sim[k - 1] / sim[k - 1].sum(), index=labels)
+        # missing labels are not a category (as in notebook 16 and validation.py)
+        r = real_df[f"{prefix}{k}"].dropna().astype(str).value_counts(normalize=True)
+        idx = s.index.union(r.index)
+        l1 = float((s.reindex(idx, fill_value=0.0) - r.reindex(idx, fill_value=0.0)).abs().sum())
+        rows.append({"k": k, "L1": l1, "L1_ci_low": max(l1 - hw[k - 1], 0.0), "L1_ci_high": l1 + hw[k - 1]})
+    return pd.DataFrame(rows)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+import numpy as np
+import pandas as pd
+
+INTERIM = Path("data/interim")
+
+K_DEFAULT = 5
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# ---------- Alias tables ----------
+def build_alias(probs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vose alias table for one probability row: (accept probability, alias) per column.
+
+    A row without probability mass has nothing to sample (normalizing it would
+    give NaN, which the sampler reads as uniform), so it raises ValueError.
+    """
+    p = np.nan_to_num(np.asarray(probs, dtype=float))
+    total = p.sum()
+    if not total > 0:
+        raise ValueError(f"alias row has no probability mass (sum = {total})")
+    n = len(p)
+    scaled = p / total * n
+    accept = np.ones(n)
+    alias = np.arange(n)
+
+    small = [i for i in range(n) if scaled[i] < 1.0]
+    large = [i for i in range(n) if scaled[i] >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        accept[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    # leftovers are 1 up to rounding
+    return accept, alias
+
+def alias_table(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    empty = np.flatnonzero(~(np.nan_to_num(rows).sum(axis=1) > 0))
+    if len(empty):
+        raise ValueError(f"alias rows without probability mass: {empty.tolist()}")
+    accept = np.empty(rows.shape)
+    alias = np.empty(rows.shape, dtype=np.int64)
+    for r in range(rows.shape[0]):
+        accept[r], alias[r] = build_alias(rows[r])
+    return accept, alias
+
+def sample_alias(accept: np.ndarray, alias: np.ndarray, row: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """One draw per entry of `row` from the alias-table rows: O(1) each, fully vectorized."""
+    n_cols = accept.shape[1]
+    u = rng.random(len(row)) * n_cols
+    col = np.minimum(u.astype(np.int64), n_cols - 1)
+    keep = (u - col) < accept[row, col]
+    return np.where(keep, col, alias[row, col])
+
+# ---------- Compiled sampler ----------
+@dataclass(frozen=True)
+class StructuralSampler:
+    """
+    Notebook 15/16 structural model compiled to integer-indexed alias tables.
+
+    - E_1 ~ entry_ecosystem_dist
+    - G_k ~ P(G | E_k, k), falling back to the step-k marginal for unseen E_k
+    - E_{k+1} ~ T_e[k] row E_k, falling back to the column sums for unseen E_k
+    """
+    ecosystems: np.ndarray
+    product_groups: np.ndarray
+    K: int
+    entry_accept: np.ndarray   # (1, n_e)
+    entry_alias: np.ndarray
+    pg_accept: np.ndarray      # (K * n_e, n_g), row = (k - 1) * n_e + e
+    pg_alias: np.ndarray
+    eco_accept: np.ndarray     # ((K - 1) * n_e, n_e), row = (k - 1) * n_e + e
+    eco_alias: np.ndarray
+
+    def sample_codes(self, n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+        """(E, G) code matrices of shape (n, K)."""
+        n_e = len(self.ecosystems)
+        E = np.empty((n, self.K), dtype=np.int64)
+        G = np.empty((n, self.K), dtype=np.int64)
+
+        e = sample_alias(self.entry_accept, self.entry_alias, np.zeros(n, dtype=np.int64), rng)
+        for k in range(1, self.K + 1):
+            E[:, k - 1] = e
+            G[:, k - 1] = sample_alias(self.pg_accept, self.pg_alias, (k - 1) * n_e + e, rng)
+            if k < self.K:
+                e = sample_alias(self.eco_accept, self.eco_alias, (k - 1) * n_e + e, rng)
+        return E, G
+
+    def to_frame(self, E: np.ndarray, G: np.ndarray, id_offset: int = 0) -> pd.DataFrame:
+        """Wide cohort in the notebook 16 layout: anon_sim, E1, G1, ..., EK, GK."""
+        cols = {"anon_sim": np.arange(len(E), dtype=np.int64) + id_offset}
+        for k in range(1, self.K + 1):
+            cols[f"E{k}"] = pd.Categorical.from_codes(E[:, k - 1], categories=self.ecosystems)
+            cols[f"G{k}"] = pd.Categorical.from_codes(G[:, k - 1], categories=self.product_groups)
+        return pd.DataFrame(cols)
+
+def compile_structural(
+    entry_ecosystem_dist: pd.Series,
+    P_G_EK: pd.DataFrame,
+    T_e: dict[int, pd.DataFrame],
+    K: int = K_DEFAULT,
+) -> StructuralSampler:
+    ecosystems = np.unique(np.concatenate([
+        entry_ecosystem_dist.index.astype(str).to_numpy(),
+        P_G_EK["ecosystem"].astype(str).to_numpy(),
+        *[T.index.astype(str).to_numpy() for T in T_e.values()],
+        *[T.columns.astype(str).to_numpy() for T in T_e.values()],
+    ])).astype(object)
+    product_groups = np.unique(P_G_EK["product_group"].astype(str).to_numpy()).astype(object)
+    n_e, n_g = len(ecosystems), len(product_groups)
+
+    entry = entry_ecosystem_dist.fillna(0.0)
+    entry_row = np.zeros((1, n_e))
+    entry_row[0, np.searchsorted(ecosystems, entry.index.astype(str).to_numpy())] = entry.to_numpy(dtype=float)
+
+    pg_rows = np.zeros((K * n_e, n_g))
+    for k in range(1, K + 1):
+        Pk = P_G_EK[P_G_EK["purchase_k"] == k]
+        if Pk.empty:
+            raise KeyError(f"No P(G|E,k) rows for k={k}")
+        dense = (
+            Pk.assign(ecosystem=Pk["ecosystem"].astype(str), product_group=Pk["product_group"].astype(str))
+            .pivot_table(index="ecosystem", columns="product_group", values="p", aggfunc="sum")
+            .reindex(index=ecosystems, columns=product_groups)
+            .fillna(0.0)
+            .to_numpy(copy=True)
+        )
+        marginal = dense.sum(axis=0)
+        dense[dense.sum(axis=1) == 0] = marginal
+        pg_rows[(k - 1) * n_e:k * n_e] = dense
+
+    eco_rows = np.zeros((max(K - 1, 0) * n_e, n_e))
+    for k in range(1, K):
+        if k not in T_e:
+            raise KeyError(f"No transition matrix for k={k}")
+        T = T_e[k].copy()
+        T.index, T.columns = T.index.astype(str), T.columns.astype(str)
+        dense = T.astype(float).reindex(index=ecosystems, columns=ecosystems).fillna(0.0).to_numpy(copy=True)
+        fallback = T.astype(float).fillna(0.0).sum(axis=0).reindex(ecosystems).fillna(0.0).to_numpy()
+        dense[dense.sum(axis=1) == 0] = fallback
+        eco_rows[(k - 1) * n_e:k * n_e] = dense
+
+    entry_accept, entry_alias = alias_table(entry_row)
+    pg_accept, pg_alias = alias_table(pg_rows)
+    eco_accept, eco_alias = alias_table(eco_rows)
+    return StructuralSampler(
+        ecosystems=ecosystems,
+        product_groups=product_groups,
+        K=K,
+        entry_accept=entry_accept,
+        entry_alias=entry_alias,
+        pg_accept=pg_accept,
+        pg_alias=pg_alias,
+        eco_accept=eco_accept,
+        eco_alias=eco_alias,
+    )
+
+def load_structural_inputs(interim: Path = INTERIM, K: int = K_DEFAULT):
+    """(entry_ecosystem_dist, P_G_EK, T_e) as written by notebooks 14/15."""
+    entry = pd.read_parquet(interim / "ecosystem_entry_distribution.parquet")["p"]
+    P_G_EK = pd.read_parquet(interim / "P_product_group_given_ecosystem_k.parquet")
+    T_e = {
+        k: pd.read_parquet(interim / "ecosystem_transitions" / f"ecosystem_transition_{k}_to_{k+1}.parquet")
+        for k in range(1, K)
+    }
+    return entry, P_G_EK, T_e
+
+# ---------- Cohorts ----------
+def simulate_cohort_chunks(
+    sampler: StructuralSampler,
+    n_customers: int,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+    """Yield (id_offset, E, G) per chunk; chunk i uses child i of SeedSequence(seed)."""
+    n_chunks = -(-n_customers // chunk_size)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        n = min(chunk_size, n_customers - i * chunk_size)
+        E, G = sampler.sample_codes(n, np.random.default_rng(child))
+        yield i * chunk_size, E, G
+
+def simulate_cohort(
+    sampler: StructuralSampler,
+    n_customers: int,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> pd.DataFrame:
+    """Vectorized replacement for `pd.DataFrame(simulate_one_customer(i) for i in range(n))`."""
+    return pd.concat(
+        [sampler.to_frame(E, G, offset) for offset, E, G in simulate_cohort_chunks(sampler, n_customers, seed, chunk_size)],
+        ignore_index=True,
+    )
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from simulation.structural import DEFAULT_CHUNK_SIZE, K_DEFAULT, StructuralSampler
+
+# ---------- Count tensors ----------
+@dataclass
+class PathCounts:
+    """
+    Fixed-size integer counts of (E_k, G_k) paths, updated chunk by chunk.
+
+    - E[k - 1, e]            paths with E_k = e
+    - G[k - 1, g]            paths with G_k = g
+    - EE[k - 1, e, e2]       paths with E_k = e and E_{k+1} = e2
+    - EG[k - 1, e, g]        paths with E_k = e and G_k = g
+
+    Memory depends on the vocabularies and K only, never on the number of paths.
+    Missing labels (NaN) are skipped cell by cell, like `value_counts` / `groupby` do.
+    """
+    ecosystems: np.ndarray
+    product_groups: np.ndarray
+    E: np.ndarray
+    G: np.ndarray
+    EE: np.ndarray
+    EG: np.ndarray
+
+    @classmethod
+    def empty(cls, ecosystems, product_groups, K: int = K_DEFAULT) -> "PathCounts":
+        ecosystems = np.asarray(ecosystems, dtype=object)
+        product_groups = np.asarray(product_groups, dtype=object)
+        n_e, n_g = len(ecosystems), len(product_groups)
+        return cls(
+            ecosystems=ecosystems,
+            product_groups=product_groups,
+            E=np.zeros((K, n_e), dtype=np.int64),
+            G=np.zeros((K, n_g), dtype=np.int64),
+            EE=np.zeros((K - 1, n_e, n_e), dtype=np.int64),
+            EG=np.zeros((K, n_e, n_g), dtype=np.int64),
+        )
+
+    @property
+    def K(self) -> int:
+        return self.E.shape[0]
+
+    def add_codes(self, E: np.ndarray, G: np.ndarray) -> "PathCounts":
+        """Add (n, K) code matrices in this vocabulary; -1 marks a missing label."""
+        n_e, n_g, K = len(self.ecosystems), len(self.product_groups), self.K
+        steps = np.arange(K)
+
+        def add(target: np.ndarray, flat: np.ndarray, valid: np.ndarray) -> None:
+            target += np.bincount(flat[valid], minlength=target.size).reshape(target.shape)
+
+        add(self.E, (steps * n_e + E).ravel(), (E >= 0).ravel())
+        add(self.G, (steps * n_g + G).ravel(), (G >= 0).ravel())
+        add(self.EG, ((steps * n_e + E) * n_g + G).ravel(), ((E >= 0) & (G >= 0)).ravel())
+        if K > 1:
+            a, b = E[:, :-1], E[:, 1:]
+            add(self.EE, ((steps[:-1] * n_e + a) * n_e + b).ravel(), ((a >= 0) & (b >= 0)).ravel())
+        return self
+
+    def add_frame(self, df: pd.DataFrame) -> "PathCounts":
+        """Add a wide path frame (columns E1, G1, …, EK, GK) such as `real_wide` or `sim_cohort`."""
+        E = np.column_stack([_encode(df[f"E{k}"], self.ecosystems) for k in range(1, self.K + 1)])
+        G = np.column_stack([_encode(df[f"G{k}"], self.product_groups) for k in range(1, self.K + 1)])
+        return self.add_codes(E, G)
+
+    def __iadd__(self, other: "PathCounts") -> "PathCounts":
+        # other's labels must be a subset of ours (see `align`)
+        other = other.reindex(self.ecosystems, self.product_groups)
+        for name in ("E", "G", "EE", "EG"):
+            getattr(self, name)[...] += getattr(other, name)
+        return self
+
+    def reindex(self, ecosystems, product_groups) -> "PathCounts":
+        """Same counts over another (super-)vocabulary; labels not present get zero counts."""
+        ecosystems = np.asarray(ecosystems, dtype=object)
+        product_groups = np.asarray(product_groups, dtype=object)
+        if np.array_equal(ecosystems, self.ecosystems) and np.array_equal(product_groups, self.product_groups):
+            return self
+        e_pos = _positions(self.ecosystems, ecosystems)
+        g_pos = _positions(self.product_groups, product_groups)
+        out = PathCounts.empty(ecosystems, product_groups, self.K)
+        out.E[:, e_pos] = self.E
+        out.G[:, g_pos] = self.G
+        out.EE[:, e_pos[:, None], e_pos] = self.EE
+        out.EG[:, e_pos[:, None], g_pos] = self.EG
+        return out
+
+    def tables(self) -> dict[str, np.ndarray]:
+        # every last axis is one distribution: usable with runner.l1_halfwidth
+        return {"E": self.E, "G": self.G, "EE": self.EE, "EG": self.EG}
+
+def _encode(labels: pd.Series, vocab: np.ndarray) -> np.ndarray:
+    # NaN and labels outside `vocab` become -1
+    return pd.Categorical(labels.map(str, na_action="ignore"), categories=vocab).codes.astype(np.int64)
+
+def _positions(labels: np.ndarray, vocab: np.ndarray) -> np.ndarray:
+    pos = pd.Index(vocab).get_indexer(labels)
+    if (pos < 0).any():
+        raise KeyError(f"labels missing from target vocabulary: {list(labels[pos < 0])}")
+    return pos
+
+def align(*counts: PathCounts) -> list[PathCounts]:
+    """Reindex counts to the union of their vocabularies."""
+    ecosystems = np.array(sorted(set().union(*(c.ecosystems for c in counts))), dtype=object)
+    product_groups = np.array(sorted(set().union(*(c.product_groups for c in counts))), dtype=object)
+    return [c.reindex(ecosystems, product_groups) for c in counts]
+
+# ---------- Streaming builders ----------
+def count_frame(df: pd.DataFrame, K: int = K_DEFAULT) -> PathCounts:
+    """Counts of a wide path frame over its own (sorted) label vocabulary."""
+    def vocab(prefix: str) -> np.ndarray:
+        values = pd.unique(pd.concat([df[f"{prefix}{k}"] for k in range(1, K + 1)]).dropna())
+        return np.array(sorted(map(str, values)), dtype=object)
+
+    return PathCounts.empty(vocab("E"), vocab("G"), K).add_frame(df)
+
+def count_parquet(path: Path, ecosystems, product_groups, K: int = K_DEFAULT, batch_size: int = DEFAULT_CHUNK_SIZE) -> PathCounts:
+    """Counts of a stored path parquet (e.g. sim_paths_v0_k5), read batch by batch."""
+    counts = PathCounts.empty(ecosystems, product_groups, K)
+    columns = [f"{p}{k}" for k in range(1, K + 1) for p in "EG"]
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        counts.add_frame(batch.to_pandas())
+    return counts
+
+def count_structural(
+    sampler: StructuralSampler,
+    n_paths: int,
+    seed: int = 42,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> PathCounts:
+    """
+    Simulate `n_paths` and keep only their counts: memory is one chunk plus the tensors.
+
+    Chunk i uses SeedSequence(seed, spawn_key=(i,)), the same seeding as
+    `runner.run_monte_carlo`, so both see identical paths for the same seed.
+    """
+    counts = PathCounts.empty(sampler.ecosystems, sampler.product_groups, sampler.K)
+    for i in range(-(-n_paths // chunk_size)):
+        n = min(chunk_size, n_paths - i * chunk_size)
+        counts.add_codes(*sampler.sample_codes(n, np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,)))))
+    return counts
+
+def path_chunk_counts(model: StructuralSampler, n: int, seed_seq: np.random.SeedSequence) -> dict[str, np.ndarray]:
+    """`runner.run_monte_carlo` chunk function; rebuild with PathCounts(…, **result.counts)."""
+    counts = PathCounts.empty(model.ecosystems, model.product_groups, model.K)
+    return counts.add_codes(*model.sample_codes(n, np.random.default_rng(seed_seq))).tables()
+
+# ---------- L1 diagnostics from counts ----------
+def _normalize(counts: np.ndarray) -> np.ndarray:
+    n = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, n, out=np.zeros(counts.shape), where=n > 0)
+
+def l1_rows(p_counts: np.ndarray, q_counts: np.ndarray) -> np.ndarray:
+    """L1 distance between the normalized last-axis distributions of two count tensors."""
+    return np.abs(_normalize(p_counts) - _normalize(q_counts)).sum(axis=-1)
+
+def _top(counts: np.ndarray, labels: np.ndarray, top_n: int) -> str:
+    order = np.argsort(-counts, kind="stable")[:top_n]
+    return ", ".join(str(labels[i]) for i in order if counts[i] > 0)
+
+def marginals_table(real: PathCounts, sim: PathCounts, prefix: str, top_n: int = 8) -> pd.DataFrame:
+    """Notebook 16's marginals_table (k, L1, real_top, sim_top) from counts."""
+    real, sim = align(real, sim)
+    labels = real.ecosystems if prefix == "E" else real.product_groups
+    r, s = getattr(real, prefix), getattr(sim, prefix)
+    l1 = l1_rows(r, s)
+    return pd.DataFrame([
+        {"k": k + 1, "L1": float(l1[k]), "real_top": _top(r[k], labels, top_n), "sim_top": _top(s[k], labels, top_n)}
+        for k in range(real.K)
+    ])
+
+def transition_l1(real: PathCounts, sim: PathCounts, k_from: int = 1) -> pd.DataFrame:
+    """L1 of P(E_{k+1} | E_k = e) per from-ecosystem, with the row sizes behind it."""
+    real, sim = align(real, sim)
+    r, s = real.EE[k_from - 1], sim.EE[k_from - 1]
+    return pd.DataFrame(
+        {"L1": l1_rows(r, s), "n_real": r.sum(axis=1), "n_sim": s.sum(axis=1)},
+        index=pd.Index(real.ecosystems, name=f"E{k_from}"),
+    ).sort_values("n_real", ascending=False)
+
+def conditional_l1(real: PathCounts, sim: PathCounts, k: int = 1) -> pd.DataFrame:
+    """L1 of P(G_k | E_k = e) per ecosystem (notebook 16's cond_pg_E1 for k = 1)."""
+    real, sim = align(real, sim)
+    r, s = real.EG[k - 1], sim.EG[k - 1]
+    return pd.DataFrame(
+        {"L1": l1_rows(r, s), "n_real": r.sum(axis=1), "n_sim": s.sum(axis=1)},
+        index=pd.Index(real.ecosystems, name=f"E{k}"),
+    ).sort_values("n_real", ascending=False)
+
+def transition_table(real: PathCounts, sim: PathCounts, k_from: int = 1, top_from: int = 5, top_n: int = 8) -> dict[str, pd.DataFrame]:
+    """Notebook 16's transition_table(real, sim, k_from, k_from + 1) from counts."""
+    real, sim = align(real, sim)
+    r_all, s_all = real.EE[k_from - 1], sim.EE[k_from - 1]
+    p_r, p_s = _normalize(r_all), _normalize(s_all)
+    out = {}
+    for e in np.argsort(-real.E[k_from - 1], kind="stable")[:top_from]:
+        if real.E[k_from - 1, e] == 0:
+            break
+        seen = (r_all[e] > 0) | (s_all[e] > 0)
+        comp = pd.DataFrame({"real": p_r[e, seen], "sim": p_s[e, seen]}, index=real.ecosystems[seen])
+        comp["abs_diff"] = (comp["real"] - comp["sim"]).abs()
+        out[real.ecosystems[e]] = comp.sort_values("abs_diff", ascending=False).head(top_n)
+    return out
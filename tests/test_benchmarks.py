@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.benchmarks import KLLSketch
+
+QS = np.linspace(0, 1, 101)
+
+@pytest.mark.parametrize("n", [1, 2, 17, 256])
+def test_exact_while_nothing_is_compacted(n):
+    x = np.random.default_rng(n).lognormal(4, 1, n).round()
+    half = n // 2
+    # n <= k: update and merge keep every item at weight 1
+    sketch = KLLSketch(k=256).update(x[:half]).merge(KLLSketch(k=256).update(np.append(x[half:], np.nan)))
+
+    assert sketch.n == n
+    np.testing.assert_allclose(sketch.quantile(QS), pd.Series(x).quantile(QS).to_numpy(), rtol=0, atol=1e-9)
+    assert sketch.quantile(0.5) == np.quantile(x, 0.5)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rank_error_within_one_percent(seed):
+    rng = np.random.default_rng(seed)
+    x = rng.lognormal(4, 1, 100_000).round()  # many ties, like retention days
+    parts = np.array_split(x, 37)
+    sketch = KLLSketch(k=256, seed=seed)
+    for p in parts[:20]:
+        sketch.update(p)
+    other = KLLSketch(k=256, seed=seed + 1)
+    for p in parts[20:]:
+        other.update(p)
+    sketch.merge(other)
+
+    qs = np.linspace(0.01, 0.99, 99)
+    est = sketch.quantile(qs)
+    s = np.sort(x)
+    # distance from q to the range of ranks the estimate occupies in the data
+    lo = np.searchsorted(s, est, side="left") / len(s)
+    hi = np.searchsorted(s, est, side="right") / len(s)
+    rank_error = np.maximum(np.maximum(lo - qs, qs - hi), 0)
+
+    assert sketch.n == len(x)
+    assert sum(len(items) for items in sketch.levels) < 4 * 256
+    assert rank_error.max() < 0.01
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.decode import COL_PRODUCTS_CLEAN, COL_PRODUCTS_RAW, DecodeStats, decode_orders
+
+ITEMS = [
+    "butelka filtrująca dafi solid 0,7 l + filtr węglowy",
+    "zestaw 3 filtry do butelki filtrującej dafi soft i solid",
+    "dzbanek filtrujący dafi astra 3 l",
+    "wkład filtrujący dafi classic 2 szt",
+    "kubek termiczny",
+]
+LOOKUP = {ITEMS[0]: {"sku": "B-07"}, ITEMS[1]: {"sku": 1203}, ITEMS[2]: {"sku": None}}
+
+def _orders(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    products = [
+        "".join(f"{ITEMS[i]} (x{q})" for i, q in zip(rng.integers(0, len(ITEMS), m), rng.integers(1, 4, m)))
+        for m in rng.integers(0, 4, n)   # m == 0: an order without markers
+    ]
+    day = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 120, n), unit="D")
+    return pd.DataFrame({
+        "kolejności": np.arange(n),
+        "Kwota": rng.integers(10, 500, n).astype(float),
+        COL_PRODUCTS_RAW: products,
+        "Anon": [f"A{i:04d}" for i in rng.integers(0, 500, n)],
+        "Data zakupu": day.strftime("%d.%m.%Y"),
+        "Źródło": rng.choice(["shop", "allegro"], n),
+        COL_PRODUCTS_CLEAN: products,
+        "purchase_month": day.strftime("%Y-%m"),
+    })
+
+def test_parallel_decode_matches_serial(tmp_path):
+    # month-partitioned like orders_landing
+    pq.write_to_dataset(pa.Table.from_pandas(_orders(), preserve_index=False), tmp_path / "landing", partition_cols=["purchase_month"])
+    (tmp_path / "lookup.json").write_text(json.dumps(LOOKUP), encoding="utf-8")
+
+    runs = {
+        workers: decode_orders(tmp_path / "landing", tmp_path / "lookup.json", tmp_path / f"lines_{workers}.parquet", batch_size=97, workers=workers)
+        for workers in (1, 3)
+    }
+
+    serial = pd.read_parquet(tmp_path / "lines_1.parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "lines_3.parquet"), serial)
+    assert isinstance(runs[3], DecodeStats) and runs[3] == runs[1]
+    assert runs[1].lines == len(serial) and 0 < runs[1].matched_items < runs[1].total_items
+    assert runs[1].orders_no_markers > 0 and len(runs[1].unmatched_examples) == 20
@@ -0,0 +1,33 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from pipeline.landing import COL_DATE, PARTITION_COL, iter_landed_batches, parse_purchase_dates, purchase_month
+
+@pytest.mark.parametrize("dates, months", [
+    (["03.04.2024", "25.04.2024", "2024-04-25"], ["2024-04", "2024-04", "2024-04"]),
+    (["2024-04-25", "25.04.2024", "03.04.2024"], ["2024-04", "2024-04", "2024-04"]),
+    (["13/01/2023", "31-12-2022 10:15", "2023-02-01 08:00:00"], ["2023-01", "2022-12", "2023-02"]),
+    (["", None, "not a date", "32.01.2024"], ["unknown"] * 4),
+])
+def test_purchase_month_is_day_first_for_every_row(dates, months):
+    assert purchase_month(pa.array(dates, type=pa.string())).to_pylist() == months
+
+def test_day_first_dates_parse_to_the_day():
+    parsed = parse_purchase_dates(pd.Series(["03.04.2024", " 12.11.2023 ", "2024-04-03"]))
+    assert parsed.tolist() == [pd.Timestamp("2024-04-03"), pd.Timestamp("2023-11-12"), pd.Timestamp("2024-04-03")]
+
+def test_landed_batches_keep_raw_date(tmp_path):
+    raw = pd.DataFrame({
+        "Anon": ["A", "B", "C"],
+        "Kwota": ["1 234,50 zł", "12,00", "x"],
+        "Produkty": ["Butelka  Dafi (x1)", None, "Filtr"],
+        COL_DATE: ["28.02.2024", "2024-03-01", "15.03.2024"],
+    })
+    raw.to_csv(tmp_path / "orders.csv", index=False)
+
+    landed = pa.Table.from_batches(list(iter_landed_batches(tmp_path / "orders.csv", drop=[]))).to_pandas()
+
+    assert landed[PARTITION_COL].tolist() == ["2024-02", "2024-03", "2024-03"]
+    assert landed[COL_DATE].tolist() == raw[COL_DATE].tolist()
+    assert landed["Kwota"].tolist()[:2] == [1234.5, 12.0] and pd.isna(landed["Kwota"].iloc[2])
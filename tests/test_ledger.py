@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.ledger import (
+    BOTTLE_FILTER_GROUP, BOTTLE_GROUPS_WITH_INCLUDED_FILTER, FILTERS_COL, GROUP_COL, NAME_COL,
+    build_ledger, day_events, fold_days, live_state, purchase_rows, read_rows, refresh_live_state, row_keys, scan_row_keys,
+)
+import pipeline.ledger as ledger_module
+
+GROUPS = [*BOTTLE_GROUPS_WITH_INCLUDED_FILTER, BOTTLE_FILTER_GROUP, "10_dzbanki"]
+BENCH = pd.DataFrame({"product_group": GROUPS, "median": [300.0, 300.0, 45.0, 200.0]})
+
+def _cust_day(n: int = 4000, n_customers: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    group = rng.choice(GROUPS, size=n, p=[0.2, 0.2, 0.4, 0.2])
+    return pd.DataFrame({
+        "anon": [f"C{i:04d}" for i in rng.integers(0, n_customers, n)],
+        "date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"),
+        GROUP_COL: group,
+        NAME_COL: [f"{g[:2]}-{v}" for g, v in zip(group, rng.integers(0, 3, n))],
+        "matrix_qty": rng.integers(1, 4, n).astype(float),
+        FILTERS_COL: np.where(rng.random(n) < 0.3, rng.integers(1, 7, n), 0).astype(float),
+        "is_purchase": rng.random(n) > 0.05,
+    }).drop_duplicates(["anon", "date", GROUP_COL], ignore_index=True)  # one row per customer, day and group
+
+def _ns(df: pd.DataFrame) -> pd.DataFrame:
+    # the event log stores ns timestamps; a fresh fold keeps the input's unit
+    return df.astype({c: "datetime64[ns]" for c in df.columns if c.endswith("date")})
+
+def _full_fold(cust_day: pd.DataFrame) -> pd.DataFrame:
+    return _ns(fold_days(day_events(purchase_rows(cust_day))).sort_index())
+
+def test_rebuild_into_used_dir_ignores_old_event_log(tmp_path):
+    cust_day = _cust_day()
+    cutoff = pd.Timestamp("2024-06-01")
+    early, late = cust_day[cust_day["date"] < cutoff], cust_day[cust_day["date"] >= cutoff]
+
+    # an older ledger with more batches leaves batch files the rebuild does not overwrite
+    build_ledger(_cust_day(seed=1), tmp_path / "ledger").apply(_cust_day(seed=2)).apply(_cust_day(seed=3))
+    ledger = build_ledger(late, tmp_path / "ledger")
+    ledger.apply(early)  # late arrivals for nearly every customer: re-folded from the event log
+
+    assert ledger.stats["late_customers"] > 0
+    assert sorted(p.name for p in (tmp_path / "ledger" / "events").iterdir()) == ["batch-000000.parquet", "batch-000001.parquet"]
+    pd.testing.assert_frame_equal(_ns(ledger.customers.sort_index()), _full_fold(cust_day), check_freq=False)
+
+class _Refresh:
+    """Writes cust_day_group / benchmarks like the upstream stages, then runs the live_state stage."""
+
+    def __init__(self, root):
+        self.root = root
+        BENCH.to_parquet(root / "benchmarks.parquet", index=False)
+
+    def __call__(self, cust_day: pd.DataFrame) -> dict:
+        cust_day.to_parquet(self.root / "cust_day_group.parquet", index=False)
+        return refresh_live_state(
+            self.root / "cust_day_group.parquet", self.root / "benchmarks.parquet",
+            path=self.root / "ledger", out_path=self.root / "live.parquet",
+        )
+
+    def live(self) -> pd.DataFrame:
+        return _sorted(pd.read_parquet(self.root / "live.parquet"))
+
+def _sorted(live: pd.DataFrame) -> pd.DataFrame:
+    return _ns(live.sort_values(["anon", GROUP_COL], ignore_index=True))
+
+def _rebuilt(cust_day: pd.DataFrame, path) -> pd.DataFrame:
+    # through parquet like the stage output, so dtypes compare equal
+    live_state(build_ledger(cust_day, path / "ledger"), BENCH).to_parquet(path / "live.parquet", index=False)
+    return _sorted(pd.read_parquet(path / "live.parquet"))
+
+def test_streamed_keys_match_in_memory_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger_module, "SCAN_BATCH_ROWS", 97)
+    cust_day = _cust_day()
+    cust_day = pd.concat([cust_day, cust_day.iloc[:5]], ignore_index=True)  # repeated rows get their own keys
+    cust_day.assign(date=cust_day["date"].dt.strftime("%d.%m.%Y")).to_parquet(tmp_path / "cdg.parquet", index=False)
+    cust_day.to_parquet(tmp_path / "cdg_ts.parquet", index=False)
+
+    keys = scan_row_keys(tmp_path / "cdg_ts.parquet")
+    np.testing.assert_array_equal(keys, row_keys(cust_day))
+    assert len(np.unique(keys)) == len(cust_day)
+    np.testing.assert_array_equal(scan_row_keys(tmp_path / "cdg.parquet"), row_keys(pd.read_parquet(tmp_path / "cdg.parquet")))
+
+    mask = np.random.default_rng(0).random(len(cust_day)) < 0.05
+    pd.testing.assert_frame_equal(read_rows(tmp_path / "cdg_ts.parquet", mask), pd.read_parquet(tmp_path / "cdg_ts.parquet")[mask].reset_index(drop=True))
+    assert read_rows(tmp_path / "cdg_ts.parquet", np.zeros(len(cust_day), dtype=bool)).empty
+
+def test_incremental_refresh_matches_full_rebuild(tmp_path):
+    cust_day = _cust_day().sort_values("date", ignore_index=True)
+    refresh = _Refresh(tmp_path)
+
+    assert refresh(cust_day[cust_day["date"] < "2024-01-01"])["rebuilt"]
+    stats = refresh(cust_day[cust_day["date"] < "2024-06-01"])
+    assert not stats["rebuilt"] and stats["late_customers"] == 0
+    stats = refresh(cust_day)
+    assert not stats["rebuilt"] and stats["events"] < len(cust_day) / 2
+
+    pd.testing.assert_frame_equal(refresh.live(), _rebuilt(cust_day, tmp_path / "clean"))
+
+def test_late_arrivals_refold_to_full_rebuild(tmp_path):
+    cust_day = _cust_day()
+    held_back = np.random.default_rng(3).random(len(cust_day)) < 0.1
+    refresh = _Refresh(tmp_path)
+
+    refresh(cust_day[~held_back])
+    stats = refresh(cust_day)  # same file order, with older rows filled in
+    assert not stats["rebuilt"] and stats["late_customers"] > 0
+
+    pd.testing.assert_frame_equal(refresh.live(), _rebuilt(cust_day, tmp_path / "clean"))
+
+def test_changed_applied_row_triggers_rebuild(tmp_path):
+    cust_day = _cust_day()
+    refresh = _Refresh(tmp_path)
+    refresh(cust_day)
+
+    assert not refresh(cust_day)["rebuilt"]
+    fixed = cust_day.assign(matrix_qty=cust_day["matrix_qty"].where(cust_day[GROUP_COL] != BOTTLE_FILTER_GROUP, 1.0))
+    assert refresh(fixed)["rebuilt"]
+    pd.testing.assert_frame_equal(refresh.live(), _rebuilt(fixed, tmp_path / "clean"))
+
+def _rows(spec) -> pd.DataFrame:
+    return pd.DataFrame([
+        {"anon": "A", "date": pd.Timestamp(d), GROUP_COL: g, NAME_COL: "x", "matrix_qty": q, FILTERS_COL: 0.0, "is_purchase": True}
+        for d, g, q in spec
+    ])
+
+def test_filter_added_to_last_bottle_day_keeps_its_bottles(tmp_path):
+    bottle = BOTTLE_GROUPS_WITH_INCLUDED_FILTER[0]
+    first = _rows([("2024-01-01", BOTTLE_FILTER_GROUP, 1), ("2024-03-01", bottle, 2)])
+    second = _rows([("2024-03-01", BOTTLE_FILTER_GROUP, 3)])
+
+    ledger = build_ledger(first, tmp_path / "ledger").apply(second)
+
+    assert ledger.customers.loc["A", "bottles_bought_last"] == 2
+    pd.testing.assert_frame_equal(_ns(ledger.customers), _full_fold(pd.concat([first, second])), check_freq=False)
+
+@pytest.mark.parametrize("seed", range(12))
+def test_split_batches_fold_like_full_history(tmp_path, seed):
+    # few days per customer, so batches often meet on a customer's last event day
+    rng = np.random.default_rng(seed)
+    cust_day = _cust_day(n=1500, n_customers=20, seed=seed)
+    cust_day["date"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, len(cust_day)), unit="D")
+    cust_day = cust_day.drop_duplicates(["anon", "date", GROUP_COL], ignore_index=True)
+
+    by_date = cust_day.sort_values("date", kind="stable", ignore_index=True)
+    cuts = [0, *np.sort(rng.integers(0, len(by_date), 8)), len(by_date)]   # in date order, cuts fall inside a day
+    in_order = [by_date.iloc[a:b] for a, b in zip(cuts[:-1], cuts[1:])]
+    shuffled = cust_day.sample(frac=1, random_state=seed)  # late arrivals too
+    shuffled = [shuffled.iloc[i::4] for i in range(4)]
+
+    for name, batches in {"in_order": in_order, "shuffled": shuffled}.items():
+        ledger = build_ledger(batches[0], tmp_path / name)
+        for batch in batches[1:]:
+            ledger.apply(batch)
+        pd.testing.assert_frame_equal(_ns(ledger.customers.sort_index()), _full_fold(cust_day), check_freq=False, obj=name)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from UI.live_logic import build_due_index, materialize_status, resolve_asof_date
+
+GROUPS = ["a", "b", "c"]
+
+def _live(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    group = rng.choice(GROUPS + [None], size=n, p=[0.3, 0.3, 0.3, 0.1])
+    lpd = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 400, n), unit="D")
+    lpd = pd.Series(lpd).where(rng.random(n) > 0.02)
+    bottles = pd.Series(rng.integers(0, 4, n).astype(float)).where(rng.random(n) > 0.1)
+    return pd.DataFrame({
+        "anon": pd.Categorical([f"A{i % 700:04d}" for i in range(n)]),
+        "product_group": pd.Categorical(group, categories=GROUPS),
+        "last_purchase_date": lpd,
+        "bottles_owned_effective": bottles,
+    })
+
+BENCH = pd.DataFrame({"product_group": ["a", "b"], "median": [60.0, 120.0]})
+
+def _reference(live, bench, bench_mode, bench_quantile, manual_days, due_soon_days):
+    # the per-row all-groups computation the due-date index replaced
+    asof_date = resolve_asof_date(live, "dataset")
+    base = live.copy()
+    base["last_purchase_date"] = pd.to_datetime(base["last_purchase_date"])
+    if bench_mode == "manual":
+        dpu = pd.DataFrame({"product_group": base["product_group"].dropna().unique(), "days_per_unit": float(manual_days)})
+    else:
+        dpu = bench[["product_group", bench_quantile]].rename(columns={bench_quantile: "days_per_unit"})
+    df = base.merge(dpu, on="product_group", how="left")
+    df["days_per_unit"] = pd.to_numeric(df["days_per_unit"], errors="coerce").fillna(90.0)
+    units = df["bottles_owned_effective"].fillna(1).clip(lower=1)
+    df["coverage_days_est"] = (df["days_per_unit"] * units).round().astype(int)
+    df["due_date"] = df["last_purchase_date"] + pd.to_timedelta(df["coverage_days_est"], unit="D")
+    df["days_to_due"] = (df["due_date"] - asof_date).dt.days
+    df["status"] = "ok"
+    df.loc[df["days_to_due"] < 0, "status"] = "overdue"
+    df.loc[(df["days_to_due"] >= 0) & (df["days_to_due"] <= due_soon_days), "status"] = "due_soon"
+    return df, asof_date
+
+@pytest.mark.parametrize("bench_mode, bench_quantile, manual_days", [("quantile", "median", None), ("manual", None, 45)])
+def test_all_groups_match_per_row_reference(bench_mode, bench_quantile, manual_days):
+    live = _live()
+    ref, ref_asof = _reference(live, BENCH, bench_mode, bench_quantile, manual_days, 14)
+
+    index = build_due_index(live, BENCH, bench_mode, bench_quantile, manual_days)
+    asof = resolve_asof_date(index.frame, "dataset")
+    out = materialize_status(index, asof, 14)
+
+    assert asof == ref_asof
+    assert len(out) == len(live)
+    assert out["product_group"].isna().sum() == live["product_group"].isna().sum()
+    np.testing.assert_array_equal(out["status"].astype(str).to_numpy(), ref["status"].to_numpy())
+    pd.testing.assert_series_equal(out["days_to_due"], ref["days_to_due"], check_dtype=False, check_names=False)
+
+def test_rows_without_group_are_counted_but_not_selectable():
+    live = _live()
+    index = build_due_index(live, BENCH, "quantile", "median", None)
+    asof = resolve_asof_date(index.frame, "dataset")
+
+    counts = index.counts(asof, 14)
+    assert counts["rows"].sum() == len(live)
+    assert counts.loc[counts["product_group"].isna(), "rows"].item() == live["product_group"].isna().sum()
+    for group in GROUPS:
+        part = materialize_status(index, asof, 14, group)
+        assert (part["product_group"] == group).all()
+        assert len(part) == (live["product_group"] == group).sum()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from simulation.ltv import continuation_by_k, score_customers
+from simulation.markov_kernel import compile_kernel
+from UI.overview_logic import attach_ltv_scores
+
+K_MAX = 4
+ORDER_VALUES = np.array([0.0, 10.0, 20.0, 40.0, 80.0])   # index k
+
+# k=2: a -> a / b evenly, b -> b; k=3: a -> a, b -> b
+KERNEL = compile_kernel(pd.DataFrame({
+    "purchase_k": [2, 2, 2, 3, 3],
+    "S_k_key": ["a", "a", "b", "a", "b"],
+    "S_next_key": ["a", "b", "b", "a", "b"],
+    "p": [0.5, 0.5, 1.0, 1.0, 1.0],
+}))
+
+# one row per purchase k >= 2, like ecosystem_add_events
+EVENTS = pd.DataFrame(
+    [("X", 2, "a"), ("X", 3, "a"), ("X", 4, "a"),
+     ("Y", 2, "a"),
+     ("Z", 3, "a"), ("Z", 2, "b"),
+     ("W", 2, "b"), ("W", 3, "b"), ("W", 4, "b")],
+    columns=["anon", "purchase_k", "curr_ecos_str"],
+)
+
+def _state(name: str) -> int:
+    return int(np.flatnonzero(KERNEL.states == name)[0])
+
+def test_continuation_is_share_reaching_next_purchase():
+    c = continuation_by_k(EVENTS, KERNEL, K_MAX)
+    a, b = _state("a"), _state("b")
+
+    assert c.shape == (K_MAX + 1, KERNEL.n_states)
+    assert (c[2, a], c[2, b], c[3, a], c[3, b]) == (0.5, 1.0, 0.5, 1.0)   # X of X, Y; Z, W; X of X, Z; W
+    assert (c[4] == 0).all() and (c[1] == 0).all()   # nobody seen past k_max / before k = 2
+
+def test_score_customers_hand_computed():
+    states = pd.DataFrame({
+        "anon": ["Y", "Z", "B2", "late", "early", "unseen"],
+        "purchase_k": [2, 3, 2, 9, 1, 2],
+        "S_k_key": ["a", "a", "b", "a", "a", "zzz"],
+    })
+    scores = score_customers(KERNEL, states, ORDER_VALUES, continuation_by_k(EVENTS, KERNEL, K_MAX), K_MAX).set_index("anon")
+
+    # (3, a): stays 1/2 -> one more purchase (k=4) half the time
+    # (2, a): continues 1/2, then (3, a) or (3, b) evenly; (3, b) always reaches k=4
+    #   purchases = 1/2 * (1 + 1/2 * 1/2 + 1/2 * 1) = 7/8
+    #   revenue   = 1/2 * (40 + 1/2 * 1/2 * 80 + 1/2 * 80) = 50
+    expected = pd.DataFrame({
+        "expected_purchases": [0.875, 0.5, 2.0, 0.0, np.nan, np.nan],
+        "expected_revenue": [50.0, 40.0, 120.0, 0.0, np.nan, np.nan],
+    }, index=pd.Index(states["anon"], name="anon"))
+    pd.testing.assert_frame_equal(scores[["expected_purchases", "expected_revenue"]], expected)
+
+def test_score_customers_batches_and_empty_input():
+    states = EVENTS.rename(columns={"curr_ecos_str": "S_k_key"})
+    c = continuation_by_k(EVENTS, KERNEL, K_MAX)
+    whole = score_customers(KERNEL, states, ORDER_VALUES, c, K_MAX)
+    pd.testing.assert_frame_equal(score_customers(KERNEL, states, ORDER_VALUES, c, K_MAX, batch_size=2), whole)
+    assert score_customers(KERNEL, states.iloc[:0], ORDER_VALUES, c, K_MAX).empty
+
+def test_attach_ltv_scores_aligns_by_customer():
+    scores = pd.DataFrame({"anon": ["A", "B", "C"], "expected_purchases": [1.0, np.nan, 3.0], "expected_revenue": [10.0, np.nan, 30.0]})
+    rows = pd.DataFrame({"anon": ["C", "D", "A", "B"], "status": ["x", "y", "z", "w"]})
+
+    out = attach_ltv_scores(rows, scores)
+
+    assert "expected_purchases" not in rows
+    np.testing.assert_array_equal(out["expected_purchases"], [3.0, np.nan, 1.0, np.nan])
+    np.testing.assert_array_equal(out["expected_revenue"], [30.0, np.nan, 10.0, np.nan])
+    assert out["status"].tolist() == rows["status"].tolist()
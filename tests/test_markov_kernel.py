@@ -0,0 +1,36 @@
+import pickle
+
+import pandas as pd
+
+from simulation.markov_kernel import KERNEL_DIR, MODEL_DIR, compile_kernel, kernels_equal, load_kernel, open_kernel, save_kernel
+
+def _legacy_counts(P: dict) -> pd.DataFrame:
+    # notebook 18's pickled P[k][s] = (next states, probabilities) as long-form counts
+    return pd.DataFrame([
+        {"purchase_k": k, "S_k_key": s, "S_next_key": nxt, "p": p}
+        for k, by_state in P.items()
+        for s, (next_states, probs) in by_state.items()
+        for nxt, p in zip(next_states, probs)
+    ])
+
+def test_saved_kernel_equals_compiled(tmp_path):
+    counts = pd.DataFrame({
+        "purchase_k": [1, 1, 1, 2, 2],
+        "S_k_key": ["a", "a", "b", "a", "c"],
+        "S_next_key": ["a", "b", "c", "c", "a"],
+        "p": [0.25, 0.75, 1.0, 1.0, 1.0],
+    })
+    kernel = compile_kernel(counts)
+    save_kernel(kernel, tmp_path / "kernel")
+    mapped = open_kernel(tmp_path / "kernel")
+
+    assert kernels_equal(mapped, kernel) and kernels_equal(open_kernel(tmp_path / "kernel", mmap=False), kernel)
+    assert mapped != kernel  # identity: no elementwise ndarray comparison
+    assert not kernels_equal(compile_kernel(counts.assign(p=[0.5, 0.5, 1.0, 1.0, 1.0])), kernel)
+
+def test_committed_artifacts_agree():
+    kernel = open_kernel(KERNEL_DIR)
+    assert kernels_equal(kernel, load_kernel())
+    with open(MODEL_DIR / "markov_kernel.pkl", "rb") as f:
+        legacy = compile_kernel(_legacy_counts(pickle.load(f)))
+    assert kernels_equal(kernel, legacy)
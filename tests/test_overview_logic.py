@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from UI.data_io import clear_caches
+from UI.live_logic import STATUS_LABELS
+from UI.overview_logic import build_customer_index, build_status_matrix, get_status_matrix
+
+GROUPS = ["a", "b", "c"]
+
+def _live_all(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    # one row per (customer, group) like compute_live_dynamic_all_groups, some rows without a group
+    rng = np.random.default_rng(seed)
+    live = pd.DataFrame({
+        "anon": [f"A{i:04d}" for i in rng.integers(0, 400, n)],
+        "product_group": rng.choice(GROUPS + [None], size=n, p=[0.3, 0.3, 0.3, 0.1]),
+    }).drop_duplicates(ignore_index=True)
+    live["status"] = pd.Categorical(rng.choice(STATUS_LABELS, size=len(live)), categories=list(STATUS_LABELS), ordered=True)
+    return live
+
+def _reference_rows(live, actionable_only, product_groups, contains):
+    # the per-row filter the matrix replaced
+    m = live["product_group"].notna()
+    if product_groups:
+        m &= live["product_group"].isin(product_groups)
+    if actionable_only:
+        m &= live["status"].isin(["due_soon", "overdue"])
+    anon = pd.Series(sorted(live.loc[m, "anon"].unique()), dtype=object)
+    if contains:
+        anon = anon[anon.str.contains(contains, case=False, regex=False)]
+    return anon.tolist()
+
+@pytest.mark.parametrize("actionable_only, product_groups, contains", [
+    (True, None, ""),
+    (False, None, ""),
+    (True, ["b"], ""),
+    (False, ["a", "c"], "a01"),
+    (True, [], "zzz"),
+])
+def test_filter_rows_matches_per_row_filter(actionable_only, product_groups, contains):
+    live = _live_all()
+    matrix = build_status_matrix(live, build_customer_index(live))
+
+    rows = matrix.filter_rows(actionable_only, product_groups, contains)
+
+    assert matrix.customers[rows].tolist() == _reference_rows(live, actionable_only, product_groups, contains)
+
+@pytest.mark.parametrize("product_groups", [None, ["c", "a"]])
+def test_page_matches_pivot(product_groups):
+    live = _live_all()
+    matrix = build_status_matrix(live, build_customer_index(live))
+    rows = matrix.filter_rows(actionable_only=False)
+    pivot = (
+        live.dropna(subset=["product_group"])
+        .assign(status=lambda d: d["status"].astype(object))
+        .pivot(index="anon", columns="product_group", values="status")
+        .reindex(columns=GROUPS)
+    )
+    cols = [g for g in GROUPS if g in product_groups] if product_groups else GROUPS
+
+    for page in [0, 3, len(rows) // 100]:   # the last page is short
+        out = matrix.page(rows, page, 100, product_groups)
+        expected = pivot.loc[matrix.customers[rows[page * 100:(page + 1) * 100]], cols]
+        assert out.index.tolist() == expected.index.tolist() and out.columns.tolist() == cols
+        np.testing.assert_array_equal(out.fillna("-").to_numpy(), expected.fillna("-").to_numpy())
+    assert matrix.page(rows, len(rows) // 100 + 1, 100).empty
+
+def test_status_matrix_cached_per_live_controls():
+    clear_caches()
+    live = _live_all()
+    index = build_customer_index(live)
+    controls = ("dataset", "quantile", "median", None, 14)
+    before = get_status_matrix.cache_stats()
+
+    first = get_status_matrix(live, index, "v1", *controls)
+    assert get_status_matrix(live, index, "v1", *controls) is first
+    assert get_status_matrix(live, index, "v1", *controls[:-1], 30) is not first
+    assert get_status_matrix(live, index, "v2", *controls) is not first
+
+    after = get_status_matrix.cache_stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"]) == (1, 3)
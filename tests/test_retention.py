@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import UI.retention_logic as retention_logic
+from pipeline.retention import GROUP_COL, build_distributions, read_retention_distributions
+from UI.data_io import file_hash
+
+def _intervals(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "anon": [f"A{i % 300}" for i in range(n)],
+        GROUP_COL: rng.choice(["a", "b", "c", None], size=n, p=[0.5, 0.3, 0.15, 0.05]),
+        "adj_retention_days": pd.Series(rng.lognormal(4, 1, n).round()).where(rng.random(n) > 0.05),
+    })
+
+def test_stage_writes_sidecar_tagged_with_intervals_hash(tmp_path):
+    intervals = _intervals()
+    intervals.to_parquet(tmp_path / "purchase_intervals.parquet", index=False)
+
+    built = build_distributions(tmp_path / "purchase_intervals.parquet", tmp_path / "dist.npz")
+    dist = read_retention_distributions(tmp_path / "dist.npz")
+
+    assert dist.source_version == built.source_version == file_hash(tmp_path / "purchase_intervals.parquet")
+    for group in ["a", "b", "c"]:
+        x = intervals.loc[intervals[GROUP_COL] == group, "adj_retention_days"]
+        x = x[x > 0]
+        np.testing.assert_array_equal(dist.values_for(group), np.sort(x.to_numpy()))
+        pd.testing.assert_series_equal(
+            dist.stats.loc[group], x.describe().rename(group), check_names=False, check_index_type=False,
+        )
+
+def test_app_reads_sidecar_only_for_the_same_intervals_file(tmp_path, monkeypatch):
+    path = tmp_path / "purchase_intervals.parquet"
+    monkeypatch.setattr(retention_logic, "FILES", {"purchase_intervals": path})
+    monkeypatch.setattr(retention_logic, "DISTRIBUTIONS_PATH", tmp_path / "dist.npz")
+    _intervals().to_parquet(path, index=False)
+    build_distributions(path, tmp_path / "dist.npz")
+
+    # any frame works while the sidecar is current: it is not read
+    dist = retention_logic.get_retention_distributions(pd.DataFrame(), "v1")
+    assert dist.source_version == file_hash(path) and len(dist.product_groups) == 3
+
+    changed = _intervals(seed=1).rename(columns={GROUP_COL: "product_group"})
+    changed.to_parquet(path, index=False)
+    rebuilt = retention_logic.get_retention_distributions(changed, "v2")
+    assert rebuilt.source_version == file_hash(path)
+    np.testing.assert_array_equal(rebuilt.values_for("a"), np.sort(changed.loc[changed["product_group"] == "a", "adj_retention_days"].dropna().to_numpy()))
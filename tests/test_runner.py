@@ -0,0 +1,61 @@
+import json
+from functools import partial
+from pathlib import Path
+
+import pytest
+
+from pipeline.runner import Hasher, Stage, notebook_stage, run_pipeline
+
+def upper(src: Path, dst: Path) -> None:
+    dst.write_text(src.read_text().upper())
+
+def _notebook(path: Path, sources: list[str], outputs: list | None = None, count: int | None = None) -> None:
+    cells = [
+        {"cell_type": "markdown", "metadata": {}, "source": ["# stage\n"]},
+        *[{"cell_type": "code", "metadata": {}, "execution_count": count, "outputs": outputs or [], "source": s} for s in sources],
+    ]
+    path.write_text(json.dumps({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}))
+
+def _statuses(report) -> dict:
+    return dict(zip(report["stage"], report["status"]))
+
+def test_unchanged_stage_is_skipped_and_changed_input_reruns(tmp_path):
+    src, dst, manifest = tmp_path / "in.txt", tmp_path / "out.txt", tmp_path / "manifest.json"
+    src.write_text("a")
+    stages = [Stage("upper", (src,), (dst,), partial(upper, src, dst))]
+    run = partial(run_pipeline, stages, workers=1, manifest_path=manifest)
+
+    assert _statuses(run()) == {"upper": "ran"}
+    assert _statuses(run()) == {"upper": "skipped"}
+
+    src.write_text("b")
+    assert _statuses(run(dry_run=True)) == {"upper": "would run"}
+    assert _statuses(run()) == {"upper": "ran"}
+    assert dst.read_text() == "B"
+
+    dst.unlink()
+    assert _statuses(run()) == {"upper": "ran"}
+    assert _statuses(run(force=["upper"])) == {"upper": "ran"}
+
+def test_notebook_hash_covers_code_cells_only(tmp_path):
+    nb = tmp_path / "01_stage.ipynb"
+    _notebook(nb, ["x = 1\n", "print(x)"])
+    before = Hasher().file(nb)
+
+    # what executing the notebook (and saving it) changes
+    _notebook(nb, ["x = 1\n", "print(x)"], outputs=[{"output_type": "stream", "name": "stdout", "text": ["1\n"]}], count=3)
+    assert Hasher().file(nb) == before
+
+    _notebook(nb, ["x = 2\n", "print(x)"])
+    assert Hasher().file(nb) != before
+
+def test_notebook_stage_is_skipped_on_second_run(tmp_path):
+    pytest.importorskip("nbclient")
+    pytest.importorskip("nbformat")
+    nb, out = tmp_path / "01_stage.ipynb", tmp_path / "out.txt"
+    _notebook(nb, ["from pathlib import Path\n", "Path('out.txt').write_text('done')"])
+    stages = [notebook_stage("stage", str(nb), inputs=(), outputs=(out,))]
+    run = partial(run_pipeline, stages, workers=1, manifest_path=tmp_path / "manifest.json")
+
+    assert _statuses(run()) == {"stage": "ran"}
+    assert _statuses(run()) == {"stage": "skipped"}
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation.runner import run_monte_carlo, structural_chunk_counts, structural_marginals_ci
+from simulation.structural import compile_structural, simulate_cohort
+
+K = 3
+
+def _sampler():
+    entry = pd.Series({"x": 0.5, "y": 0.3, "z": 0.2})
+    P_G_EK = pd.DataFrame([
+        {"purchase_k": k, "ecosystem": e, "product_group": g, "p": p}
+        for k in range(1, K + 1)
+        for e, probs in {"x": (0.6, 0.4, 0.0), "y": (0.2, 0.5, 0.3), "z": (0.1, 0.1, 0.8)}.items()
+        for g, p in zip(("a", "b", "c"), probs)
+    ])
+    T = pd.DataFrame([[0.7, 0.2, 0.1], [0.3, 0.6, 0.1], [0.2, 0.2, 0.6]], index=list("xyz"), columns=list("xyz"))
+    return compile_structural(entry, P_G_EK, {k: T for k in range(1, K)}, K=K)
+
+def _real(n: int = 2000, seed: int = 1) -> pd.DataFrame:
+    # later purchases are missing for customers who stopped early; "w" / "d" never occur in the sim
+    rng = np.random.default_rng(seed)
+    cols = {}
+    for k in range(1, K + 1):
+        cols[f"E{k}"] = pd.Series(rng.choice(list("xyzw"), size=n, p=[0.4, 0.3, 0.2, 0.1])).where(rng.random(n) > 0.15 * k)
+        cols[f"G{k}"] = pd.Series(rng.choice(list("abcd"), size=n, p=[0.3, 0.3, 0.3, 0.1])).where(rng.random(n) > 0.15 * k)
+    return pd.DataFrame(cols)
+
+# notebook 16, cell "marginals_table"
+def l1(p, q):
+    idx = p.index.union(q.index)
+    p = p.reindex(idx, fill_value=0.0)
+    q = q.reindex(idx, fill_value=0.0)
+    return (p - q).abs().sum()
+
+def marginals_table(real_df, sim_df, prefix, K=5):
+    rows = []
+    for k in range(1, K + 1):
+        r = real_df[f"{prefix}{k}"].value_counts(normalize=True)
+        s = sim_df[f"{prefix}{k}"].value_counts(normalize=True)
+        rows.append({"k": k, "L1": l1(r, s)})
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize("prefix", ["E", "G"])
+def test_marginals_match_notebook_16(prefix):
+    sampler, real = _sampler(), _real()
+    result = run_monte_carlo(structural_chunk_counts, sampler, seed=7, chunk_size=5000, max_samples=10_000, tol=0.0)
+    # chunk i of both runs draws from child i of SeedSequence(7): the same customers
+    sim = simulate_cohort(sampler, result.n_samples, seed=7, chunk_size=5000)
+
+    expected = marginals_table(real, sim, prefix, K=K)
+    out = structural_marginals_ci(result, sampler, real, prefix)
+
+    np.testing.assert_allclose(out["L1"].to_numpy(), expected["L1"].to_numpy(), rtol=0, atol=1e-12)
+    assert (out["L1_ci_low"] <= out["L1"]).all() and (out["L1"] <= out["L1_ci_high"]).all()
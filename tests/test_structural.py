@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simulation.structural import alias_table, build_alias, compile_structural, sample_alias
+
+@pytest.mark.parametrize("probs", [[0.0, 0.0, 0.0], [np.nan, np.nan], [0.0, np.nan, 0.0], []])
+def test_zero_mass_row_raises(probs):
+    with pytest.raises(ValueError, match="no probability mass"):
+        build_alias(probs)
+
+def test_alias_table_names_empty_rows():
+    rows = np.array([[0.2, 0.8, 0.0], [0.0, 0.0, 0.0], [1.0, 1.0, 2.0], [np.nan, 0.0, 0.0]])
+    with pytest.raises(ValueError, match=r"\[1, 3\]"):
+        alias_table(rows)
+
+def test_sampled_frequencies_follow_row():
+    rows = np.array([[0.2, 0.8, 0.0, 0.0], [1.0, 1.0, 2.0, np.nan]])   # unnormalized / NaN entries are fine
+    accept, alias = alias_table(rows)
+    draws = sample_alias(accept, alias, np.repeat([0, 1], 100_000), np.random.default_rng(0))
+
+    freq = [np.bincount(draws[:100_000], minlength=4) / 100_000, np.bincount(draws[100_000:], minlength=4) / 100_000]
+    np.testing.assert_allclose(freq[0], [0.2, 0.8, 0.0, 0.0], atol=0.01)
+    np.testing.assert_allclose(freq[1], [0.25, 0.25, 0.5, 0.0], atol=0.01)
+    assert not np.isin(draws[:100_000], [2, 3]).any() and not (draws[100_000:] == 3).any()
+
+def test_compile_rejects_transition_step_without_mass():
+    entry = pd.Series({"x": 0.5, "y": 0.5})
+    P_G_EK = pd.DataFrame({"purchase_k": [1, 2], "ecosystem": ["x", "y"], "product_group": ["a", "b"], "p": [1.0, 1.0]})
+    T = pd.DataFrame(0.0, index=["x", "y"], columns=["x", "y"])   # no row and no column-sum fallback to sample from
+    with pytest.raises(ValueError, match="without probability mass"):
+        compile_structural(entry, P_G_EK, {1: T}, K=2)
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.transitions import GROUP_COL, build_transition_tensors, load_tensor
+
+GROUPS = ["01_a", "02_b", "03_c", "04_d", "05_e"]
+ECOSYSTEM_MAP = pd.DataFrame({"product_group": GROUPS[:4], "ecosystem": ["bottle", "bottle", "pitcher", "sink"]})   # 05_e unmapped
+
+def _cust_day(n: int = 3000, n_customers: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "anon": [f"C{i:04d}" for i in rng.integers(0, n_customers, n)],
+        "date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D"),
+        GROUP_COL: rng.choice(GROUPS, size=n, p=[0.3, 0.2, 0.2, 0.15, 0.15]),
+        "is_purchase": rng.random(n) > 0.1,
+    }).drop_duplicates(["anon", "date", GROUP_COL], ignore_index=True)
+
+# notebook 09, cells "purchase_days_df" / "df_k" / build_transition_matrix
+def _notebook_09_matrix(df: pd.DataFrame, k: int) -> pd.DataFrame:
+    purchase_days = df[df["is_purchase"]][["anon", "date"]].drop_duplicates().sort_values(["anon", "date"])
+    purchase_days["purchase_k"] = purchase_days.groupby("anon").cumcount() + 1
+    df_k = df.merge(purchase_days, on=["anon", "date"], how="left")
+
+    step = df_k[df_k["anon"].isin(df_k[df_k["purchase_k"] >= k + 1]["anon"].unique())]
+    basket_k = step[step["purchase_k"] == k][["anon", GROUP_COL]].drop_duplicates()
+    basket_k1 = step[step["purchase_k"] == k + 1][["anon", GROUP_COL]].drop_duplicates()
+    transitions = basket_k.merge(basket_k1, on="anon", suffixes=("_k", "_k1"))
+    transitions["weight"] = 1 / transitions.groupby("anon")["anon"].transform("count")
+    edges = (
+        transitions.groupby([f"{GROUP_COL}_k", f"{GROUP_COL}_k1"], as_index=False)["weight"].sum()
+        .rename(columns={f"{GROUP_COL}_k": "entry_group", f"{GROUP_COL}_k1": "next_group"})
+    )
+    matrix = edges.pivot(index="entry_group", columns="next_group", values="weight").fillna(0)
+    return matrix.div(matrix.sum(axis=1), axis=0)
+
+# notebook 10 (owned-ecosystem sets per order) + notebook 11's ecosystem_transition_matrix
+def _notebook_11(df: pd.DataFrame, k: int) -> tuple[pd.DataFrame, pd.Series]:
+    df_p = df[df["is_purchase"]].copy()
+    df_p["purchase_k"] = df_p.groupby("anon")["date"].rank(method="dense").astype(int)
+    df_p["ecosystem"] = df_p[GROUP_COL].map(ECOSYSTEM_MAP.set_index("product_group")["ecosystem"]).fillna("UNMAPPED")
+    orders = (
+        df_p[df_p["ecosystem"] != "UNMAPPED"]
+        .groupby(["anon", "purchase_k"])["ecosystem"].agg(lambda s: set(s)).rename("order_ecos")
+        .reset_index().sort_values(["anon", "purchase_k"])
+    )
+    owned, prev = {}, []
+    for anon, ecos in zip(orders["anon"], orders["order_ecos"]):
+        prev.append(set(owned.get(anon, set())))
+        owned[anon] = owned.get(anon, set()) | ecos
+    orders["prev_ecos_set"] = prev
+    step = orders[(orders["purchase_k"] == k + 1) & (orders["prev_ecos_set"].str.len() > 0)]
+
+    ecos = sorted(set().union(*step["prev_ecos_set"]) | set().union(*step["order_ecos"]))
+    counts = pd.DataFrame(0, index=ecos, columns=ecos, dtype=int)
+    denom = pd.Series(0, index=ecos, dtype=int)
+    for prev_set, bought in zip(step["prev_ecos_set"], step["order_ecos"]):
+        for y in prev_set:
+            denom[y] += 1
+            for x in bought:
+                counts.loc[y, x] += 1
+    return counts.div(denom, axis=0).fillna(0), denom
+
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_pg_matrix_matches_notebook_09(k):
+    cust_day = _cust_day()
+    pg, _ = build_transition_tensors(cust_day, ECOSYSTEM_MAP)
+
+    expected = _notebook_09_matrix(cust_day, k)
+    got = pg.matrix(k)
+    assert sorted(got.index) == sorted(expected.index) and sorted(got.columns) == sorted(expected.columns)
+    pd.testing.assert_frame_equal(got.reindex_like(expected), expected, check_names=False, rtol=1e-12)
+
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_eco_support_and_matrix_match_notebook_11(k):
+    cust_day = _cust_day()
+    _, eco = build_transition_tensors(cust_day, ECOSYSTEM_MAP)
+
+    expected, denom = _notebook_11(cust_day, k)
+    support = pd.Series(eco.support[k - 1], index=eco.labels)
+    pd.testing.assert_series_equal(support[support > 0], denom[denom > 0], check_dtype=False, check_index_type=False)
+    assert (support.drop(denom.index, errors="ignore") == 0).all()
+    got = eco.matrix(k)
+    assert sorted(got.index) == expected.index.tolist()
+    pd.testing.assert_frame_equal(got.reindex_like(expected), expected.astype(float), check_names=False, rtol=1e-12)
+
+@pytest.mark.parametrize("workers, n_shards", [(3, None), (2, 7), (1, 1)])
+def test_workers_and_shards_give_identical_tensors(tmp_path, workers, n_shards):
+    cust_day = _cust_day(seed=1)
+    serial = build_transition_tensors(cust_day, ECOSYSTEM_MAP, workers=1)
+    parallel = build_transition_tensors(cust_day, ECOSYSTEM_MAP, workers=workers, n_shards=n_shards)
+
+    for a, b in zip(serial, parallel):
+        np.testing.assert_array_equal(a.labels, b.labels)
+        for col in ("k", "src", "dst", "weight"):
+            np.testing.assert_array_equal(getattr(a, col), getattr(b, col))
+        assert (a.support is None and b.support is None) or np.array_equal(a.support, b.support)
+
+    # and the saved tensor reads back the same
+    serial[1].save(tmp_path / "eco.parquet")
+    loaded = load_tensor(tmp_path / "eco.parquet")
+    np.testing.assert_array_equal(loaded.support, serial[1].support)
+    pd.testing.assert_frame_equal(loaded.matrix(2), serial[1].matrix(2))